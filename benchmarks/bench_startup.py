@@ -0,0 +1,112 @@
+"""
+Benchmark bot start-up: how long `import server_bot` takes, and how long a fresh
+process takes from launch until its first getUpdates call.
+
+The second number runs server_bot.main() in a subprocess against a throwaway
+database and a local stub of the Bot API, so no network access or real token is
+needed. The bot is stopped with SIGINT as soon as the stub sees getUpdates.
+The OS page cache is not dropped, so these are warm-cache numbers; compare runs
+made on the same machine.
+
+Usage: python3 benchmarks/bench_startup.py [runs]
+"""
+import json
+import os
+import signal
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOKEN = "123456:bench"
+BOT_USER = {"id": 123456, "is_bot": True, "first_name": "bench", "username": "bench_bot"}
+
+IMPORT_SCRIPT = "import time; t = time.perf_counter(); import server_bot; print(time.perf_counter() - t)"
+START_SCRIPT = "import sys, server_bot; server_bot.main(db_path=sys.argv[1], log_path=sys.argv[2], base_url=sys.argv[3])"
+
+
+class StubBotAPI(BaseHTTPRequestHandler):
+    """Answers every Bot API method successfully and notes when getUpdates arrives."""
+
+    first_get_updates = threading.Event()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        method = self.path.rsplit("/", 1)[-1]
+        if method == "getUpdates":
+            StubBotAPI.first_get_updates.set()
+            result = []
+        elif method == "getMe":
+            result = BOT_USER
+        else:
+            result = True
+        body = json.dumps({"ok": True, "result": result}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The bot was stopped mid-poll
+
+    def log_message(self, format, *args):
+        pass
+
+
+def time_import():
+    output = subprocess.run([sys.executable, "-c", IMPORT_SCRIPT], cwd=REPO, check=True,
+                            capture_output=True, text=True).stdout
+    return float(output.strip().splitlines()[-1]) * 1000
+
+
+def time_first_get_updates(base_url, tmp):
+    db_path = os.path.join(tmp, "bench.db")
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE credentials (id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT UNIQUE NOT NULL, value TEXT NOT NULL)")
+        conn.execute("CREATE TABLE authorized_users (user_id INTEGER PRIMARY KEY, role TEXT NOT NULL)")
+        conn.execute("INSERT INTO credentials (key, value) VALUES ('bot_token', ?)", (TOKEN,))
+
+    StubBotAPI.first_get_updates.clear()
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-c", START_SCRIPT, db_path, os.path.join(tmp, "bench.log"), base_url],
+                            cwd=REPO, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not StubBotAPI.first_get_updates.wait(120):
+            raise RuntimeError("bot did not call getUpdates within 120s")
+        return (time.perf_counter() - started) * 1000
+    finally:
+        proc.send_signal(signal.SIGINT)
+        try:
+            proc.wait(30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubBotAPI)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/bot"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        imports = [time_import() for _ in range(runs)]
+        starts = [time_first_get_updates(base_url, tmp) for _ in range(runs)]
+    server.shutdown()
+
+    print(f"{'':>24}  {'min (ms)':>10}  {'median (ms)':>12}")
+    print(f"{'import server_bot':>24}  {min(imports):>10.1f}  {statistics.median(imports):>12.1f}")
+    print(f"{'launch to getUpdates':>24}  {min(starts):>10.1f}  {statistics.median(starts):>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Benchmark the raw-range chart queries against the original and migrated schema.
+
+The original schema stores timestamps as TEXT with no index, so every
+"WHERE timestamp >= ? ORDER BY timestamp" range read is a full scan plus sort.
+The migrated database is built by server_bot.initialize_database() (the real
+migrations: integer epoch + covering indexes, interface-keyed network index) and
+should stay flat as the tables grow.
+
+The queries are the ones fetch_series() issues for a raw range: the last day of
+temperatures, and the last day of one interface's network rates (two interfaces
+are logged). The original network_logs table had no interface column, so its
+query only filters on time.
+
+Usage: python3 benchmarks/bench_timestamp_index.py [max_rows]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import server_bot  # noqa: E402
+
+BASE = 1_700_000_000
+RANGE_SECONDS = 86400
+INTERFACES = ("eth0", "wlan0")
+REPEATS = 20
+
+TEMPERATURE_QUERY = "SELECT timestamp, cpu_temp, gpu_temp FROM temperature_logs WHERE timestamp >= ? ORDER BY timestamp"
+NETWORK_QUERY = (
+    "SELECT timestamp, rx_mbps, tx_mbps, rx_peak_mbps, tx_peak_mbps FROM network_logs "
+    "WHERE timestamp >= ? AND interface = ? ORDER BY timestamp"
+)
+OLD_NETWORK_QUERY = "SELECT timestamp, rx_mbps, tx_mbps FROM network_logs WHERE timestamp >= ? ORDER BY timestamp"
+
+OLD_SCHEMA = """
+    CREATE TABLE temperature_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT NOT NULL,
+        cpu_temp REAL,
+        gpu_temp REAL
+    );
+    CREATE TABLE network_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT NOT NULL,
+        rx_mbps REAL,
+        tx_mbps REAL
+    );
+"""
+
+
+def text_timestamp(epoch):
+    return datetime.fromtimestamp(epoch).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def fill(conn, start, stop, epoch):
+    """Insert minutes start..stop: one temperature row and one network row per interface each."""
+    stamp = (lambda i: BASE + i * 60) if epoch else (lambda i: text_timestamp(BASE + i * 60))
+    temperatures = ((stamp(i), 40 + i % 30, 35 + i % 25) for i in range(start, stop))
+    with conn:
+        conn.executemany("INSERT INTO temperature_logs (timestamp, cpu_temp, gpu_temp) VALUES (?, ?, ?)", temperatures)
+        if epoch:
+            conn.executemany(
+                "INSERT INTO network_logs (timestamp, interface, rx_mbps, tx_mbps, rx_peak_mbps, tx_peak_mbps) VALUES (?, ?, ?, ?, ?, ?)",
+                ((stamp(i), interface, i % 900, i % 300, i % 950, i % 350) for i in range(start, stop) for interface in INTERFACES),
+            )
+        else:
+            conn.executemany(
+                "INSERT INTO network_logs (timestamp, rx_mbps, tx_mbps) VALUES (?, ?, ?)",
+                ((stamp(i), i % 900, i % 300) for i in range(start, stop) for _ in INTERFACES),
+            )
+
+
+def time_query(conn, sql, params):
+    best = float("inf")
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def create_migrated(path):
+    """Create a database exactly as the bot does on first start."""
+    server_bot.DB_PATH = path
+    server_bot._read_local = threading.local()
+    server_bot.initialize_database()
+    return sqlite3.connect(path)
+
+
+def main():
+    max_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    sizes = [n for n in (10_000, 100_000, 1_000_000, 2_000_000) if n <= max_rows] or [max_rows]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        old = sqlite3.connect(os.path.join(tmp, "old.db"))
+        old.executescript(OLD_SCHEMA)
+        new = create_migrated(os.path.join(tmp, "new.db"))
+
+        print(f"{'minutes':>10}  {'temp TEXT (ms)':>15}  {'temp migrated (ms)':>19}  "
+              f"{'net TEXT (ms)':>14}  {'net migrated (ms)':>18}")
+        filled = 0
+        for size in sizes:
+            fill(old, filled, size, epoch=False)
+            fill(new, filled, size, epoch=True)
+            filled = size
+            since = BASE + size * 60 - RANGE_SECONDS
+            print(f"{size:>10}"
+                  f"  {time_query(old, TEMPERATURE_QUERY, (text_timestamp(since),)):>15.3f}"
+                  f"  {time_query(new, TEMPERATURE_QUERY, (since,)):>19.3f}"
+                  f"  {time_query(old, OLD_NETWORK_QUERY, (text_timestamp(since),)):>14.3f}"
+                  f"  {time_query(new, NETWORK_QUERY, (since, INTERFACES[0])):>18.3f}")
+
+        old.close()
+        new.close()
+
+
+if __name__ == "__main__":
+    main()
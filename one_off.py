@@ -50,6 +50,15 @@ def store_plex_token(token):
     print("✅ Plex token stored successfully.")
 
 
+def store_plex_url(url):
+    """Store the Plex server URL (only needed if Plex isn't on http://localhost:32400)."""
+    with sqlite3.connect(DB_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute("INSERT OR REPLACE INTO credentials (key, value) VALUES ('plex_url', ?)", (url,))
+        conn.commit()
+    print("✅ Plex URL stored successfully.")
+
+
 def display_database_contents():
     """Display stored data for verification."""
     with sqlite3.connect(DB_PATH) as conn:
@@ -83,6 +92,7 @@ if __name__ == "__main__":
     add_authorized_user(123456789, "standard")  # Example standard user (say you want to share the bot with you friend, put their id here)
 
     store_plex_token("enter_plex_token")  # Replace with your actual token
+    # store_plex_url("http://192.168.1.10:32400")  # Only if Plex runs on another host or port
 
     # Display contents for verification
     display_database_contents()
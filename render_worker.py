@@ -0,0 +1,267 @@
+"""
+Chart rendering for the bot's render process pool.
+
+Everything in this module runs inside worker processes started by server_bot.
+Each render function takes plain data (lists/arrays of epoch timestamps and
+values, labels) and returns PNG bytes. Figures are built with matplotlib's
+object-oriented Figure API on the Agg canvas, so no pyplot global state is
+shared between renders and nothing has to be closed afterwards.
+
+server_bot imports this module only to name the render functions, so matplotlib
+is imported by the workers (PRELOAD_MODULES) rather than at the top of the file.
+"""
+import io
+import resource
+from datetime import datetime
+
+# Imported once by the pool's forkserver, so every worker starts with them loaded
+PRELOAD_MODULES = ("render_worker", "matplotlib.figure", "matplotlib.backends.backend_agg")
+
+
+def _address_space():
+    """Return this process's current virtual memory size in bytes."""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[0]) * resource.getpagesize()
+
+
+def init_worker(memory_headroom=None):
+    """
+    Process pool initializer.
+
+    Caps the worker's address space at its current size plus memory_headroom, so
+    a runaway render fails with MemoryError instead of swapping the server, and
+    draws a throwaway figure so fonts and the Agg canvas are loaded before the
+    first real chart arrives.
+    """
+    import matplotlib
+    matplotlib.use("Agg")  # Headless backend; must be selected before anything draws
+
+    if memory_headroom:
+        try:
+            limit = _address_space() + memory_headroom
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (OSError, ValueError):
+            pass  # No /proc or the hard limit is lower already; render without a cap
+    render_test_graph()
+
+
+def ping():
+    """No-op task used to start the workers ahead of the first chart."""
+    return True
+
+
+def new_figure(**kwargs):
+    """Return a new (Agg-rendered) Figure."""
+    from matplotlib.figure import Figure
+    return Figure(**kwargs)
+
+
+def figure_to_png(fig):
+    """Save a figure into PNG bytes."""
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png')
+    return buf.getvalue()
+
+
+def plot_time_series(ax, series, label, marker, **style):
+    """Plot a (timestamps, values) series on a date axis; markers only where points are sparse."""
+    xs, ys = series
+    ax.plot([datetime.fromtimestamp(t) for t in xs], ys, label=label, marker=marker if len(xs) <= 60 else None, **style)
+
+
+def render_network_activity(range_label, interface, rx, tx, rx_peak, tx_peak):
+    """Render the network activity chart and return it as PNG bytes."""
+    fig = new_figure(figsize=(10, 5))
+    ax = fig.add_subplot()
+    plot_time_series(ax, rx, label='Download (RX Mbps)', marker='o')
+    plot_time_series(ax, tx, label='Upload (TX Mbps)', marker='x')
+    plot_time_series(ax, rx_peak, label='Download peak', marker=None, linestyle='--', alpha=0.6)
+    plot_time_series(ax, tx_peak, label='Upload peak', marker=None, linestyle='--', alpha=0.6)
+
+    ax.set_xlabel(f"Last {range_label}")
+    ax.set_ylabel("Mbps")
+    ax.set_title(f"📊 Network Activity on {interface} (Last {range_label})")
+    ax.legend()
+    fig.autofmt_xdate()
+    fig.tight_layout()
+    return figure_to_png(fig)
+
+
+def render_transcode_load(range_label, series):
+    """Render temperatures, utilisation and Plex streams on a shared time axis and return PNG bytes."""
+    fig = new_figure(figsize=(10, 9))
+    axes = fig.subplots(3, 1, sharex=True)
+    panels = (
+        (axes[0], "°C", (("cpu_temp", "CPU Temp"), ("gpu_temp", "GPU Temp"))),
+        (axes[1], "%", (("cpu_percent", "CPU load"), ("gpu_util", "GPU util"), ("gpu_enc_util", "GPU encoder"))),
+        (axes[2], "Streams", (("streams", "Plex streams"), ("transcodes", "Transcodes"))),
+    )
+    for ax, unit, columns in panels:
+        for column, label in columns:
+            style = {"drawstyle": "steps-post"} if ax is axes[2] else {}
+            plot_time_series(ax, series[column], label=label, marker=None, **style)
+        ax.set_ylabel(unit)
+        ax.legend(fontsize='small')
+    fig.suptitle(f"Transcode Load vs Temperature (Last {range_label})")
+    fig.autofmt_xdate()
+    fig.tight_layout()
+    return figure_to_png(fig)
+
+
+def render_hdd_capacity(devices, used_space, total_space):
+    """Render the HDD capacity bar chart and return it as PNG bytes."""
+    fig = new_figure()
+    ax = fig.add_subplot()
+    bar_width = 0.35
+    index = range(len(devices))
+
+    ax.bar(index, used_space, bar_width, label='Used Space')
+    ax.bar(index, [t - u for t, u in zip(total_space, used_space)], bar_width, bottom=used_space, label='Free Space')
+
+    ax.set_xlabel('Device')
+    ax.set_ylabel('Size (GB)')
+    ax.set_title('HDD Capacity')
+    ax.set_xticks(index, devices, rotation=45)
+    ax.legend()
+
+    fig.tight_layout()
+    return figure_to_png(fig)
+
+
+def render_disk_usage(range_label, used, available):
+    """Render the HDD usage trend and return it as PNG bytes."""
+    fig = new_figure(figsize=(10, 5))
+    ax = fig.add_subplot()
+    plot_time_series(ax, used, label='Used Space (GB)', marker='o')
+    plot_time_series(ax, available, label='Available Space (GB)', marker='x')
+    ax.set_xlabel("Time")
+    ax.set_ylabel("HDD Space (GB)")
+    ax.set_title(f"HDD Usage Trend (Last {range_label})")
+    ax.legend()
+    fig.autofmt_xdate()
+    fig.tight_layout()
+    return figure_to_png(fig)
+
+
+def render_disk_io(range_label, series):
+    """Render read/write throughput and IOPS per disk and return it as PNG bytes."""
+    fig = new_figure(figsize=(10, 8))
+    axes = fig.subplots(2, 1)
+    for ax, (unit, suffix) in zip(axes, (("MB/s", "mb_s"), ("IOPS", "iops"))):
+        for index, (disk, columns) in enumerate(series.items()):
+            color = f"C{index}"  # Same colour for a disk's read and write lines
+            plot_time_series(ax, columns[f"read_{suffix}"], label=f"{disk} read", marker='o', color=color)
+            plot_time_series(ax, columns[f"write_{suffix}"], label=f"{disk} write", marker='x', color=color, linestyle='--')
+        ax.set_ylabel(unit)
+        ax.legend(fontsize='small', ncol=2)
+    fig.suptitle(f"Disk I/O (Last {range_label})")
+    fig.autofmt_xdate()
+    fig.tight_layout()
+    return figure_to_png(fig)
+
+
+def render_memory_usage(total_memory, used_memory):
+    """Render the memory usage bar chart and return it as PNG bytes."""
+    fig = new_figure()
+    ax = fig.add_subplot()
+    bar_width = 0.35
+    index = range(1)
+
+    ax.bar(index, [used_memory], bar_width, label='Used Memory')
+    ax.bar(index, [total_memory - used_memory], bar_width, bottom=[used_memory], label='Available Memory')
+
+    ax.set_xlabel('Memory')
+    ax.set_ylabel('Size (GB)')
+    ax.set_title('Memory Usage')
+    ax.set_xticks(index, ['Memory'])
+    ax.legend()
+
+    fig.tight_layout()
+    return figure_to_png(fig)
+
+
+def render_network_info(interface, timestamps, speeds, duplexes):
+    """Render the ethernet speed/duplex trend and return it as PNG bytes."""
+    fig = new_figure(figsize=(10, 5))
+    ax = fig.add_subplot()
+    ax.plot(timestamps, speeds, label="Speed (Mbps)", marker="o")
+    ax.plot(timestamps, duplexes, label="Duplex (1=Full, 0=Half)", marker="x")
+    ax.tick_params(axis='x', labelrotation=45)
+    ax.set_xlabel("Time")
+    ax.set_ylabel("Network Stats")
+    ax.set_title(f"Network Info Trend for {interface} (Last 60 Entries)")
+    ax.legend()
+    fig.tight_layout()
+    return figure_to_png(fig)
+
+
+def render_bot_health(range_label, gauges, collectors, tables):
+    """Render memory/database size, collector timings and problems, and table sizes; return PNG bytes."""
+    fig = new_figure(figsize=(10, 12))
+    axes = fig.subplots(4, 1, sharex=True)
+
+    for column, label in (("rss_mb", "Bot RSS"), ("db_mb", "Database"), ("wal_mb", "WAL")):
+        plot_time_series(axes[0], gauges[column], label=label, marker=None)
+    axes[0].set_ylabel("MB")
+
+    for name, series in collectors.items():
+        plot_time_series(axes[1], series["duration_ms"], label=name, marker='.')
+    axes[1].set_ylabel("Collector run (ms)")
+
+    plot_time_series(axes[2], gauges["writer_queue"], label="Writer queue", marker=None)
+    for name, series in collectors.items():
+        for column in ("failures", "missed", "overruns"):
+            if any(series[column][1]):
+                plot_time_series(axes[2], series[column], label=f"{name} {column}", marker='x', linestyle='none')
+    axes[2].set_ylabel("Count")
+
+    for name, series in tables.items():
+        plot_time_series(axes[3], series, label=name, marker=None)
+    axes[3].set_ylabel("Rows")
+    axes[3].set_yscale("symlog")
+
+    for ax in axes:
+        if ax.get_legend_handles_labels()[0]:
+            ax.legend(fontsize='x-small', ncol=3)
+    fig.suptitle(f"Bot Health (Last {range_label})")
+    fig.autofmt_xdate()
+    fig.tight_layout()
+    return figure_to_png(fig)
+
+
+def render_test_graph():
+    """Render a dummy bar chart and return it as PNG bytes."""
+    # Dummy data for the test graph
+    categories = ['Category 1', 'Category 2', 'Category 3', 'Category 4']
+    values = [10, 20, 30, 40]
+
+    fig = new_figure()
+    ax = fig.add_subplot()
+    bar_width = 0.35
+    index = range(len(categories))
+
+    ax.bar(index, values, bar_width, label='Values')
+
+    ax.set_xlabel('Category')
+    ax.set_ylabel('Values')
+    ax.set_title('Test Graph')
+    ax.set_xticks(index, categories)
+    ax.legend()
+
+    fig.tight_layout()
+    return figure_to_png(fig)
+
+
+def render_temperature_trend(range_label, cpu, gpu):
+    """Render the CPU/GPU temperature trend and return it as PNG bytes."""
+    fig = new_figure(figsize=(10, 5))
+    ax = fig.add_subplot()
+    plot_time_series(ax, cpu, label='CPU Temp (°C)', marker='o')
+    plot_time_series(ax, gpu, label='GPU Temp (°C)', marker='x')
+
+    ax.set_xlabel(f"Last {range_label}")
+    ax.set_ylabel("Temperature (°C)")
+    ax.legend()
+    fig.autofmt_xdate()
+    fig.tight_layout()
+    return figure_to_png(fig)
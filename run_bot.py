@@ -0,0 +1,12 @@
+"""
+Start the server bot: python3 run_bot.py
+
+The render pool's forkserver workers re-run the main script before taking any
+work. This launcher only imports server_bot when it is the script being run,
+so the workers load render_worker and matplotlib rather than the whole bot.
+"""
+
+if __name__ == "__main__":
+    import server_bot
+
+    server_bot.main()
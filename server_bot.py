@@ -1,21 +1,61 @@
 import logging
 from logging.handlers import RotatingFileHandler
-from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
-from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, filters, ContextTypes
+from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove, InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto
+from telegram.error import BadRequest
+from telegram.request import HTTPXRequest
+from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, CallbackQueryHandler, filters, ContextTypes
 import os
-import psutil
-import uptime
-import subprocess
-import gpustat
+import importlib
 from datetime import timedelta, datetime
 import time
 import xml.etree.ElementTree as ET
-from textwrap import wrap
-import matplotlib.pyplot as plt
 import json
 import threading
 import sqlite3
 import re
+import asyncio
+import functools
+import queue
+import contextvars
+import httpx
+import random
+import math
+import bisect
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque, namedtuple
+from array import array
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import render_worker
+from render_worker import (
+    render_network_activity, render_transcode_load, render_hdd_capacity, render_disk_usage, render_disk_io,
+    render_memory_usage, render_network_info, render_bot_health, render_test_graph, render_temperature_trend,
+)
+
+
+class LazyModule:
+    """
+    Stand-in for a module that is only imported on first attribute access.
+
+    psutil, uptime and gpustat (which pulls in NVML bindings) are only needed once
+    a collector runs or a command is handled, so importing server_bot stays cheap.
+    matplotlib is likewise only imported by the render workers.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+psutil = LazyModule("psutil")
+uptime = LazyModule("uptime")
+gpustat = LazyModule("gpustat")
 
 #test comment
 
@@ -62,7 +102,860 @@ def initialize_database():
         """)
 
         conn.commit()
+        # WAL is persistent, so read-only handler connections can open it straight away
+        conn.execute("PRAGMA journal_mode=WAL")
+
+    migrate_database()
+
+
+### --- SCHEMA MIGRATIONS --- ###
+# The tables above are the original (version 0) schema. Each migration moves the
+# database forward one version and PRAGMA user_version records where it stands, so
+# fresh and existing databases end up on the same schema.
+def _migration_1_epoch_timestamps(conn):
+    """Store timestamps as integer epoch seconds and add covering indexes for time-range scans."""
+    tables = {
+        "temperature_logs": (
+            "cpu_temp REAL, gpu_temp REAL",
+            "cpu_temp, gpu_temp",
+        ),
+        "ethernet_logs": (
+            "speed TEXT, duplex TEXT",
+            "speed, duplex",
+        ),
+        "hdd_logs": (
+            "device TEXT NOT NULL, total_space REAL, used_space REAL, available_space REAL, "
+            "folder_count INTEGER, file_count INTEGER",
+            "device, total_space, used_space, available_space, folder_count, file_count",
+        ),
+        "network_logs": (
+            "rx_mbps REAL, tx_mbps REAL",
+            "rx_mbps, tx_mbps",
+        ),
+    }
+    for table, (columns, names) in tables.items():
+        conn.execute(f"ALTER TABLE {table} RENAME TO {table}_v0")
+        conn.execute(f"""
+            CREATE TABLE {table} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp INTEGER NOT NULL,
+                {columns}
+            )
+        """)
+        # Old rows were written with datetime.now(), i.e. local time
+        conn.execute(f"""
+            INSERT INTO {table} (id, timestamp, {names})
+            SELECT id, CAST(strftime('%s', timestamp, 'utc') AS INTEGER), {names}
+            FROM {table}_v0
+            WHERE timestamp IS NOT NULL
+        """)
+        conn.execute(f"DROP TABLE {table}_v0")
+
+    conn.execute("CREATE INDEX idx_temperature_logs_ts ON temperature_logs (timestamp, cpu_temp, gpu_temp)")
+    conn.execute("CREATE INDEX idx_ethernet_logs_ts ON ethernet_logs (timestamp, speed, duplex)")
+    conn.execute("CREATE INDEX idx_network_logs_ts ON network_logs (timestamp, rx_mbps, tx_mbps)")
+    conn.execute("CREATE INDEX idx_hdd_logs_ts ON hdd_logs (timestamp, used_space, available_space)")
+    conn.execute("CREATE INDEX idx_hdd_logs_device_ts ON hdd_logs (device, timestamp)")
+
+
+def _migration_2_rollup_tables(conn):
+    """Add hourly and daily min/avg/max rollup tables for the per-minute series."""
+    series = {
+        "temperature": ("cpu_temp", "gpu_temp"),
+        "network": ("rx_mbps", "tx_mbps"),
+    }
+    for name, columns in series.items():
+        stats = ", ".join(f"{c}_min REAL, {c}_avg REAL, {c}_max REAL" for c in columns)
+        for resolution in ("hourly", "daily"):
+            conn.execute(f"""
+                CREATE TABLE {name}_{resolution} (
+                    bucket INTEGER PRIMARY KEY,
+                    samples INTEGER NOT NULL,
+                    {stats}
+                )
+            """)
+
+
+def _migration_3_network_rates(conn):
+    """
+    Add per-minute peak columns to network_logs and turn old rows into real rates.
+
+    Rows written before this migration hold cumulative counters (in Mibit), so the
+    rate for each minute is the difference from the previous row over the elapsed
+    time. Counter resets leave that minute empty. Network rollups built from the
+    old totals are dropped and rebuilt from the corrected rows.
+    """
+    conn.execute("ALTER TABLE network_logs ADD COLUMN rx_peak_mbps REAL")
+    conn.execute("ALTER TABLE network_logs ADD COLUMN tx_peak_mbps REAL")
+
+    rates = []
+    previous = None
+    for row_id, timestamp, rx_total, tx_total in conn.execute(
+            "SELECT id, timestamp, rx_mbps, tx_mbps FROM network_logs ORDER BY timestamp, id"):
+        rx = tx = None
+        if previous is not None and None not in (rx_total, tx_total, previous[1], previous[2]):
+            elapsed = timestamp - previous[0]
+            if elapsed > 0 and rx_total >= previous[1] and tx_total >= previous[2]:
+                # Mibit -> Mbit
+                rx = (rx_total - previous[1]) * 1.048576 / elapsed
+                tx = (tx_total - previous[2]) * 1.048576 / elapsed
+        rates.append((rx, tx, row_id))
+        previous = (timestamp, rx_total, tx_total)
+    conn.executemany("UPDATE network_logs SET rx_mbps = ?, tx_mbps = ? WHERE id = ?", rates)
+
+    conn.execute("DROP INDEX idx_network_logs_ts")
+    conn.execute(
+        "CREATE INDEX idx_network_logs_ts ON network_logs (timestamp, rx_mbps, tx_mbps, rx_peak_mbps, tx_peak_mbps)"
+    )
+    for resolution in ("hourly", "daily"):
+        conn.execute(f"DELETE FROM network_{resolution}")
+        for column in ("rx_peak_mbps", "tx_peak_mbps"):
+            for stat in ("min", "avg", "max"):
+                conn.execute(f"ALTER TABLE network_{resolution} ADD COLUMN {column}_{stat} REAL")
+
+
+def _migration_4_network_interfaces(conn):
+    """
+    Record the interface on network and ethernet rows and roll network data up per interface.
+
+    Older rows came from the first eth0/ens/enp/wlan interface in /proc/net/dev,
+    so they are attributed to that interface (or 'unknown' if none exists now).
+    """
+    legacy_interface = None
+    try:
+        with open("/proc/net/dev", "r") as f:
+            for line in f:
+                name, sep, _ = line.partition(":")
+                name = name.strip()
+                if sep and (name == "eth0" or name.startswith(("ens", "enp", "wlan"))):
+                    legacy_interface = name
+                    break
+    except OSError:
+        pass
+    legacy_interface = legacy_interface or "unknown"
+
+    for table in ("network_logs", "ethernet_logs"):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN interface TEXT")
+        conn.execute(f"UPDATE {table} SET interface = ?", (legacy_interface,))
+
+    values = "rx_mbps, tx_mbps, rx_peak_mbps, tx_peak_mbps"
+    conn.execute("DROP INDEX idx_network_logs_ts")
+    conn.execute(f"CREATE INDEX idx_network_logs_ts ON network_logs (timestamp, interface, {values})")
+    conn.execute(f"CREATE INDEX idx_network_logs_if_ts ON network_logs (interface, timestamp, {values})")
+    conn.execute("CREATE INDEX idx_ethernet_logs_if_ts ON ethernet_logs (interface, timestamp, speed, duplex)")
+
+    stats = ", ".join(f"{c}_min REAL, {c}_avg REAL, {c}_max REAL" for c in values.split(", "))
+    for resolution in ("hourly", "daily"):
+        conn.execute(f"DROP TABLE network_{resolution}")
+        conn.execute(f"""
+            CREATE TABLE network_{resolution} (
+                bucket INTEGER NOT NULL,
+                interface TEXT NOT NULL,
+                samples INTEGER NOT NULL,
+                {stats},
+                PRIMARY KEY (interface, bucket)
+            )
+        """)
+        conn.execute(f"CREATE INDEX idx_network_{resolution}_bucket ON network_{resolution} (bucket)")
+
+
+def _migration_5_disk_io(conn):
+    """Add per-disk throughput/IOPS logs and their hourly and daily rollups."""
+    values = ("read_mb_s", "write_mb_s", "read_iops", "write_iops", "busy_percent")
+    conn.execute(f"""
+        CREATE TABLE disk_io_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp INTEGER NOT NULL,
+            disk TEXT NOT NULL,
+            {", ".join(f"{c} REAL" for c in values)}
+        )
+    """)
+    conn.execute(f"CREATE INDEX idx_disk_io_logs_ts ON disk_io_logs (timestamp, disk, {', '.join(values)})")
+    conn.execute(f"CREATE INDEX idx_disk_io_logs_disk_ts ON disk_io_logs (disk, timestamp, {', '.join(values)})")
+
+    stats = ", ".join(f"{c}_min REAL, {c}_avg REAL, {c}_max REAL" for c in values)
+    for resolution in ("hourly", "daily"):
+        conn.execute(f"""
+            CREATE TABLE disk_io_{resolution} (
+                bucket INTEGER NOT NULL,
+                disk TEXT NOT NULL,
+                samples INTEGER NOT NULL,
+                {stats},
+                PRIMARY KEY (disk, bucket)
+            )
+        """)
+        conn.execute(f"CREATE INDEX idx_disk_io_{resolution}_bucket ON disk_io_{resolution} (bucket)")
+
+
+def _migration_6_plex_stream_events(conn):
+    """Add the Plex stream history table (one row per session start, change or stop)."""
+    conn.execute("""
+        CREATE TABLE plex_stream_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp INTEGER NOT NULL,
+            session_key TEXT NOT NULL,
+            event TEXT NOT NULL CHECK(event IN ('start', 'change', 'stop')),
+            user TEXT,
+            title TEXT,
+            player TEXT,
+            decision TEXT,
+            bitrate INTEGER,
+            duration INTEGER,
+            concurrent INTEGER NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX idx_plex_stream_events_ts ON plex_stream_events (timestamp, concurrent)")
+    conn.execute("CREATE INDEX idx_plex_stream_events_user ON plex_stream_events (event, timestamp, user, duration)")
+    conn.execute("CREATE INDEX idx_plex_stream_events_session ON plex_stream_events (session_key, id)")
+
+
+def _migration_7_load_logs(conn):
+    """Add per-minute CPU/GPU utilisation and Plex stream counts, with hourly and daily rollups."""
+    values = ("cpu_percent", "gpu_util", "gpu_enc_util", "streams", "transcodes")
+    conn.execute(f"""
+        CREATE TABLE load_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp INTEGER NOT NULL,
+            {", ".join(f"{c} REAL" for c in values)}
+        )
+    """)
+    conn.execute(f"CREATE INDEX idx_load_logs_ts ON load_logs (timestamp, {', '.join(values)})")
+
+    stats = ", ".join(f"{c}_min REAL, {c}_avg REAL, {c}_max REAL" for c in values)
+    for resolution in ("hourly", "daily"):
+        conn.execute(f"""
+            CREATE TABLE load_{resolution} (
+                bucket INTEGER PRIMARY KEY,
+                samples INTEGER NOT NULL,
+                {stats}
+            )
+        """)
+
+
+def _migration_8_bot_health(conn):
+    """Add the bot's own health series: process/database gauges, per-collector timings and table row counts."""
+    series = {
+        "bot_health": ("bot_health_logs", ("writer_queue", "db_mb", "wal_mb", "rss_mb"), None),
+        "collector_health": ("collector_health_logs", ("duration_ms", "failures", "missed", "overruns"), "collector"),
+        "table_rows": ("table_rows_logs", ("row_count",), "table_name"),
+    }
+    for name, (raw_table, values, group) in series.items():
+        group_column = f"{group} TEXT NOT NULL," if group else ""
+        conn.execute(f"""
+            CREATE TABLE {raw_table} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp INTEGER NOT NULL,
+                {group_column}
+                {", ".join(f"{c} REAL" for c in values)}
+            )
+        """)
+        keys = f"timestamp, {group}" if group else "timestamp"
+        conn.execute(f"CREATE INDEX idx_{raw_table}_ts ON {raw_table} ({keys}, {', '.join(values)})")
+        if group:
+            conn.execute(f"CREATE INDEX idx_{raw_table}_{group}_ts ON {raw_table} ({group}, timestamp, {', '.join(values)})")
+
+        stats = ", ".join(f"{c}_min REAL, {c}_avg REAL, {c}_max REAL" for c in values)
+        for resolution in ("hourly", "daily"):
+            if group:
+                conn.execute(f"""
+                    CREATE TABLE {name}_{resolution} (
+                        bucket INTEGER NOT NULL,
+                        {group} TEXT NOT NULL,
+                        samples INTEGER NOT NULL,
+                        {stats},
+                        PRIMARY KEY ({group}, bucket)
+                    )
+                """)
+                conn.execute(f"CREATE INDEX idx_{name}_{resolution}_bucket ON {name}_{resolution} (bucket)")
+            else:
+                conn.execute(f"""
+                    CREATE TABLE {name}_{resolution} (
+                        bucket INTEGER PRIMARY KEY,
+                        samples INTEGER NOT NULL,
+                        {stats}
+                    )
+                """)
+
+
+def _migration_9_user_prefs(conn):
+    """Add per-user preferences (currently the default chart mode)."""
+    conn.execute("""
+        CREATE TABLE user_prefs (
+            user_id INTEGER PRIMARY KEY,
+            chart_mode TEXT NOT NULL DEFAULT 'image' CHECK(chart_mode IN ('image', 'text'))
+        )
+    """)
+
+
+MIGRATIONS = [
+    _migration_1_epoch_timestamps,
+    _migration_2_rollup_tables,
+    _migration_3_network_rates,
+    _migration_4_network_interfaces,
+    _migration_5_disk_io,
+    _migration_6_plex_stream_events,
+    _migration_7_load_logs,
+    _migration_8_bot_health,
+    _migration_9_user_prefs,
+]
+
+
+def migrate_database(db_path=None):
+    """Apply any pending schema migrations, each in its own transaction."""
+    conn = sqlite3.connect(db_path or DB_PATH, isolation_level=None)
+    try:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for target, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                migration(conn)
+                conn.execute(f"PRAGMA user_version = {target}")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+        # auto_vacuum can only be switched on an existing database by a full VACUUM,
+        # which has to run outside a transaction. After this one-off rebuild, space
+        # freed by retention is returned with PRAGMA incremental_vacuum instead.
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+
+### --- STORAGE --- ###
+# All writes go through one long-lived connection owned by DatabaseWriter's thread.
+# The database runs in WAL mode, so the read-only connections handlers use (one per
+# worker thread) never wait on the logger's write lock.
+class DatabaseWriter:
+    """
+    Single SQLite writer fed by a queue.
+
+    Inserts that arrive close together are grouped by statement and committed as one
+    multi-row transaction. call() runs arbitrary work on the writer connection, in
+    order with the queued inserts, and returns a Future for its result.
+    """
+
+    def __init__(self, db_path, batch_size=500, linger=0.05):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.linger = linger
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def insert(self, sql, params):
+        self._queue.put(("insert", sql, [params]))
+
+    def insert_many(self, sql, rows):
+        rows = list(rows)
+        if rows:
+            self._queue.put(("insert", sql, rows))
+
+    def call(self, func):
+        """Run func(conn) on the writer thread inside a transaction."""
+        future = Future()
+        self._queue.put(("call", func, future))
+        return future
+
+    def flush(self, timeout=None):
+        """Block until everything queued so far has been committed."""
+        self.call(lambda conn: None).result(timeout)
+
+    def qsize(self):
+        return self._queue.qsize()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _run(self):
+        conn = self._connect()
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            # Give a burst of inserts (e.g. one row per partition) a moment to arrive
+            if item[0] == "insert" and self.linger:
+                time.sleep(self.linger)
+            while len(batch) < self.batch_size:
+                try:
+                    next_item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if next_item is None:
+                    self._queue.put(None)
+                    break
+                batch.append(next_item)
+            self._process(conn, batch)
+        conn.close()
+
+    def _process(self, conn, batch):
+        pending = OrderedDict()
+        for item in batch:
+            if item[0] == "insert":
+                pending.setdefault(item[1], []).extend(item[2])
+                continue
+            self._commit_inserts(conn, pending)
+            pending = OrderedDict()
+            _, func, future = item
+            try:
+                with conn:
+                    result = func(conn)
+            except Exception as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+        self._commit_inserts(conn, pending)
 
+    def _commit_inserts(self, conn, pending):
+        if not pending:
+            return
+        try:
+            with conn:
+                for sql, rows in pending.items():
+                    conn.executemany(sql, rows)
+        except Exception as e:
+            logger.error(f"Error writing batch to DB: {e}")
+
+
+DB_WRITER = DatabaseWriter(DB_PATH)
+_read_local = threading.local()
+
+
+### --- ROLLUPS & RETENTION --- ###
+# Raw per-minute rows are kept for RAW_RETENTION_DAYS. Older history survives as
+# hourly and daily min/avg/max buckets, so long-range trends read a few hundred
+# compact rows and the database stays bounded in size.
+RAW_RETENTION_DAYS = 14
+HOURLY_RETENTION_DAYS = 365
+VACUUM_PAGES_PER_RUN = 2000
+
+# series name -> (raw table, rolled-up columns, column rows are grouped by or None)
+ROLLUP_SERIES = {
+    "temperature": ("temperature_logs", ("cpu_temp", "gpu_temp"), None),
+    "network": ("network_logs", ("rx_mbps", "tx_mbps", "rx_peak_mbps", "tx_peak_mbps"), "interface"),
+    "disk_io": ("disk_io_logs", ("read_mb_s", "write_mb_s", "read_iops", "write_iops", "busy_percent"), "disk"),
+    "load": ("load_logs", ("cpu_percent", "gpu_util", "gpu_enc_util", "streams", "transcodes"), None),
+    "bot_health": ("bot_health_logs", ("writer_queue", "db_mb", "wal_mb", "rss_mb"), None),
+    "collector_health": ("collector_health_logs", ("duration_ms", "failures", "missed", "overruns"), "collector"),
+    "table_rows": ("table_rows_logs", ("row_count",), "table_name"),
+}
+
+
+def _rollup_hourly(conn, series, now):
+    raw_table, columns, group = ROLLUP_SERIES[series]
+    last = conn.execute(f"SELECT MAX(bucket) FROM {series}_hourly").fetchone()[0]
+    if last is not None:
+        start = last + 3600
+    else:
+        start = conn.execute(f"SELECT MIN(timestamp) FROM {raw_table}").fetchone()[0]
+        if start is None:
+            return
+        start -= start % 3600
+    end = now - now % 3600  # Only complete buckets
+    if start >= end:
+        return
+    stats = ", ".join(f"MIN({c}), AVG({c}), MAX({c})" for c in columns)
+    names = ", ".join(f"{c}_min, {c}_avg, {c}_max" for c in columns)
+    keys = f"bucket, {group}" if group else "bucket"
+    conn.execute(f"""
+        INSERT OR REPLACE INTO {series}_hourly ({keys}, samples, {names})
+        SELECT timestamp - timestamp % 3600 AS bucket{f", {group}" if group else ""}, COUNT(*), {stats}
+        FROM {raw_table}
+        WHERE timestamp >= ? AND timestamp < ?
+        GROUP BY {keys}
+    """, (start, end))
+
+
+def _rollup_daily(conn, series, now):
+    _, columns, group = ROLLUP_SERIES[series]
+    last = conn.execute(f"SELECT MAX(bucket) FROM {series}_daily").fetchone()[0]
+    if last is not None:
+        start = last + 86400
+    else:
+        start = conn.execute(f"SELECT MIN(bucket) FROM {series}_hourly").fetchone()[0]
+        if start is None:
+            return
+        start -= start % 86400
+    end = now - now % 86400
+    if start >= end:
+        return
+    # Daily averages are weighted by how many raw samples each hour contributed
+    stats = ", ".join(
+        f"MIN({c}_min), SUM({c}_avg * samples) / SUM(CASE WHEN {c}_avg IS NOT NULL THEN samples END), MAX({c}_max)"
+        for c in columns
+    )
+    names = ", ".join(f"{c}_min, {c}_avg, {c}_max" for c in columns)
+    keys = f"bucket, {group}" if group else "bucket"
+    conn.execute(f"""
+        INSERT OR REPLACE INTO {series}_daily ({keys}, samples, {names})
+        SELECT bucket - bucket % 86400 AS day{f", {group}" if group else ""}, SUM(samples), {stats}
+        FROM {series}_hourly
+        WHERE bucket >= ? AND bucket < ?
+        GROUP BY day{f", {group}" if group else ""}
+    """, (start, end))
+
+
+def _apply_retention(conn, series, now):
+    raw_table, _, _ = ROLLUP_SERIES[series]
+    # Never prune raw rows that haven't been rolled up yet
+    rolled_until = conn.execute(f"SELECT MAX(bucket) FROM {series}_hourly").fetchone()[0]
+    if rolled_until is None:
+        return
+    raw_cutoff = min(now - RAW_RETENTION_DAYS * 86400, rolled_until + 3600)
+    conn.execute(f"DELETE FROM {raw_table} WHERE timestamp < ?", (raw_cutoff,))
+    conn.execute(f"DELETE FROM {series}_hourly WHERE bucket < ?", (now - HOURLY_RETENTION_DAYS * 86400,))
+
+
+def run_rollups(conn, now=None):
+    """Roll complete hours and days up, prune expired rows and return freed pages to the OS."""
+    now = int(now if now is not None else time.time())
+    for series in ROLLUP_SERIES:
+        _rollup_hourly(conn, series, now)
+        _rollup_daily(conn, series, now)
+        _apply_retention(conn, series, now)
+
+
+def run_database_maintenance():
+    """Queue rollups and retention on the writer, then reclaim free pages."""
+    try:
+        DB_WRITER.call(run_rollups).result()
+        # executescript steps the pragma to completion; a plain execute frees a single page
+        DB_WRITER.call(lambda conn: conn.executescript(f"PRAGMA incremental_vacuum({VACUUM_PAGES_PER_RUN});")).result()
+    except Exception as e:
+        logger.error(f"Error running database maintenance: {e}")
+
+
+### --- RECENT METRICS --- ###
+# The last RECENT_WINDOW_SECONDS of every rolled-up series is also kept in memory,
+# one fixed-size ring buffer per (series, column, group), filled by the collectors as
+# they write their rows. Recent-window charts and current values are read from here;
+# SQLite is only queried for longer ranges and to warm the buffers at startup.
+RECENT_WINDOW_SECONDS = 3600
+
+
+class RingBuffer:
+    """
+    Fixed-size ring of (timestamp, value) samples backed by two float arrays.
+
+    There is a single writer (the collector that owns the series) and any number
+    of readers, without a lock: a slot is written before the count is advanced,
+    and readers re-check the count afterwards to drop any slot that was
+    overwritten while they were copying.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._times = array('d', bytes(8 * capacity))
+        self._values = array('d', bytes(8 * capacity))
+        self._count = 0  # Samples ever appended
+
+    def append(self, timestamp, value):
+        slot = self._count % self.capacity
+        self._times[slot] = timestamp
+        self._values[slot] = value
+        self._count += 1
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    @property
+    def count(self):
+        """Samples ever appended, including those since overwritten."""
+        return self._count
+
+    def latest(self):
+        """Return the newest (timestamp, value), or None if nothing was recorded."""
+        count = self._count
+        if not count:
+            return None
+        slot = (count - 1) % self.capacity
+        return self._times[slot], self._values[slot]
+
+    def since(self, start):
+        """Return (timestamps, values) arrays for samples at or after `start`, oldest first."""
+        count = self._count
+        first = max(0, count - self.capacity)
+        head, tail = first % self.capacity, count % self.capacity
+        if count <= self.capacity or tail == 0:
+            times, values = self._times[head:head + count - first], self._values[head:head + count - first]
+        else:
+            times = self._times[head:] + self._times[:tail]
+            values = self._values[head:] + self._values[:tail]
+        # Samples the writer overwrote during the copy are at the front
+        overwritten = max(0, self._count - self.capacity - first)
+        skip = bisect.bisect_left(times, start, lo=overwritten)
+        return times[skip:], values[skip:]
+
+
+class MetricStore:
+    """
+    Ring buffers for the recent window of every series in ROLLUP_SERIES.
+
+    Readers only look buffers up by key and never iterate the buffers dict, which
+    collectors grow when a new interface or disk appears. The groups of a series
+    are kept as a frozenset that the writer replaces rather than mutates.
+    """
+
+    def __init__(self, window_seconds=RECENT_WINDOW_SECONDS):
+        self.window_seconds = window_seconds
+        self.buffers = {}  # (series, column, group) -> RingBuffer
+        self._groups = {}  # series -> frozenset of groups with a buffer
+        self.versions = {}  # series -> rows recorded, used as a chart cache version
+        self.warm = False
+
+    def record(self, series, columns, rows, interval):
+        """Append rows (laid out as `columns`, timestamp first) of a collector's table to its buffers."""
+        _, value_columns, group_column = ROLLUP_SERIES[series]
+        group_index = columns.index(group_column) if group_column else None
+        indexes = [(column, columns.index(column)) for column in value_columns]
+        # A little headroom so a full window always fits despite jitter
+        capacity = self.window_seconds // interval + 2
+        for row in rows:
+            group = row[group_index] if group_index is not None else None
+            for column, index in indexes:
+                if row[index] is None:
+                    continue
+                key = (series, column, group)
+                buffer = self.buffers.get(key)
+                if buffer is None:
+                    buffer = self.buffers[key] = RingBuffer(capacity)
+                    self._groups[series] = self._groups.get(series, frozenset()) | {group}
+                buffer.append(row[0], row[index])
+        self.versions[series] = self.versions.get(series, 0) + len(rows)
+
+    def covers(self, seconds):
+        return self.warm and seconds <= self.window_seconds
+
+    def fetch(self, series, seconds, now=None, group=None):
+        """Return {column: (timestamps, values)} from memory, in the same shape as fetch_series."""
+        _, columns, _ = ROLLUP_SERIES[series]
+        start = (now if now is not None else time.time()) - seconds
+        points = {}
+        for column in columns:
+            buffer = self.buffers.get((series, column, group))
+            xs, ys = buffer.since(start) if buffer is not None else ((), ())
+            points[column] = lttb(xs, ys)
+        return points
+
+    def groups(self, series):
+        """Return the groups (interfaces, disks) with samples of a series in memory."""
+        return set(self._groups.get(series, ()))
+
+    def latest(self, series, column, group=None):
+        buffer = self.buffers.get((series, column, group))
+        return buffer.latest() if buffer is not None else None
+
+    def version(self, series):
+        return self.versions.get(series, 0)
+
+    def warm_start(self, conn):
+        """Fill the buffers with the last window of raw rows from SQLite."""
+        start = int(time.time()) - self.window_seconds
+        for collector in COLLECTORS.values():
+            if collector.series is None:
+                continue
+            cursor = conn.execute(
+                f"SELECT {', '.join(collector.columns)} FROM {collector.table} WHERE timestamp >= ? ORDER BY timestamp",
+                (start,)
+            )
+            self.record(collector.series, collector.columns, cursor.fetchall(), collector.interval)
+        self.warm = True
+
+
+METRIC_STORE = MetricStore()
+
+
+def current_series_version(series, seconds):
+    """Data version of a series for chart cache keys: in-memory row count for recent windows, else the newest row id."""
+    if METRIC_STORE.covers(seconds):
+        return ("memory", METRIC_STORE.version(series))
+    return get_latest_row_id(ROLLUP_SERIES[series][0])
+
+
+async def series_version(series, seconds):
+    """current_series_version(), querying SQLite (when it has to) on the I/O pool."""
+    if METRIC_STORE.covers(seconds):
+        return current_series_version(series, seconds)
+    return await run_blocking(current_series_version, series, seconds)
+
+
+### --- TIME RANGES & DOWNSAMPLING --- ###
+# Trend commands accept a range such as 90m, 6h, 7d or 30d. Short ranges read raw
+# per-minute rows, longer ones read the hourly/daily rollups (topped up with the
+# finer data that hasn't been rolled yet), and every series is reduced to at most
+# MAX_PLOT_POINTS with LTTB so a month costs the same to render as an hour.
+MAX_PLOT_POINTS = 300
+MAX_RANGE_SECONDS = 400 * 86400
+RAW_RANGE_LIMIT = 2 * 86400
+HOURLY_RANGE_LIMIT = 90 * 86400
+
+_RANGE_UNITS = {"m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+
+
+def parse_time_range(args, default):
+    """
+    Parse a range argument like '6h' or '30d' into seconds.
+
+    Returns the default when no argument is given and raises ValueError for
+    anything that isn't a positive <number><m|h|d|w> within MAX_RANGE_SECONDS.
+    """
+    if not args:
+        return default
+    match = re.fullmatch(r"(\d+)([mhdw])", args[0].strip().lower())
+    if not match:
+        raise ValueError(f"Invalid range '{args[0]}'")
+    seconds = int(match.group(1)) * _RANGE_UNITS[match.group(2)]
+    if not 0 < seconds <= MAX_RANGE_SECONDS:
+        raise ValueError(f"Range '{args[0]}' is out of bounds")
+    return seconds
+
+
+def split_range_args(args, default):
+    """
+    Split command arguments into a range and the remaining arguments.
+
+    The range may be given in any position; an argument starting with a digit is
+    taken as the range, so '/diskio sda' and '/diskio sda 6h' both work. Raises
+    ValueError like parse_time_range() for a bad range or more than one range.
+    """
+    ranges = [arg for arg in args or [] if arg[:1].isdigit()]
+    if len(ranges) > 1:
+        raise ValueError("More than one range given")
+    rest = [arg for arg in args or [] if not arg[:1].isdigit()]
+    return parse_time_range(ranges, default), rest
+
+
+def format_time_range(seconds):
+    """Format a range in seconds the way a user would type it (e.g. '6h', '30d')."""
+    for unit, size in (("d", 86400), ("h", 3600), ("m", 60)):
+        if seconds % size == 0:
+            return f"{seconds // size}{unit}"
+    return f"{seconds}s"
+
+
+def choose_resolution(seconds):
+    """Pick the coarsest source that still gives a detailed plot for the range."""
+    if seconds <= RAW_RANGE_LIMIT:
+        return "raw"
+    if seconds <= HOURLY_RANGE_LIMIT:
+        return "hourly"
+    return "daily"
+
+
+def lttb(xs, ys, threshold=MAX_PLOT_POINTS):
+    """
+    Downsample a series with Largest-Triangle-Three-Buckets.
+
+    Keeps the first and last points and, from each bucket in between, the point
+    forming the largest triangle with its neighbours, which preserves peaks and
+    troughs that plain averaging would flatten.
+    """
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(xs), list(ys)
+
+    out_x, out_y = [xs[0]], [ys[0]]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third triangle vertex
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        span = next_end - next_start
+        avg_x = sum(xs[next_start:next_end]) / span
+        avg_y = sum(ys[next_start:next_end]) / span
+
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        ax, ay = xs[a], ys[a]
+        best_area, best = -1.0, start
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best_area, best = area, j
+        out_x.append(xs[best])
+        out_y.append(ys[best])
+        a = best
+
+    out_x.append(xs[-1])
+    out_y.append(ys[-1])
+    return out_x, out_y
+
+
+def fetch_series(series, seconds, now=None, stats=None, group=None):
+    """
+    Return {column: (timestamps, values)} for a rolled-up series over the last `seconds`.
+
+    Rollup buckets are plotted at their averages unless `stats` maps a column to
+    'min' or 'max' (e.g. peaks). For grouped series (network), `group` selects
+    the interface. Rows newer than the last rolled bucket are read from the next
+    finer source so the latest data is always shown. None values are dropped and
+    every column is downsampled with LTTB. Ranges within the recent window are
+    served from the in-memory ring buffers.
+    """
+    if METRIC_STORE.covers(seconds):
+        return METRIC_STORE.fetch(series, seconds, now, group)
+    raw_table, columns, group_column = ROLLUP_SERIES[series]
+    stats = stats or {}
+    now = int(now if now is not None else time.time())
+    start = now - seconds
+    resolution = choose_resolution(seconds)
+    rolled_columns = [f"{c}_{stats.get(c, 'avg')}" for c in columns]
+
+    sources = []
+    if resolution == "daily":
+        sources.append((f"{series}_daily", "bucket", rolled_columns, 86400))
+    if resolution in ("daily", "hourly"):
+        sources.append((f"{series}_hourly", "bucket", rolled_columns, 3600))
+    sources.append((raw_table, "timestamp", list(columns), 0))
+
+    group_filter = f" AND {group_column} = ?" if group_column else ""
+    cursor = get_read_connection().cursor()
+    points = {c: ([], []) for c in columns}
+    since = start
+    for table, time_column, value_columns, width in sources:
+        cursor.execute(
+            f"SELECT {time_column}, {', '.join(value_columns)} FROM {table} "
+            f"WHERE {time_column} >= ?{group_filter} ORDER BY {time_column}",
+            (since, group) if group_column else (since,)
+        )
+        last = None
+        for row in cursor:
+            last = row[0]
+            for column, value in zip(columns, row[1:]):
+                if value is not None:
+                    points[column][0].append(row[0])
+                    points[column][1].append(value)
+        if last is not None:
+            since = last + width
+
+    return {c: lttb(xs, ys) for c, (xs, ys) in points.items()}
+
+
+def get_read_connection():
+    """Return this thread's read-only connection to the database, opening it on first use."""
+    conn = getattr(_read_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True)
+        _read_local.conn = conn
+    return conn
 
 
 def get_bot_token():
@@ -73,73 +966,780 @@ def get_bot_token():
         result = cursor.fetchone()
         return result[0] if result else None
 
-def get_authorized_users():
-    """Retrieve a list of authorized user IDs from the database."""
-    with sqlite3.connect(DB_PATH) as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT user_id FROM authorized_users")
-        users = [row[0] for row in cursor.fetchall()]
-    return users
 
-def get_admin_user():
-    """Retrieve the first admin user from the database."""
-    with sqlite3.connect(DB_PATH) as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT user_id FROM authorized_users WHERE role='admin' LIMIT 1")
-        result = cursor.fetchone()
-        return result[0] if result else None
+### --- AUTHORIZATION --- ###
+# Roles live in memory so every check is a plain dict lookup on the event loop. The
+# authorized_users table is still the source of truth: every AUTH_POLL_SECONDS the
+# collector scheduler asks SQLite for PRAGMA data_version, which changes whenever
+# another connection (the bot's writer or one_off.py) commits, and only then re-reads
+# the roles into a new dict that replaces the old one.
+AUTH_POLL_SECONDS = 2
+ROLES = ("admin", "standard")
 
-# Fetch bot token
-TOKEN = get_bot_token()
-if not TOKEN:
-    raise ValueError("Bot token not found in the database!")
 
-# Fetch authorized users
-AUTHORIZED_USERS = get_authorized_users()
+class AuthService:
+    """Cached user -> role map for authorization checks, hot-reloaded on database changes."""
 
-# Fetch first admin user for shutdown and update permissions
-SHUTDOWN_USER_ID = get_admin_user()
-UPDATE_UPGRADE_USER_ID = get_admin_user()
+    def __init__(self, db_path=None):
+        self.db_path = db_path
+        self._roles = {}
+        self._conn = None
+        self._data_version = None
+        self._lock = threading.Lock()
 
+    def refresh(self, force=False):
+        """Reload roles if the database changed since the last call. Blocking; keep it off the event loop."""
+        with self._lock:
+            if self._conn is None:
+                # data_version is per connection, so this one is kept for the bot's lifetime
+                self._conn = sqlite3.connect(self.db_path or DB_PATH, check_same_thread=False)
+            version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if version == self._data_version and not force:
+                return
+            self._data_version = version
+            self._roles = dict(self._conn.execute("SELECT user_id, role FROM authorized_users"))
 
-# Configure logging with RotatingFileHandler
-log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    def role(self, user_id):
+        return self._roles.get(user_id)
+
+    def is_authorized(self, user_id):
+        return self.role(user_id) is not None
+
+    def is_admin(self, user_id):
+        return self.role(user_id) == "admin"
+
+    def users(self):
+        """Return {user_id: role} for every authorized user."""
+        return dict(self._roles)
+
+    def set_role(self, user_id, role):
+        if role not in ROLES:
+            raise ValueError(f"Unknown role '{role}'")
+        DB_WRITER.call(lambda conn: conn.execute(
+            "INSERT OR REPLACE INTO authorized_users (user_id, role) VALUES (?, ?)", (user_id, role)
+        )).result()
+        self.refresh(force=True)
+
+    def remove(self, user_id):
+        DB_WRITER.call(lambda conn: conn.execute("DELETE FROM authorized_users WHERE user_id = ?", (user_id,))).result()
+        self.refresh(force=True)
 
-log_handler = RotatingFileHandler(
-    '/serverbot/server_bot.log',  # Ensure this path is correct
-    maxBytes=5*1024*1024,  # 5 MB
-    backupCount=3
-)
-log_handler.setFormatter(log_formatter)
+
+# Authorized users and their roles (any admin may run the server management commands).
+# Nothing is read until main() loads them.
+AUTH = AuthService()
+
+
+### --- STARTUP CONFIGURATION --- ###
+# Importing this module has no side effects: the token, database and log file are
+# only touched by configure() and load_bot_token(), which main() calls at startup.
+LOG_PATH = "/serverbot/server_bot.log"
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
-logger.addHandler(log_handler)
+
+
+def configure(db_path=DB_PATH, log_path=LOG_PATH):
+    """Point the bot at its database and attach the rotating log file."""
+    global DB_PATH, DB_WRITER
+    if db_path != DB_PATH:
+        DB_PATH = db_path
+        DB_WRITER = DatabaseWriter(db_path)
+
+    # Configure logging with RotatingFileHandler
+    log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    log_handler = RotatingFileHandler(
+        log_path,  # Ensure this path is correct
+        maxBytes=5*1024*1024,  # 5 MB
+        backupCount=3
+    )
+    log_handler.setFormatter(log_formatter)
+    logger.addHandler(log_handler)
+
+
+def load_bot_token():
+    """Fetch the bot token, failing startup if it hasn't been stored with one_off.py."""
+    token = get_bot_token()
+    if not token:
+        raise ValueError("Bot token not found in the database!")
+    return token
+
+
+### --- INSTRUMENTATION --- ###
+# dispatch() times every command and splits the time into phases: queue (Telegram
+# message date to dispatch, 1s resolution), fetch (run_blocking/run_command and Plex
+# calls), render (run_render) and send (every Bot API request, timed by
+# TimedHTTPXRequest). Phases are attributed through a context variable, so handlers
+# need no changes. The last COMMAND_STATS_WINDOW samples of each (command, phase)
+# are kept for percentiles; any ERROR logged while a command runs counts as an error.
+COMMAND_STATS_WINDOW = 1024
+PHASES = ("queue", "fetch", "render", "send", "total")
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9464
+
+_current_timing = contextvars.ContextVar("current_timing", default=None)
+
+
+def record_phase(phase, seconds):
+    """Add time spent in a phase to the command currently being handled, if any."""
+    timing = _current_timing.get()
+    if timing is not None:
+        timing[phase] = timing.get(phase, 0.0) + seconds
+
+
+class CommandStats:
+    """Rolling per-command phase latencies plus cumulative call and error counters."""
+
+    def __init__(self, window=COMMAND_STATS_WINDOW):
+        self.window = window
+        self.samples = {}  # (command, phase) -> RingBuffer of (epoch, seconds)
+        self.calls = {}
+        self.errors = {}
+        self.limited = {}  # Requests turned away by the rate limiter
+        self.seconds = {}  # (command, phase) -> cumulative seconds, for Prometheus _sum
+
+    def record(self, command, timing):
+        now = time.time()
+        self.calls[command] = self.calls.get(command, 0) + 1
+        if timing.pop("error", False):
+            self.errors[command] = self.errors.get(command, 0) + 1
+        for phase, seconds in timing.items():
+            key = (command, phase)
+            buffer = self.samples.get(key)
+            if buffer is None:
+                buffer = self.samples[key] = RingBuffer(self.window)
+            buffer.append(now, seconds)
+            self.seconds[key] = self.seconds.get(key, 0.0) + seconds
+
+    def quantiles(self, command, phase):
+        """Return (p50, p95, p99) in seconds over the window, or None without samples."""
+        buffer = self.samples.get((command, phase))
+        if buffer is None or not len(buffer):
+            return None
+        values = sorted(buffer.since(0)[1])
+        return tuple(values[min(len(values) - 1, int(q * len(values)))] for q in (0.5, 0.95, 0.99))
+
+    def commands(self):
+        return sorted(self.calls, key=self.calls.get, reverse=True)
+
+    def prometheus(self):
+        """Render the counters and quantiles in the Prometheus text exposition format."""
+        lines = [
+            "# HELP serverbot_command_calls_total Commands handled.",
+            "# TYPE serverbot_command_calls_total counter",
+        ]
+        lines += [f'serverbot_command_calls_total{{command="{c}"}} {n}' for c, n in sorted(self.calls.items())]
+        lines += [
+            "# HELP serverbot_command_errors_total Commands that logged an error.",
+            "# TYPE serverbot_command_errors_total counter",
+        ]
+        lines += [f'serverbot_command_errors_total{{command="{c}"}} {self.errors.get(c, 0)}' for c in sorted(self.calls)]
+        lines += [
+            "# HELP serverbot_command_rate_limited_total Requests rejected by the per-user rate limit.",
+            "# TYPE serverbot_command_rate_limited_total counter",
+        ]
+        lines += [f'serverbot_command_rate_limited_total{{command="{c}"}} {n}' for c, n in sorted(self.limited.items())]
+        lines += [
+            "# HELP serverbot_charts_shared_total Chart requests served by another request's in-flight render.",
+            "# TYPE serverbot_charts_shared_total counter",
+            f"serverbot_charts_shared_total {CHART_FLIGHTS.shared}",
+        ]
+        lines += [
+            "# HELP serverbot_command_seconds Command latency by phase.",
+            "# TYPE serverbot_command_seconds summary",
+        ]
+        for (command, phase), buffer in sorted(self.samples.items()):
+            labels = f'command="{command}",phase="{phase}"'
+            for q, value in zip((0.5, 0.95, 0.99), self.quantiles(command, phase) or ()):
+                lines.append(f'serverbot_command_seconds{{{labels},quantile="{q}"}} {value:.6f}')
+            lines.append(f"serverbot_command_seconds_sum{{{labels}}} {self.seconds[(command, phase)]:.6f}")
+            lines.append(f"serverbot_command_seconds_count{{{labels}}} {buffer.count}")
+        return "\n".join(lines) + "\n"
+
+
+COMMAND_STATS = CommandStats()
+
+
+class _CommandErrorFilter(logging.Filter):
+    """Marks the running command as failed when it logs an error (handlers catch their own exceptions)."""
+
+    def filter(self, record):
+        if record.levelno >= logging.ERROR:
+            timing = _current_timing.get()
+            if timing is not None:
+                timing["error"] = True
+        return True
+
+
+logger.addFilter(_CommandErrorFilter())
+
+
+class TimedHTTPXRequest(HTTPXRequest):
+    """Bot API transport that attributes request time to the command being handled."""
+
+    async def do_request(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await super().do_request(*args, **kwargs)
+        finally:
+            record_phase("send", time.perf_counter() - started)
+
+
+async def handle_metrics_request(reader, writer):
+    """Answer any HTTP request with the current metrics in Prometheus text format."""
+    try:
+        # Read and discard the request line and headers
+        while (await asyncio.wait_for(reader.readline(), 5)).strip():
+            pass
+        body = COMMAND_STATS.prometheus().encode()
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n"
+            + f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+            + body
+        )
+        await writer.drain()
+    except Exception as e:
+        logger.warning(f"Error serving metrics: {e}")
+    finally:
+        writer.close()
+
+
+_metrics_server = None
+
+
+async def start_metrics_server(host=METRICS_HOST, port=METRICS_PORT):
+    """Serve /metrics on a local port; failing to bind only disables the endpoint."""
+    global _metrics_server
+    try:
+        _metrics_server = await asyncio.start_server(handle_metrics_request, host, port)
+        logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+    except OSError as e:
+        logger.warning(f"Metrics endpoint disabled: {e}")
+
+
+async def stop_metrics_server():
+    if _metrics_server is not None:
+        _metrics_server.close()
+        await _metrics_server.wait_closed()
+
+
+### --- NON-BLOCKING EXECUTION --- ###
+# Handlers never call blocking code directly: sqlite, psutil, gpustat and file I/O
+# go through the shared thread pool, and shell tools run as asyncio subprocesses.
+# Charts are drawn in a small pool of worker processes (render_worker.py) that
+# keep matplotlib imported and warm, so renders use more than one core and a
+# slow or leaky render can't stall or bloat the bot itself.
+IO_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="bot-io")
+RENDER_WORKERS = max(1, min(4, (os.cpu_count() or 1) // 2))
+RENDER_TASKS_PER_WORKER = 50  # Recycle workers so matplotlib's caches and heap fragmentation can't pile up
+RENDER_TIMEOUT = 30  # Seconds before a render is abandoned and its pool is rebuilt
+RENDER_MEMORY_HEADROOM = 512 * 1024 * 1024  # Address space a worker may grow by after start-up
+
+
+class RenderPool:
+    """
+    Process pool for chart rendering.
+
+    Workers are forked from a forkserver that has already imported
+    render_worker (and with it matplotlib), have their address space capped by
+    render_worker.init_worker, and are replaced after RENDER_TASKS_PER_WORKER
+    charts. A render that outlives the timeout, or a worker that dies, takes the
+    pool down with it: the workers are killed and the next render starts a
+    fresh pool. Workers only stay free of the bot itself when it is started
+    through run_bot.py.
+    """
+
+    def __init__(self, workers=RENDER_WORKERS, tasks_per_worker=RENDER_TASKS_PER_WORKER,
+                 timeout=RENDER_TIMEOUT, memory_headroom=RENDER_MEMORY_HEADROOM):
+        self.workers = workers
+        self.tasks_per_worker = tasks_per_worker
+        self.timeout = timeout
+        self.memory_headroom = memory_headroom
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                context = multiprocessing.get_context("forkserver")
+                context.set_forkserver_preload(list(render_worker.PRELOAD_MODULES))
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=context,
+                    initializer=render_worker.init_worker,
+                    initargs=(self.memory_headroom,),
+                    max_tasks_per_child=self.tasks_per_worker,
+                )
+            return self._executor
+
+    def start(self):
+        """Start every worker now so the first charts don't pay for process start-up."""
+        executor = self._get_executor()
+        for future in [executor.submit(render_worker.ping) for _ in range(self.workers)]:
+            future.result()
+
+    def _discard(self, executor):
+        with self._lock:
+            if self._executor is not executor:
+                return  # Another render already replaced this pool
+            self._executor = None
+        # A hung render ignores cancellation, so its worker has to be killed outright
+        for process in list((executor._processes or {}).values()):
+            process.kill()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    async def render(self, func, *args):
+        """Run a render_worker function in the pool and return its PNG bytes."""
+        executor = self._get_executor()
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(executor.submit(func, *args)), self.timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Render {func.__name__} timed out after {self.timeout}s; restarting render pool")
+            self._discard(executor)
+            raise
+        except BrokenProcessPool:
+            logger.warning(f"Render pool broke during {func.__name__}; restarting it")
+            self._discard(executor)
+            raise
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+RENDER_POOL = RenderPool()
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking callable on the I/O thread pool and await its result."""
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    try:
+        return await loop.run_in_executor(IO_EXECUTOR, functools.partial(func, *args, **kwargs))
+    finally:
+        record_phase("fetch", time.perf_counter() - started)
+
+
+async def run_render(func, *args):
+    """Render a chart with a render_worker function in the render pool and return PNG bytes."""
+    started = time.perf_counter()
+    try:
+        return await RENDER_POOL.render(func, *args)
+    finally:
+        record_phase("render", time.perf_counter() - started)
+
+
+async def run_command(*args, timeout=None):
+    """Run a shell tool as an asyncio subprocess and return (returncode, stdout, stderr)."""
+    started = time.perf_counter()
+    proc = await asyncio.create_subprocess_exec(
+        *args,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise
+    finally:
+        record_phase("fetch", time.perf_counter() - started)
+    return proc.returncode, stdout.decode(errors="replace"), stderr.decode(errors="replace")
+
+
+### --- COALESCING & RATE LIMITS --- ###
+# Identical requests that arrive together (several people tapping the same chart
+# while a stream stutters) share one computation: the key already carries the
+# command, its arguments and the data version, so anyone asking for the same key
+# while it is in flight awaits the same task. Independently, every user has a token
+# bucket; each command costs tokens by its cost class, so one client can't keep the
+# render pool busy for everyone else.
+RATE_LIMIT_BURST = 6
+RATE_LIMIT_PER_SECOND = 0.5
+COMMAND_COSTS = {"light": 0.25, "chart": 1.0, "system": 1.0}
+
+
+class SingleFlight:
+    """Runs at most one computation per key at a time and shares its result with concurrent callers."""
+
+    def __init__(self):
+        self._inflight = {}
+        self.shared = 0  # Callers that reused an in-flight computation
+
+    async def do(self, key, func):
+        task = self._inflight.get(key)
+        if task is None:
+            # A separate task, so a caller giving up doesn't cancel it for the others
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+
+class RateLimiter:
+    """Per-user token buckets refilled continuously at `rate` tokens per second up to `burst`."""
+
+    def __init__(self, burst=RATE_LIMIT_BURST, rate=RATE_LIMIT_PER_SECOND, clock=time.monotonic):
+        self.burst = burst
+        self.rate = rate
+        self.clock = clock
+        self._buckets = {}  # user_id -> (tokens, last refill)
+
+    def acquire(self, user_id, cost):
+        """Take `cost` tokens and return 0, or return the seconds until enough tokens are available."""
+        now = self.clock()
+        tokens, last = self._buckets.get(user_id, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        if tokens >= cost:
+            self._buckets[user_id] = (tokens - cost, now)
+            return 0.0
+        self._buckets[user_id] = (tokens, now)
+        return (cost - tokens) / self.rate
+
+
+CHART_FLIGHTS = SingleFlight()
+RATE_LIMITER = RateLimiter()
+
+
+### --- TEXT CHARTS --- ###
+# Trend commands can answer with a text message instead of a PNG: one Unicode
+# sparkline per series plus min/avg/max/latest, built from the same fetch() result
+# the chart would be rendered from, so there is no render and no upload. The mode
+# is picked per command ("/temptrend 6h text") or from the user's default
+# (/chartmode), and dispatch() passes it to send_chart() through _chart_mode.
+CHART_MODES = ("image", "text")
+SPARK_BLOCKS = "▁▂▃▄▅▆▇█"
+SPARKLINE_WIDTH = 24
+
+_chart_mode = contextvars.ContextVar("chart_mode", default="image")
+
+
+class UserPrefs:
+    """Per-user chart mode, cached in memory and written through to the user_prefs table."""
+
+    def __init__(self):
+        self._modes = {}
+
+    def load(self, conn):
+        """Read every user's preferences (called once at startup)."""
+        self._modes = dict(conn.execute("SELECT user_id, chart_mode FROM user_prefs"))
+
+    def chart_mode(self, user_id):
+        return self._modes.get(user_id, "image")
+
+    def set_chart_mode(self, user_id, mode):
+        if mode not in CHART_MODES:
+            raise ValueError(f"Unknown chart mode '{mode}'")
+        DB_WRITER.call(lambda conn: conn.execute(
+            "INSERT OR REPLACE INTO user_prefs (user_id, chart_mode) VALUES (?, ?)", (user_id, mode)
+        )).result()
+        self._modes[user_id] = mode
+
+
+USER_PREFS = UserPrefs()
+
+
+def pop_chart_mode(context):
+    """Remove any 'text'/'image' argument from context.args and return the last one given (or None)."""
+    args = context.args or []
+    modes = [arg.lower() for arg in args if arg.lower() in CHART_MODES]
+    if not modes:
+        return None
+    context.args = [arg for arg in args if arg.lower() not in CHART_MODES]
+    return modes[-1]
+
+
+def sparkline(values, width=SPARKLINE_WIDTH):
+    """Draw values as block characters, averaging them down to at most `width` columns."""
+    if len(values) > width:
+        step = len(values) / width
+        values = [
+            sum(chunk) / len(chunk)
+            for chunk in (values[int(i * step):int((i + 1) * step)] for i in range(width))
+        ]
+    low, high = min(values), max(values)
+    if high == low:
+        return SPARK_BLOCKS[0] * len(values)
+    top = len(SPARK_BLOCKS) - 1
+    return "".join(SPARK_BLOCKS[round((value - low) / (high - low) * top)] for value in values)
+
+
+def summarize_series(label, series, unit="", precision=1):
+    """Describe a (timestamps, values) series in two lines: its sparkline, then min/avg/max/latest."""
+    values = [value for value in series[1] if value is not None]
+    if not values:
+        return f"{label}: no data"
+    fmt = f".{precision}f"
+    return (
+        f"{label} {sparkline(values)}\n"
+        f"    min {min(values):{fmt}} · avg {sum(values) / len(values):{fmt}} · "
+        f"max {max(values):{fmt}} · now {values[-1]:{fmt}}{unit}"
+    )
+
+
+def text_temperature_trend(range_label, cpu, gpu):
+    return "\n".join((
+        f"🌡 Temperatures (Last {range_label})",
+        summarize_series("CPU", cpu, "°C"),
+        summarize_series("GPU", gpu, "°C"),
+    ))
+
+
+def text_network_activity(range_label, interface, rx, tx, rx_peak, tx_peak):
+    lines = [
+        f"📊 Network Activity on {interface} (Last {range_label})",
+        summarize_series("RX", rx, " Mbps"),
+        summarize_series("TX", tx, " Mbps"),
+    ]
+    peaks = [max(filter(None, values), default=0) for values in (rx_peak[1], tx_peak[1])]
+    lines.append(f"Peak: {peaks[0]:.1f} Mbps down, {peaks[1]:.1f} Mbps up")
+    return "\n".join(lines)
+
+
+def text_disk_usage(range_label, used, available):
+    return "\n".join((
+        f"📁 HDD Usage (Last {range_label})",
+        summarize_series("Used", used, " GB"),
+        summarize_series("Free", available, " GB"),
+    ))
+
+
+def text_disk_io(range_label, series):
+    lines = [f"💽 Disk I/O (Last {range_label})"]
+    for disk, columns in series.items():
+        lines.append(summarize_series(f"{disk} read", columns["read_mb_s"], " MB/s", precision=2))
+        lines.append(summarize_series(f"{disk} write", columns["write_mb_s"], " MB/s", precision=2))
+    return "\n".join(lines)
+
+
+def text_network_info(interface, timestamps, speeds, duplexes):
+    half = len(duplexes) - sum(duplexes)
+    return "\n".join((
+        f"🌐 Network Info for {interface} (Last {len(speeds)} Entries)",
+        summarize_series("Speed", (timestamps, speeds), " Mbps", precision=0),
+        f"Duplex: {'Full' if duplexes[-1] else 'Half'} now, half duplex in {half} of {len(duplexes)} samples",
+    ))
+
+
+def text_transcode_load(range_label, series):
+    lines = [f"🔥 Transcode Load (Last {range_label})"]
+    for column, label, unit in (("cpu_temp", "CPU temp", "°C"), ("gpu_temp", "GPU temp", "°C"),
+                                ("cpu_percent", "CPU load", "%"), ("gpu_enc_util", "GPU encoder", "%"),
+                                ("streams", "Streams", ""), ("transcodes", "Transcodes", "")):
+        lines.append(summarize_series(label, series[column], unit))
+    return "\n".join(lines)
+
+
+def text_bot_health(range_label, gauges, collectors, tables):
+    lines = [f"🩺 Bot Health (Last {range_label})"]
+    for column, label in (("rss_mb", "Bot RSS"), ("db_mb", "Database"), ("wal_mb", "WAL")):
+        lines.append(summarize_series(label, gauges[column], " MB"))
+    lines.append(summarize_series("Writer queue", gauges["writer_queue"], precision=0))
+    for name, series in collectors.items():
+        if series["duration_ms"][1]:
+            lines.append(summarize_series(f"{name} run", series["duration_ms"], " ms"))
+    return "\n".join(lines)
+
+
+# Text equivalents of the trend charts, keyed by the render function send_chart() is given
+TEXT_CHARTS = {
+    render_temperature_trend: text_temperature_trend,
+    render_network_activity: text_network_activity,
+    render_disk_usage: text_disk_usage,
+    render_disk_io: text_disk_io,
+    render_network_info: text_network_info,
+    render_transcode_load: text_transcode_load,
+    render_bot_health: text_bot_health,
+}
+
+
+### --- CHART RENDERING & CACHE --- ###
+# Charts are rendered into memory instead of fixed /tmp paths, and the PNG bytes are
+# cached under (chart type, range, newest row id) so repeat requests inside the same
+# logging minute skip both the query and matplotlib. Once Telegram has a copy of a
+# chart version, its file_id is remembered and resent instead of re-uploading.
+class ChartCache:
+    """
+    Thread-safe LRU cache of rendered PNG bytes, bounded by entry count and total size.
+
+    Telegram file_ids of uploaded charts and the text summaries some charts are
+    sent with are kept alongside, under the same keys.
+    """
+
+    def __init__(self, max_entries=32, max_bytes=8 * 1024 * 1024, max_file_ids=256):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_file_ids = max_file_ids
+        self._entries = OrderedDict()
+        self._file_ids = OrderedDict()
+        self._summaries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get_file_id(self, key):
+        with self._lock:
+            file_id = self._file_ids.get(key)
+            if file_id is not None:
+                self._file_ids.move_to_end(key)
+            return file_id
+
+    def put_file_id(self, key, file_id):
+        with self._lock:
+            self._file_ids[key] = file_id
+            self._file_ids.move_to_end(key)
+            while len(self._file_ids) > self.max_file_ids:
+                self._file_ids.popitem(last=False)
+
+    def drop_file_id(self, key):
+        with self._lock:
+            self._file_ids.pop(key, None)
+
+    def get_summary(self, key):
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is not None:
+                self._summaries.move_to_end(key)
+            return summary
+
+    def put_summary(self, key, summary):
+        with self._lock:
+            self._summaries[key] = summary
+            self._summaries.move_to_end(key)
+            while len(self._summaries) > self.max_file_ids:
+                self._summaries.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            png = self._entries.get(key)
+            if png is not None:
+                self._entries.move_to_end(key)
+            return png
+
+    def put(self, key, png):
+        if len(png) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = png
+            self._size += len(png)
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+
+CHART_CACHE = ChartCache()
+
+
+def format_timestamp(epoch):
+    """Format a stored epoch timestamp as local time for chart labels."""
+    return datetime.fromtimestamp(epoch).strftime('%Y-%m-%d %H:%M')
+
+
+def get_latest_row_id(table):
+    """Return the newest row id of a log table, used as the data version for chart caching."""
+    cursor = get_read_connection().cursor()
+    cursor.execute(f"SELECT MAX(id) FROM {table}")
+    return cursor.fetchone()[0]
+
+
+async def get_cached_chart(key, fetch, render):
+    """
+    Return PNG bytes for a chart, rendering only on a cache miss.
+
+    fetch() runs on the I/O pool and returns the render arguments, or None when
+    there is no data (in which case None is returned and nothing is cached).
+    Concurrent misses for the same key share a single fetch and render.
+    """
+    png = CHART_CACHE.get(key)
+    if png is not None:
+        return png
+
+    async def build():
+        data = await run_blocking(fetch)
+        if data is None:
+            return None
+        png = await run_render(render, *data)
+        CHART_CACHE.put(key, png)
+        return png
+
+    return await CHART_FLIGHTS.do(key, build)
+
+
+async def send_chart(update: Update, context: ContextTypes.DEFAULT_TYPE, key, fetch, render):
+    """
+    Send a chart, reusing the Telegram file_id of an earlier upload of the same version.
+
+    In text mode (see TEXT CHARTS) trend charts are sent as a sparkline summary
+    instead. Returns False when fetch() reports there is no data to plot.
+    """
+    text = TEXT_CHARTS.get(render)
+    if text is not None and _chart_mode.get() == "text":
+        data = await run_blocking(fetch)
+        if data is None:
+            return False
+        await update.message.reply_text(text(*data))
+        return True
+
+    chat_id = update.message.chat_id
+    return await send_cached_photo(lambda photo: context.bot.send_photo(chat_id=chat_id, photo=photo), key, fetch, render)
+
+
+async def send_cached_photo(send, key, fetch, render):
+    """
+    Call send(photo) with the chart's file_id if Telegram already has this version,
+    else with freshly rendered PNG bytes, remembering the file_id of the upload.
+    Returns False when fetch() reports there is no data to plot.
+    """
+    file_id = CHART_CACHE.get_file_id(key)
+    if file_id is not None:
+        try:
+            await send(file_id)
+            return True
+        except BadRequest as e:
+            if "not modified" in str(e).lower():
+                raise
+            logger.warning(f"Cached file_id for {key[0]} rejected, re-uploading: {e}")
+            CHART_CACHE.drop_file_id(key)
+
+    png = await get_cached_chart(key, fetch, render)
+    if png is None:
+        return False
+    message = await send(png)
+    if getattr(message, "photo", None):
+        CHART_CACHE.put_file_id(key, message.photo[-1].file_id)
+    return True
+
+
+async def reply_in_chunks(message, lines):
+    """Reply with lines joined into as few messages as fit Telegram's 4096 character limit, split on line boundaries."""
+    chunk = ""
+    for line in lines:
+        if len(chunk) + len(line) + 1 > 4096:
+            await message.reply_text(chunk)
+            chunk = ""
+        chunk += line + "\n"
+    if chunk:
+        await message.reply_text(chunk)
 
 def check_authorization(update: Update) -> bool:
     user_id = update.message.from_user.id
-    return user_id in AUTHORIZED_USERS
+    return AUTH.is_authorized(user_id)
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
-        if not check_authorization(update):
-            await update.message.reply_text("You are not authorized to use this bot.")
-            return
-
         user_id = update.message.from_user.id
         logger.info(f"User {user_id} started the bot.")
 
-        # ✅ UPDATED KEYBOARD WITH NETWORK OPTIONS
-        keyboard = [
-            ['🔄 Restart', '⏱ Uptime'],
-            ['🛠 Services', '🌡 CPU Temp'],
-            ['🌡 GPU Temp', '📊 CPU Load'],
-            ['👥 Plex Users', '💾 HDD Capacity'],
-            ['📁 Disk Usage', '💻 Memory'],
-            ['📡 Network Speed', '📊 Network Activity'],  # ✅ UPDATED ROW
-            ['🔍 Processes', '⬆️ Update & Upgrade'],
-            ['📉 Temp Trend', '🔻 Shutdown']
-        ]
+        # Generated from the command registry; admin-only buttons are hidden from standard users
+        keyboard = build_keyboard(AUTH.role(user_id))
 
         reply_markup = ReplyKeyboardMarkup(keyboard, one_time_keyboard=False, resize_keyboard=True)
         await update.message.reply_text('Choose an option:', reply_markup=reply_markup)
@@ -159,44 +1759,9 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_id = update.message.from_user.id
         logger.info(f"Received message '{text}' from user {user_id}")
 
-        if text == '🔄 Restart':
-            await restart(update, context)
-        elif text == '⏱ Uptime':
-            await check_uptime(update, context)
-        elif text == '🛠 Services':
-            await check_services(update, context)
-        elif text == '🌡 CPU Temp':
-            await check_cpu_temp(update, context)
-        elif text == '🌡 GPU Temp':
-            await check_gpu_temp(update, context)
-        elif text == '📊 CPU Load':
-            await check_cpu_load(update, context)
-        elif text == '👥 Plex Users':
-            await check_plex_users(update, context)
-        elif text == '💾 HDD Capacity':
-            await check_hdd_capacity(update, context)
-        elif text == '📁 Disk Usage':
-            await check_disk_usage(update, context)
-        elif text == '💻 Memory':
-            await check_memory_usage(update, context)
-        elif text == '🌐 Network Info':
-            await check_network_info(update, context)
-        elif text == '📡 Network Speed':  # Added NIC speed function
-            await check_network_speed_status(update, context)
-        elif text == '📊 Network Activity':  # Added real-time Mbps activity function
-            await check_network_activity(update, context)
-        elif text == '🔍 Processes':
-            await check_running_processes(update, context)
-        elif text == '⬆️ Update & Upgrade':
-            await confirm_update_upgrade(update, context)
-        elif text == 'Yes, proceed with Update & Upgrade':
-            await update_upgrade(update, context)
-        elif text == 'No, cancel Update & Upgrade':
-            await cancel_update_upgrade(update, context)
-        elif text == '🔻 Shutdown':
-            await shutdown(update, context)
-        elif text == '📉 Temp Trend':
-            await check_temperature_trend(update, context)
+        command = COMMANDS_BY_LABEL.get(text)
+        if command is not None:
+            await dispatch(command, update, context)
         else:
             logger.warning(f"Unknown command '{text}' received from user {user_id}")
             await update.message.reply_text('Unknown command. Please choose an option from the keyboard.')
@@ -210,38 +1775,24 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def check_network_speed_status(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
-        if not check_authorization(update):
-            await update.message.reply_text("You are not authorized to use this bot.")
-            return
-
         user_id = update.message.from_user.id
         logger.info(f"User {user_id} checked network speed status.")
 
-        # ✅ Auto-detect active network interface
-        result = subprocess.run(['ip', '-o', 'link'], capture_output=True, text=True)
-        interfaces = re.findall(r'^\d+: (\w+):', result.stdout, re.MULTILINE)
-        
-        active_interface = None
-        for interface in interfaces:
-            if not interface.startswith("lo"):  # Ignore loopback
-                active_interface = interface
-                break
+        # ✅ Read link settings for every interface from sysfs instead of forking ethtool
+        def read_all_link_settings():
+            return {interface: read_link_settings(interface) for interface in sorted(read_interface_counters())}
 
-        if not active_interface:
+        links = await run_blocking(read_all_link_settings)
+        if not links:
             await update.message.reply_text("❌ No active network interface found.")
             return
 
-        # Run ethtool on detected interface
-        result = subprocess.run(['ethtool', active_interface], capture_output=True, text=True)
-        speed, duplex = None, None
-        for line in result.stdout.splitlines():
-            if "Speed:" in line:
-                speed = line.split(":")[1].strip()
-            if "Duplex:" in line:
-                duplex = line.split(":")[1].strip()
-
-        if speed and duplex:
-            response = f"📡 **Network Interface ({active_interface}) Speed:** {speed}\n🔄 **Duplex Mode:** {duplex}"
+        lines = []
+        for interface, (speed, duplex) in links.items():
+            if speed or duplex:
+                lines.append(f"📡 **{interface}:** {speed or 'unknown'} ({duplex or 'unknown'} duplex)")
+        if lines:
+            response = "\n".join(lines)
         else:
             response = "❌ Unable to retrieve network speed status."
 
@@ -252,101 +1803,321 @@ async def check_network_speed_status(update: Update, context: ContextTypes.DEFAU
         await update.message.reply_text("An error occurred while checking network speed status.")
 
 
+def fetch_network_activity(seconds, interface):
+    """Return downsampled (timestamps, values) series for rx, tx, rx peak and tx peak Mbps on one interface."""
+    series = fetch_series("network", seconds, stats={"rx_peak_mbps": "max", "tx_peak_mbps": "max"}, group=interface)
+    return series["rx_mbps"], series["tx_mbps"], series["rx_peak_mbps"], series["tx_peak_mbps"]
+
+
 async def check_network_activity(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
-        timestamps, rx_mbps, tx_mbps = [], [], []
-
-        with sqlite3.connect(DB_PATH) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT timestamp, rx_mbps, tx_mbps FROM network_logs ORDER BY timestamp DESC LIMIT 60")
-            rows = cursor.fetchall()
-            for row in rows[::-1]:
-                timestamps.append(row[0])
-                rx_mbps.append(row[1] if row[1] is not None else 0)
-                tx_mbps.append(row[2] if row[2] is not None else 0)
-
-        if not rx_mbps:
-            await update.message.reply_text("No network activity data available.")
+        try:
+            seconds, rest = split_range_args(context.args, default=3600)
+        except ValueError:
+            await update.message.reply_text("Usage: /networkactivity [range] [interface], e.g. /networkactivity 6h eth0")
             return
+        range_label = format_time_range(seconds)
+        interface = rest[0] if rest else await run_blocking(detect_default_interface)
 
-        plt.figure(figsize=(10, 5))
-        plt.plot(range(len(rx_mbps)), rx_mbps, label='Download (RX Mbps)', marker='o')
-        plt.plot(range(len(tx_mbps)), tx_mbps, label='Upload (TX Mbps)', marker='x')
-
-        plt.xticks([])  # Remove timestamps
-        plt.xlabel("Last 60 Minutes")
-        plt.ylabel("Mbps")
-        plt.title("📊 Network Activity (Last 60 Minutes)")
-        plt.legend()
-        plt.tight_layout()
-        plt.savefig('/tmp/network_activity.png')
-        plt.close()
+        # Short ranges plot the 5s samples, so bursts inside a minute aren't averaged away
+        burst = NETWORK_SAMPLER.covers(interface, seconds)
 
-        await context.bot.send_photo(chat_id=update.message.chat_id, photo=open('/tmp/network_activity.png', 'rb'))
+        def fetch():
+            rx, tx, rx_peak, tx_peak = fetch_network_activity(seconds, interface)
+            if burst:
+                rx, tx = NETWORK_SAMPLER.history(interface, seconds)
+            return (range_label, interface, rx, tx, rx_peak, tx_peak) if rx[0] or tx[0] else None
 
+        if burst:
+            version = ("5s", NETWORK_SAMPLER.latest(interface))
+        else:
+            version = await series_version("network", seconds)
+        key = ("network_activity", seconds, interface, version)
+        if not await send_chart(update, context, key, fetch, render_network_activity):
+            await update.message.reply_text("No network activity data available.")
+            return
     except Exception as e:
         logger.error(f"Error in check_network_activity: {e}")
         await update.message.reply_text("An error occurred while generating the network activity graph.")
 
-def log_network_activity():
+### --- NETWORK SAMPLING --- ###
+# /proc/net/dev exposes cumulative byte counters, so rates come from the difference
+# between consecutive snapshots. Each tick parses the file once for every interface
+# except loopback (and per-container veth pairs, which docker0 already aggregates).
+# The sampler runs every NETWORK_SAMPLE_SECONDS and keeps the last hour of samples
+# in memory, which /networkactivity plots for ranges it covers. Only per-minute
+# avg/peak per interface is persisted, so short bursts during streams still show
+# up as peaks on longer ranges.
+NETWORK_SAMPLE_SECONDS = 5
+NETWORK_HISTORY_SECONDS = 3600
+NETWORK_IGNORED_PREFIXES = ("lo", "veth")
+# Anything faster than this is a counter reset, not traffic
+MAX_PLAUSIBLE_MBPS = 100_000
+
+
+def read_interface_counters():
+    """Return {interface: (rx_bytes, tx_bytes)} for every monitored interface from one read of /proc/net/dev."""
+    counters = {}
+    with open("/proc/net/dev", "r") as f:
+        for line in f:
+            name, sep, data = line.partition(":")
+            name = name.strip()
+            if not sep or name.startswith(NETWORK_IGNORED_PREFIXES):
+                continue
+            fields = data.split()
+            counters[name] = (int(fields[0]), int(fields[8]))
+    return counters
+
+
+def read_link_settings(interface):
+    """
+    Return (speed, duplex) for an interface from /sys/class/net, e.g. ('1000Mb/s', 'Full').
+
+    Either value is None when the kernel doesn't report it (virtual interfaces,
+    links that are down).
+    """
+    base = f"/sys/class/net/{interface}"
+    speed = duplex = None
     try:
-        # ✅ Detect active network interface
-        with open("/proc/net/dev", "r") as f:
-            lines = f.readlines()
+        with open(f"{base}/speed") as f:
+            value = int(f.read().strip())
+            speed = f"{value}Mb/s" if value > 0 else None
+    except (OSError, ValueError):
+        pass
+    try:
+        with open(f"{base}/duplex") as f:
+            value = f.read().strip()
+            duplex = value.capitalize() if value in ("full", "half") else None
+    except OSError:
+        pass
+    return speed, duplex
 
-        active_interface = None
-        for line in lines:
-            if "eth0" in line or "ens" in line or "enp" in line or "wlan" in line:
-                active_interface = line.split(":")[0].strip()
-                break  # Use the first matching interface
 
-        if not active_interface:
-            logger.error("No active network interface found.")
+def detect_default_interface():
+    """Return the interface carrying the default route, falling back to the first monitored interface."""
+    try:
+        with open("/proc/net/route", "r") as f:
+            next(f, None)
+            for line in f:
+                fields = line.split()
+                if len(fields) > 1 and fields[1] == "00000000":
+                    return fields[0]
+    except OSError:
+        pass
+    interfaces = sorted(read_interface_counters())
+    return interfaces[0] if interfaces else None
+
+
+def counter_delta(previous, current):
+    """
+    Return how far a byte counter advanced, allowing for wraparound.
+
+    A counter that went backwards either wrapped (32-bit counters on older drivers)
+    or was reset (interface reset or reboot). A wrap is only assumed when the
+    previous value was in the top half of the 32-bit range; anything else is a
+    reset and returns None.
+    """
+    if current >= previous:
+        return current - previous
+    if 2 ** 31 <= previous < 2 ** 32:
+        return current + 2 ** 32 - previous
+    return None
+
+
+class NetworkRateSampler:
+    """Turns cumulative interface counters into Mbps samples and per-minute avg/peak aggregates."""
+
+    def __init__(self, history_seconds=NETWORK_HISTORY_SECONDS, interval=NETWORK_SAMPLE_SECONDS):
+        self.interval = interval
+        self.history_length = max(1, history_seconds // interval)
+        self.recent = {}  # interface -> deque of (epoch, rx_mbps, tx_mbps)
+        self._previous = {}  # interface -> (rx_bytes, tx_bytes)
+        self._previous_time = None
+        self._pending = {}  # interface -> [(rx_mbps, tx_mbps), ...]
+        self._lock = threading.Lock()
+
+    def sample(self):
+        counters = read_interface_counters()
+        now = time.monotonic()
+        previous, self._previous = self._previous, counters
+        previous_time, self._previous_time = self._previous_time, now
+        if previous_time is None or now <= previous_time:
+            return
+        elapsed = now - previous_time
+        epoch = time.time()
+
+        with self._lock:
+            # Interfaces that went away (e.g. a stopped container's bridge) stop being tracked
+            for interface in list(self.recent):
+                if interface not in counters:
+                    del self.recent[interface]
+            for interface, (rx_total, tx_total) in counters.items():
+                if interface not in previous:
+                    continue
+                rx_bytes = counter_delta(previous[interface][0], rx_total)
+                tx_bytes = counter_delta(previous[interface][1], tx_total)
+                if rx_bytes is None or tx_bytes is None:
+                    logger.warning(f"Network counters on {interface} reset; skipping one sample.")
+                    continue
+                rx_mbps = rx_bytes * 8 / 1e6 / elapsed
+                tx_mbps = tx_bytes * 8 / 1e6 / elapsed
+                if rx_mbps > MAX_PLAUSIBLE_MBPS or tx_mbps > MAX_PLAUSIBLE_MBPS:
+                    logger.warning(f"Discarding implausible network sample on {interface}.")
+                    continue
+                if interface not in self.recent:
+                    self.recent[interface] = deque(maxlen=self.history_length)
+                self.recent[interface].append((epoch, rx_mbps, tx_mbps))
+                self._pending.setdefault(interface, []).append((rx_mbps, tx_mbps))
+
+    def covers(self, interface, seconds):
+        """Return whether the 5s history of an interface reaches back `seconds`."""
+        with self._lock:
+            samples = self.recent.get(interface)
+            return bool(samples) and samples[0][0] <= time.time() - seconds + 2 * self.interval
+
+    def latest(self, interface):
+        """Return the time of the newest 5s sample of an interface, or None."""
+        with self._lock:
+            samples = self.recent.get(interface)
+            return samples[-1][0] if samples else None
+
+    def history(self, interface, seconds):
+        """Return downsampled ((timestamps, rx_mbps), (timestamps, tx_mbps)) of the 5s samples in the last `seconds`."""
+        start = time.time() - seconds
+        with self._lock:
+            samples = [sample for sample in self.recent.get(interface, ()) if sample[0] >= start]
+        xs = [sample[0] for sample in samples]
+        return lttb(xs, [sample[1] for sample in samples]), lttb(xs, [sample[2] for sample in samples])
+
+    def flush(self):
+        """Return {interface: (rx_avg, tx_avg, rx_peak, tx_peak)} since the last flush."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        stats = {}
+        for interface, samples in pending.items():
+            rx = [p[0] for p in samples]
+            tx = [p[1] for p in samples]
+            stats[interface] = (sum(rx) / len(rx), sum(tx) / len(tx), max(rx), max(tx))
+        return stats
+
+
+NETWORK_SAMPLER = NetworkRateSampler()
+
+
+### --- PROCESS SAMPLING --- ###
+# psutil's cpu_percent is the CPU time used since the previous call on the same
+# Process object, so a one-off scan always reports 0. A background thread rescans
+# every PROCESS_SAMPLE_SECONDS (process_iter reuses its cached Process objects) and
+# publishes an immutable snapshot that /services and /processes read directly.
+PROCESS_SAMPLE_SECONDS = 5
+
+
+class ProcessSampler:
+    """Keeps a sorted snapshot of per-process CPU and memory usage."""
+
+    def __init__(self, interval=PROCESS_SAMPLE_SECONDS):
+        self.interval = interval
+        # (epoch, ((pid, name, username, cpu_percent, rss_mb), ...)) busiest first; swapped atomically
+        self.snapshot = None
+        self._primed = False
+
+    def sample(self):
+        rows = []
+        for p in psutil.process_iter(['pid', 'name', 'username', 'cpu_percent', 'memory_info']):
+            info = p.info
+            memory = info['memory_info']
+            rows.append((
+                info['pid'],
+                info['name'] or '?',
+                info['username'] or '?',
+                info['cpu_percent'] or 0.0,
+                memory.rss / (1024 ** 2) if memory else 0.0
+            ))
+        if not self._primed:
+            # First pass only establishes the baseline CPU times
+            self._primed = True
             return
+        rows.sort(key=lambda row: (row[3], row[4]), reverse=True)
+        self.snapshot = (time.time(), tuple(rows))
 
-        for line in lines:
-            if active_interface in line:
-                data = line.split()
-                rx_bytes = int(data[1])  # Received bytes
-                tx_bytes = int(data[9])  # Transmitted bytes
+    def top_cpu(self, limit=10):
+        """Return up to `limit` (name, cpu_percent) pairs for processes using CPU, or None before the first sample."""
+        snapshot = self.snapshot
+        if snapshot is None:
+            return None
+        return [(row[1], row[3]) for row in snapshot[1][:limit] if row[3] > 0]
 
-                timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
-                # Convert bytes to Mbps (assuming a 1-minute interval)
-                rx_mbps = (rx_bytes * 8) / (1024 ** 2)
-                tx_mbps = (tx_bytes * 8) / (1024 ** 2)
+PROCESS_SAMPLER = ProcessSampler()
 
-                with sqlite3.connect(DB_PATH) as conn:
-                    cursor = conn.cursor()
-                    cursor.execute("""
-                        INSERT INTO network_logs (timestamp, rx_mbps, tx_mbps)
-                        VALUES (?, ?, ?)
-                    """, (timestamp, rx_mbps, tx_mbps))
-                    conn.commit()
 
-                logger.info(f"Logged network activity: RX {rx_mbps:.2f} Mbps, TX {tx_mbps:.2f} Mbps on {active_interface}")
 
+async def add_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
+        user_id = update.message.from_user.id
+        args = context.args or []
+        role = args[1].lower() if len(args) > 1 else "standard"
+        if not args or not args[0].isdigit() or role not in ROLES:
+            await update.message.reply_text("Usage: /adduser <telegram user id> [admin|standard]")
+            return
+        new_user_id = int(args[0])
+
+        await run_blocking(AUTH.set_role, new_user_id, role)
+        logger.info(f"User {user_id} added user {new_user_id} as {role}.")
+        await update.message.reply_text(f"✅ User {new_user_id} added as {role}.")
     except Exception as e:
-        logger.error(f"Error logging network activity: {e}")
+        logger.error(f"Error in add_user command: {e}")
+        await update.message.reply_text("An error occurred while adding the user.")
 
 
+async def remove_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
+        user_id = update.message.from_user.id
+        args = context.args or []
+        if not args or not args[0].isdigit():
+            await update.message.reply_text("Usage: /removeuser <telegram user id>")
+            return
+        removed_user_id = int(args[0])
 
-async def restart(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        users = AUTH.users()
+        if removed_user_id not in users:
+            await update.message.reply_text(f"User {removed_user_id} is not authorized.")
+            return
+        admins = [uid for uid, role in users.items() if role == "admin"]
+        if admins == [removed_user_id]:
+            await update.message.reply_text("Can't remove the last admin.")
+            return
+
+        await run_blocking(AUTH.remove, removed_user_id)
+        logger.info(f"User {user_id} removed user {removed_user_id}.")
+        await update.message.reply_text(f"✅ User {removed_user_id} removed.")
+    except Exception as e:
+        logger.error(f"Error in remove_user command: {e}")
+        await update.message.reply_text("An error occurred while removing the user.")
+
+
+async def list_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         user_id = update.message.from_user.id
+        logger.info(f"User {user_id} listed authorized users.")
+        users = AUTH.users()
+        response = "👤 Authorized users:\n" + "\n".join(
+            f"{uid}: {role}" for uid, role in sorted(users.items(), key=lambda item: (item[1], item[0]))
+        )
+        await update.message.reply_text(response)
+    except Exception as e:
+        logger.error(f"Error in list_users command: {e}")
+        await update.message.reply_text("An error occurred while listing users.")
 
-        # Fetch the admin user ID dynamically
-        admin_user_id = get_admin_user()
 
-        if user_id != admin_user_id:
-            logger.warning(f"User {user_id} attempted to restart the server.")
-            await update.message.reply_text("You are not authorized to restart the server.")
-            return
+async def restart(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
+        user_id = update.message.from_user.id
 
         logger.info(f"User {user_id} issued restart command.")
         await update.message.reply_text('Restarting server...')
         logger.info("Executing reboot command")
-        subprocess.run(['sudo', '/sbin/reboot'])
+        await run_command('sudo', '/sbin/reboot')
     except Exception as e:
         logger.error(f"Error in restart command: {e}")
         await update.message.reply_text("An error occurred while restarting the server.")
@@ -356,17 +2127,9 @@ async def shutdown(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         user_id = update.message.from_user.id
 
-        # Fetch the admin user ID dynamically
-        admin_user_id = get_admin_user()
-
-        if user_id != admin_user_id:
-            logger.warning(f"User {user_id} attempted to shut down the server.")
-            await update.message.reply_text("You are not authorized to shut down the server.")
-            return
-
         logger.info(f"User {user_id} issued shutdown command.")
         await update.message.reply_text('Shutting down server...')
-        subprocess.run(['sudo', '/sbin/shutdown', '-h', 'now'])
+        await run_command('sudo', '/sbin/shutdown', '-h', 'now')
     except Exception as e:
         logger.error(f"Error in shutdown command: {e}")
         await update.message.reply_text("An error occurred while shutting down the server.")
@@ -374,13 +2137,9 @@ async def shutdown(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def check_uptime(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
-        if not check_authorization(update):
-            await update.message.reply_text("You are not authorized to use this bot.")
-            return
-
         user_id = update.message.from_user.id
         logger.info(f"User {user_id} checked uptime.")
-        up_time_seconds = uptime.uptime()
+        up_time_seconds = await run_blocking(uptime.uptime)
         up_time = timedelta(seconds=int(up_time_seconds))
         await update.message.reply_text(f'Server Uptime: {up_time}')
     except Exception as e:
@@ -389,21 +2148,17 @@ async def check_uptime(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def check_services(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
-        if not check_authorization(update):
-            await update.message.reply_text("You are not authorized to use this bot.")
-            return
-
         user_id = update.message.from_user.id
         logger.info(f"User {user_id} checked services.")
-        time.sleep(1)  # Add a small delay to ensure data is available
-        services = [(p.info['name'], p.info['cpu_percent']) for p in psutil.process_iter(['name', 'cpu_percent']) if p.info['cpu_percent'] > 0]
-        services.sort(key=lambda x: x[1], reverse=True)
-        if not services:
+        services = PROCESS_SAMPLER.top_cpu(10)
+        if services is None:
+            response = "Process data is still being collected. Please try again in a few seconds."
+        elif not services:
             response = "No services are currently using the CPU."
         else:
             response = "Top Services by CPU Usage:\n"
-            for service in services[:10]:
-                response += f"{service[0]}: {service[1]}%\n"
+            for service in services:
+                response += f"{service[0]}: {service[1]:.1f}%\n"
         logger.info(f"Services response: {response}")
         await update.message.reply_text(response)
     except Exception as e:
@@ -412,40 +2167,170 @@ async def check_services(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 def get_plex_token():
     """Retrieve the Plex token from the database."""
-    with sqlite3.connect(DB_PATH) as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT value FROM credentials WHERE key='plex_token'")
-        result = cursor.fetchone()
-        return result[0] if result else None
-
-
+    cursor = get_read_connection().cursor()
+    cursor.execute("SELECT value FROM credentials WHERE key='plex_token'")
+    result = cursor.fetchone()
+    return result[0] if result else None
+
+
+### --- PLEX CLIENT --- ###
+# Talks to the Plex Media Server API over one pooled keep-alive httpx client instead
+# of spawning curl per request. The token travels in the X-Plex-Token header (never
+# on a command line or in a URL), responses are parsed incrementally as they stream
+# in, and /status/sessions is cached for PLEX_SESSIONS_TTL seconds so several users
+# asking at once cost a single request.
+PLEX_DEFAULT_URL = "http://localhost:32400"
+PLEX_SESSIONS_TTL = 5
+PLEX_TIMEOUT = httpx.Timeout(10.0, connect=3.0)
+
+
+def get_plex_url():
+    """Return the Plex server URL from the credentials table, defaulting to the local server."""
+    cursor = get_read_connection().cursor()
+    cursor.execute("SELECT value FROM credentials WHERE key='plex_url'")
+    result = cursor.fetchone()
+    return result[0].rstrip("/") if result else PLEX_DEFAULT_URL
+
+
+def parse_plex_session(item):
+    """Turn one <Video>/<Track>/<Photo> element of /status/sessions into a session dict."""
+    user = item.find("User")
+    player = item.find("Player")
+    session = item.find("Session")
+    media = item.find("Media")
+    transcode = item.find("TranscodeSession")
+
+    title = item.get("title") or "?"
+    if item.get("grandparentTitle"):
+        title = f"{item.get('grandparentTitle')} - {title}"
+
+    if transcode is None:
+        decision = "directplay"
+    elif "transcode" in (transcode.get("videoDecision"), transcode.get("audioDecision")):
+        decision = "transcode"
+    else:
+        decision = "copy"  # Direct stream: remuxed, not re-encoded
+
+    bitrate = session.get("bandwidth") if session is not None else None
+    if not bitrate and media is not None:
+        bitrate = media.get("bitrate")
+
+    return {
+        "session_key": item.get("sessionKey"),
+        "user": user.get("title") if user is not None else "?",
+        "title": title,
+        "player": (player.get("title") or player.get("product")) if player is not None else None,
+        "state": player.get("state") if player is not None else None,
+        "decision": decision,
+        "bitrate": int(bitrate) if bitrate and bitrate.isdigit() else None,  # kbps
+    }
+
+
+class PlexClient:
+    """Async Plex API client with a keep-alive connection pool and a short-lived sessions cache."""
+
+    def __init__(self, base_url, token, timeout=PLEX_TIMEOUT, sessions_ttl=PLEX_SESSIONS_TTL, transport=None):
+        self.base_url = base_url
+        self.token = token
+        self.timeout = timeout
+        self.sessions_ttl = sessions_ttl
+        self.transport = transport  # e.g. a MockTransport when testing against a fake server
+        self._client = None
+        self._sessions = None  # (monotonic expiry, sessions)
+        self._sessions_lock = None
+
+    def _get_client(self):
+        # Created lazily so the pool belongs to the event loop that uses it
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"X-Plex-Token": self.token, "Accept": "application/xml"},
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=4, max_keepalive_connections=2),
+                transport=self.transport,
+            )
+        return self._client
+
+    async def iter_items(self, path):
+        """Stream an XML endpoint and yield each child element of its MediaContainer as it completes."""
+        parser = ET.XMLPullParser(events=("start", "end"))
+        depth = 0
+        async with self._get_client().stream("GET", path) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes():
+                parser.feed(chunk)
+                for event, element in parser.read_events():
+                    if event == "start":
+                        depth += 1
+                        continue
+                    depth -= 1
+                    if depth == 1:
+                        yield element
+                        element.clear()  # Keep memory flat however many items there are
+        parser.close()
+
+    async def sessions(self):
+        """Return the active sessions, served from cache for up to sessions_ttl seconds."""
+        if self._sessions_lock is None:
+            self._sessions_lock = asyncio.Lock()
+        async with self._sessions_lock:
+            cached = self._sessions
+            if cached is not None and time.monotonic() < cached[0]:
+                return cached[1]
+            started = time.perf_counter()
+            try:
+                sessions = [parse_plex_session(item) async for item in self.iter_items("/status/sessions")]
+            finally:
+                record_phase("fetch", time.perf_counter() - started)
+            self._sessions = (time.monotonic() + self.sessions_ttl, sessions)
+            return sessions
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+_plex_client = None
+_plex_client_lock = None
+
+
+async def get_plex_client():
+    """Return the shared PlexClient, or None if no Plex token is stored."""
+    global _plex_client, _plex_client_lock
+    if _plex_client is not None:
+        return _plex_client
+    if _plex_client_lock is None:
+        _plex_client_lock = asyncio.Lock()
+    # Callers arriving while the token is being read wait, rather than each building a client
+    async with _plex_client_lock:
+        if _plex_client is None:
+            token = await run_blocking(get_plex_token)
+            if not token:
+                return None
+            _plex_client = PlexClient(await run_blocking(get_plex_url), token)
+    return _plex_client
+
+
+async def close_plex_client(application):
+    """Stop the history poller and close the Plex connection pool when the bot shuts down."""
+    if _plex_history_task is not None:
+        _plex_history_task.cancel()
+    if _plex_client is not None:
+        await _plex_client.aclose()
 
 
 async def check_plex_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
-        if not check_authorization(update):
-            await update.message.reply_text("You are not authorized to use this bot.")
-            return
-
         user_id = update.message.from_user.id
         logger.info(f"User {user_id} checked Plex users.")
 
-        # Retrieve the Plex token from the database
-        plex_token = get_plex_token()
-        if not plex_token:
+        plex = await get_plex_client()
+        if plex is None:
             await update.message.reply_text("❌ Plex token not found. Please store it using `store_plex_token()`.")
             return
 
-        # Use the stored Plex token
-        command = f"curl http://localhost:32400/status/sessions?X-Plex-Token={plex_token}"
-        result = subprocess.run(command, shell=True, capture_output=True, text=True)
-        xml_data = result.stdout
-
-        # Parse the XML data
-        root = ET.fromstring(xml_data)
-
-        # Extract user names
-        users = [user.get('title') for user in root.findall('.//User')]
+        users = [session["user"] for session in await plex.sessions()]
 
         response = "👥 **Plex Users:**\n" + "\n".join(users) if users else "No active Plex users."
         await update.message.reply_text(response)
@@ -455,15 +2340,318 @@ async def check_plex_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("An error occurred while checking the Plex users.")
 
 
-async def check_cpu_temp(update: Update, context: ContextTypes.DEFAULT_TYPE):
+### --- PLEX STREAM HISTORY --- ###
+# A background task polls /status/sessions every PLEX_HISTORY_POLL_SECONDS and diffs
+# the snapshot against the previous one by session key. Only changes are written:
+# a 'start' row when a stream appears, a 'change' row when its player, transcode
+# decision or bitrate moves, and a 'stop' row (with the watched duration) when it
+# disappears. Every row also carries the number of streams active afterwards, so
+# peaks and watch time are single indexed aggregates rather than snapshot replays.
+PLEX_HISTORY_POLL_SECONDS = 30
+# Bitrate changes smaller than this fraction aren't worth a row
+PLEX_BITRATE_CHANGE = 0.1
+# Streams left open by a restart are only resumed if they were seen this recently
+PLEX_RESUME_SECONDS = 6 * 3600
+
+
+class PlexStreamRecorder:
+    """Tracks active Plex streams and turns successive session snapshots into event rows."""
+
+    def __init__(self):
+        self.active = {}  # session_key -> (started_at, session dict)
+        self._resumed = False
+
+    def resume(self, conn, now=None):
+        """Reload streams whose last event wasn't a stop, so a restart doesn't duplicate their start."""
+        now = int(now if now is not None else time.time())
+        cursor = conn.execute("""
+            SELECT e.session_key, e.user, e.title, e.player, e.decision, e.bitrate,
+                   (SELECT MIN(timestamp) FROM plex_stream_events s
+                    WHERE s.session_key = e.session_key AND s.event = 'start' AND s.id <= e.id)
+            FROM plex_stream_events e
+            WHERE e.id IN (SELECT MAX(id) FROM plex_stream_events WHERE timestamp >= ? GROUP BY session_key)
+              AND e.event != 'stop'
+        """, (now - PLEX_RESUME_SECONDS,))
+        for key, user, title, player, decision, bitrate, started_at in cursor:
+            session = {"session_key": key, "user": user, "title": title, "player": player,
+                       "decision": decision, "bitrate": bitrate}
+            self.active[key] = (started_at or now, session)
+        self._resumed = True
+
+    def _changed(self, old, new):
+        if (old["player"], old["decision"], old["title"]) != (new["player"], new["decision"], new["title"]):
+            return True
+        if not old["bitrate"] or not new["bitrate"]:
+            return old["bitrate"] != new["bitrate"]
+        return abs(new["bitrate"] - old["bitrate"]) > PLEX_BITRATE_CHANGE * old["bitrate"]
+
+    def diff(self, sessions, timestamp):
+        """Apply a snapshot and return the event rows it implies."""
+        current = {s["session_key"]: s for s in sessions if s["session_key"]}
+        rows = []
+
+        def row(event, session, duration=None):
+            return (timestamp, session["session_key"], event, session["user"], session["title"],
+                    session["player"], session["decision"], session["bitrate"], duration, len(self.active))
+
+        for key in [key for key in self.active if key not in current]:
+            started_at, session = self.active.pop(key)
+            rows.append(row("stop", session, max(0, timestamp - started_at)))
+        for key, session in current.items():
+            if key not in self.active:
+                self.active[key] = (timestamp, session)
+                rows.append(row("start", session))
+            elif self._changed(self.active[key][1], session):
+                self.active[key] = (self.active[key][0], session)
+                rows.append(row("change", session))
+        return rows
+
+    def watching(self, now=None):
+        """Return {user: (seconds watched so far, streams)} for streams that are still active."""
+        now = now if now is not None else time.time()
+        totals = {}
+        for started_at, session in list(self.active.values()):
+            watched, streams = totals.get(session["user"], (0, 0))
+            totals[session["user"]] = (watched + max(0, now - started_at), streams + 1)
+        return totals
+
+    async def poll(self):
+        plex = await get_plex_client()
+        if plex is None:
+            return
+        if not self._resumed:
+            await run_blocking(lambda: self.resume(get_read_connection()))
+        rows = self.diff(await plex.sessions(), int(time.time()))
+        if rows:
+            DB_WRITER.insert_many("""
+                INSERT INTO plex_stream_events
+                    (timestamp, session_key, event, user, title, player, decision, bitrate, duration, concurrent)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+
+
+PLEX_RECORDER = PlexStreamRecorder()
+_plex_history_task = None
+
+
+async def run_plex_history():
+    while True:
+        try:
+            await PLEX_RECORDER.poll()
+        except Exception as e:
+            logger.error(f"Error polling Plex sessions: {e}")
+        await asyncio.sleep(PLEX_HISTORY_POLL_SECONDS)
+
+
+async def start_plex_history(application):
+    """Start recording Plex stream history on the bot's event loop."""
+    global _plex_history_task
+    _plex_history_task = asyncio.create_task(run_plex_history())
+
+
+def fetch_plex_peaks(seconds):
+    """Return (overall peak, its timestamp, [(day, peak), ...]) of concurrent streams in the range."""
+    start = int(time.time()) - seconds
+    cursor = get_read_connection().cursor()
+    cursor.execute("""
+        SELECT concurrent, timestamp FROM plex_stream_events
+        WHERE timestamp >= ? ORDER BY concurrent DESC, timestamp DESC LIMIT 1
+    """, (start,))
+    peak = cursor.fetchone()
+    if peak is None:
+        return None
+    cursor.execute("""
+        SELECT date(timestamp, 'unixepoch', 'localtime') AS day, MAX(concurrent) FROM plex_stream_events
+        WHERE timestamp >= ? GROUP BY day ORDER BY day
+    """, (start,))
+    return peak[0], peak[1], cursor.fetchall()
+
+
+def fetch_plex_watch_time(seconds):
+    """Return {user: (seconds watched, streams)} for streams that ended within the range."""
+    cursor = get_read_connection().cursor()
+    cursor.execute("""
+        SELECT user, SUM(duration), COUNT(*) FROM plex_stream_events
+        WHERE event = 'stop' AND timestamp >= ?
+        GROUP BY user
+    """, (int(time.time()) - seconds,))
+    return {row[0]: (row[1] or 0, row[2]) for row in cursor}
+
+
+def format_duration(seconds):
+    """Format seconds as e.g. '3h 25m' or '12m'."""
+    hours, minutes = divmod(int(seconds) // 60, 60)
+    return f"{hours}h {minutes:02d}m" if hours else f"{minutes}m"
+
+
+async def check_plex_peaks(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
-        if not check_authorization(update):
-            await update.message.reply_text("You are not authorized to use this bot.")
+        try:
+            seconds = parse_time_range(context.args, default=7 * 86400)
+        except ValueError:
+            await update.message.reply_text("Usage: /plexpeaks [range], e.g. /plexpeaks 30d")
             return
 
+        user_id = update.message.from_user.id
+        logger.info(f"User {user_id} checked Plex stream peaks.")
+        result = await run_blocking(fetch_plex_peaks, seconds)
+        if result is None:
+            await update.message.reply_text("No Plex stream history recorded yet.")
+            return
+        peak, peak_time, days = result
+        response = (
+            f"📈 Plex concurrent streams (last {format_time_range(seconds)})\n"
+            f"Peak: {peak} at {format_timestamp(peak_time)}\n"
+            f"Now: {len(PLEX_RECORDER.active)}\n\n"
+        )
+        response += "\n".join(f"{day}: {day_peak}" for day, day_peak in days)
+        await update.message.reply_text(response)
+    except Exception as e:
+        logger.error(f"Error in check_plex_peaks: {e}")
+        await update.message.reply_text("An error occurred while checking Plex stream peaks.")
+
+
+async def check_plex_watch_time(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
+        try:
+            seconds = parse_time_range(context.args, default=7 * 86400)
+        except ValueError:
+            await update.message.reply_text("Usage: /plexwatch [range], e.g. /plexwatch 30d")
+            return
+
+        user_id = update.message.from_user.id
+        logger.info(f"User {user_id} checked Plex watch time.")
+        totals = await run_blocking(fetch_plex_watch_time, seconds)
+        # Streams still playing count up to now
+        for user, (watched, active) in PLEX_RECORDER.watching().items():
+            total, streams = totals.get(user, (0, 0))
+            totals[user] = (total + watched, streams + active)
+        if not totals:
+            await update.message.reply_text("No Plex stream history recorded yet.")
+            return
+        response = f"⏱ Plex watch time (last {format_time_range(seconds)})\n"
+        for user, (total, streams) in sorted(totals.items(), key=lambda item: item[1][0], reverse=True):
+            response += f"{user}: {format_duration(total)} ({streams} stream{'s' if streams != 1 else ''})\n"
+        await update.message.reply_text(response)
+    except Exception as e:
+        logger.error(f"Error in check_plex_watch_time: {e}")
+        await update.message.reply_text("An error occurred while checking Plex watch time.")
+
+
+CORRELATION_COLUMNS = ("cpu_temp", "gpu_temp", "cpu_percent", "gpu_util", "gpu_enc_util", "streams", "transcodes")
+
+
+def fetch_transcode_load(seconds, now=None):
+    """
+    Return {column: (timestamps, values)} of temperatures joined with load and stream counts.
+
+    Both collectors write on the same aligned minute, so raw rows (and hourly/daily
+    buckets) join on timestamp equality through their covering indexes. As in
+    fetch_series, rows newer than the last rolled bucket are read from the next
+    finer source.
+    """
+    now = int(now if now is not None else time.time())
+    resolution = choose_resolution(seconds)
+    sources = []
+    if resolution == "daily":
+        sources.append(("daily", 86400))
+    if resolution in ("daily", "hourly"):
+        sources.append(("hourly", 3600))
+    sources.append(("raw", 0))
+
+    cursor = get_read_connection().cursor()
+    points = {c: ([], []) for c in CORRELATION_COLUMNS}
+    since = now - seconds
+    for source, width in sources:
+        if source == "raw":
+            query = f"""
+                SELECT l.timestamp, t.cpu_temp, t.gpu_temp, {', '.join(f'l.{c}' for c in CORRELATION_COLUMNS[2:])}
+                FROM load_logs l JOIN temperature_logs t ON t.timestamp = l.timestamp
+                WHERE l.timestamp >= ? ORDER BY l.timestamp
+            """
+        else:
+            query = f"""
+                SELECT l.bucket, t.cpu_temp_avg, t.gpu_temp_avg, {', '.join(f'l.{c}_avg' for c in CORRELATION_COLUMNS[2:])}
+                FROM load_{source} l JOIN temperature_{source} t ON t.bucket = l.bucket
+                WHERE l.bucket >= ? ORDER BY l.bucket
+            """
+        last = None
+        for row in cursor.execute(query, (since,)):
+            last = row[0]
+            for column, value in zip(CORRELATION_COLUMNS, row[1:]):
+                if value is not None:
+                    points[column][0].append(row[0])
+                    points[column][1].append(value)
+        if last is not None:
+            since = last + width
+    return points
+
+
+def summarize_transcode_load(points):
+    """Compare average temperatures and load while transcoding against while not, from raw joined points."""
+    transcoding = dict(zip(*points["transcodes"]))
+    lines = []
+    for column, label, unit in (("cpu_temp", "CPU temp", "°C"), ("gpu_temp", "GPU temp", "°C"),
+                                ("cpu_percent", "CPU load", "%"), ("gpu_enc_util", "GPU encoder", "%")):
+        busy, idle = [], []
+        for timestamp, value in zip(*points[column]):
+            if timestamp in transcoding:
+                (busy if transcoding[timestamp] > 0 else idle).append(value)
+        if busy and idle:
+            lines.append(f"{label}: {sum(busy) / len(busy):.1f}{unit} transcoding vs {sum(idle) / len(idle):.1f}{unit} otherwise")
+    return lines
+
+
+async def check_transcode_load(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
+        try:
+            seconds = parse_time_range(context.args, default=6 * 3600)
+        except ValueError:
+            await update.message.reply_text("Usage: /transcodeload [range], e.g. /transcodeload 12h or 7d")
+            return
+
+        user_id = update.message.from_user.id
+        logger.info(f"User {user_id} checked transcode load.")
+        range_label = format_time_range(seconds)
+        key = ("transcode_load", seconds, await run_blocking(get_latest_row_id, "load_logs"))
+
+        def fetch():
+            points = fetch_transcode_load(seconds)
+            if not points["transcodes"][0]:
+                return None
+            # Cached under the chart's key, so a cached chart doesn't re-run the join
+            CHART_CACHE.put_summary(key, summarize_transcode_load(points))
+            return range_label, {column: lttb(xs, ys) for column, (xs, ys) in points.items()}
+
+        if _chart_mode.get() == "text":
+            # A single message: the sparklines with the transcoding comparison appended
+            data = await run_blocking(fetch)
+            if data is None:
+                await update.message.reply_text("No load data available.")
+                return
+            await update.message.reply_text("\n".join([text_transcode_load(*data), *(CHART_CACHE.get_summary(key) or ())]))
+            return
+
+        if not await send_chart(update, context, key, fetch, render_transcode_load):
+            await update.message.reply_text("No load data available.")
+            return
+        summary = CHART_CACHE.get_summary(key)
+        if summary is None:
+            # The summary was evicted while the chart stayed cached
+            summary = summarize_transcode_load(await run_blocking(fetch_transcode_load, seconds))
+            CHART_CACHE.put_summary(key, summary)
+        if summary:
+            await update.message.reply_text("\n".join(summary))
+    except Exception as e:
+        logger.error(f"Error in check_transcode_load: {e}")
+        await update.message.reply_text("An error occurred while generating the transcode load chart.")
+
+
+async def check_cpu_temp(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
         user_id = update.message.from_user.id
         logger.info(f"User {user_id} checked CPU temperature.")
-        temps = psutil.sensors_temperatures()
+        temps = await run_blocking(psutil.sensors_temperatures)
         cpu_temps = temps.get('coretemp', [])
         response = "CPU Temperatures:\n"
         for temp in cpu_temps:
@@ -475,13 +2663,14 @@ async def check_cpu_temp(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def check_gpu_temp(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
-        if not check_authorization(update):
-            await update.message.reply_text("You are not authorized to use this bot.")
-            return
-
         user_id = update.message.from_user.id
         logger.info(f"User {user_id} checked GPU temperature.")
-        gpu_stats = gpustat.new_query()
+        # The temperature collector already queried the GPU; use that unless it's stale
+        latest = METRIC_STORE.latest("temperature", "gpu_temp")
+        if latest is not None and time.time() - latest[0] <= 2 * COLLECTORS["temperature"].interval:
+            await update.message.reply_text(f"GPU Temperature: {latest[1]:g}°C (as of {datetime.fromtimestamp(latest[0]).strftime('%H:%M')})")
+            return
+        gpu_stats = await run_blocking(gpustat.new_query)
         response = "GPU Temperatures:\n"
         for gpu in gpu_stats.gpus:
             response += f"{gpu.name}: {gpu.temperature}°C\n"
@@ -492,213 +2681,301 @@ async def check_gpu_temp(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def check_cpu_load(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
-        if not check_authorization(update):
-            await update.message.reply_text("You are not authorized to use this bot.")
-            return
-
         user_id = update.message.from_user.id
         logger.info(f"User {user_id} checked CPU load.")
-        load1, load5, load15 = psutil.getloadavg()
+        load1, load5, load15 = await run_blocking(psutil.getloadavg)
         response = f"CPU Load (1, 5, 15 minutes): {load1}, {load5}, {load15}\n"
         await update.message.reply_text(response)
     except Exception as e:
         logger.error(f"Error in check_cpu_load command: {e}")
         await update.message.reply_text("An error occurred while checking the CPU load.")
 
+def get_partition_usage():
+    """Return (devices, used_space, total_space) in GB for every mounted partition."""
+    devices = []
+    used_space = []
+    total_space = []
+    for partition in psutil.disk_partitions():
+        usage = psutil.disk_usage(partition.mountpoint)
+        total = usage.total / (1024 ** 3)  # Convert to GB
+        used = (usage.total - usage.free) / (1024 ** 3)  # Convert to GB
+        devices.append(partition.device)
+        used_space.append(used)
+        total_space.append(total)
+    return devices, used_space, total_space
+
+
 async def check_hdd_capacity(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
-        if not check_authorization(update):
-            await update.message.reply_text("You are not authorized to use this bot.")
-            return
-
         user_id = update.message.from_user.id
         logger.info(f"User {user_id} checked HDD capacity.")
-        partitions = psutil.disk_partitions()
-        devices = []
-        used_space = []
-        total_space = []
-        for partition in partitions:
-            usage = psutil.disk_usage(partition.mountpoint)
-            total = usage.total / (1024 ** 3)  # Convert to GB
-            used = (usage.total - usage.free) / (1024 ** 3)  # Convert to GB
-            devices.append(partition.device)
-            used_space.append(used)
-            total_space.append(total)
-
-        fig, ax = plt.subplots()
-        bar_width = 0.35
-        index = range(len(devices))
-
-        bar1 = plt.bar(index, used_space, bar_width, label='Used Space')
-        bar2 = plt.bar(index, [t - u for t, u in zip(total_space, used_space)], bar_width, bottom=used_space, label='Free Space')
-
-        plt.xlabel('Device')
-        plt.ylabel('Size (GB)')
-        plt.title('HDD Capacity')
-        plt.xticks(index, devices, rotation=45)
-        plt.legend()
-
-        # Save the plot to a file
-        plt.tight_layout()
-        plt.savefig('/tmp/hdd_capacity.png')
-        plt.close()
-
-        await context.bot.send_photo(chat_id=update.message.chat_id, photo=open('/tmp/hdd_capacity.png', 'rb'))
+        usage = await run_blocking(get_partition_usage)
+
+        # Live data has no row id, so the rounded values themselves are the data version
+        key = ("hdd_capacity", tuple(usage[0]), tuple(round(v, 1) for v in usage[1] + usage[2]))
+        await send_chart(update, context, key, lambda: usage, render_hdd_capacity)
     except Exception as e:
         logger.error(f"Error in check_hdd_capacity command: {e}")
         await update.message.reply_text("An error occurred while checking the HDD capacity.")
 
+def fetch_disk_usage(seconds):
+    """Return downsampled ((timestamps, used), (timestamps, available)) in GB, summed over all devices."""
+    timestamps = []
+    used_spaces = []
+    available_spaces = []
+
+    # Each snapshot writes one row per partition with a shared timestamp
+    cursor = get_read_connection().cursor()
+    cursor.execute("""
+        SELECT timestamp, SUM(used_space), SUM(available_space) FROM hdd_logs
+        WHERE timestamp >= ?
+        GROUP BY timestamp
+        ORDER BY timestamp
+    """, (int(time.time()) - seconds,))
+    for row in cursor:
+        timestamps.append(row[0])
+        used_spaces.append(row[1] or 0)
+        available_spaces.append(row[2] or 0)
+    return lttb(timestamps, used_spaces), lttb(timestamps, available_spaces)
+
+
 async def check_disk_usage(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
-        timestamps = []
-        used_spaces = []
-        available_spaces = []
+        try:
+            seconds = parse_time_range(context.args, default=30 * 86400)
+        except ValueError:
+            await update.message.reply_text("Usage: /diskusage [range], e.g. /diskusage 7d or 90d")
+            return
+        range_label = format_time_range(seconds)
 
-        with sqlite3.connect(DB_PATH) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT timestamp, used_space, available_space FROM hdd_logs
-                ORDER BY timestamp DESC LIMIT 60
-            """)
-            rows = cursor.fetchall()
-            for row in rows[::-1]:  # Reverse to get chronological order
-                timestamps.append(row[0])
-                used_spaces.append(row[1])
-                available_spaces.append(row[2])
+        def fetch():
+            used, available = fetch_disk_usage(seconds)
+            return (range_label, used, available) if used[0] else None
 
-        if not timestamps:
+        latest_id = await run_blocking(get_latest_row_id, "hdd_logs")
+        if not await send_chart(update, context, ("disk_usage", seconds, latest_id), fetch, render_disk_usage):
             await update.message.reply_text("No HDD data available.")
             return
-
-        plt.figure(figsize=(10, 5))
-        plt.plot(timestamps, used_spaces, label='Used Space (GB)', marker='o')
-        plt.plot(timestamps, available_spaces, label='Available Space (GB)', marker='x')
-        plt.xticks(rotation=45)
-        plt.xlabel("Time")
-        plt.ylabel("HDD Space (GB)")
-        plt.title("HDD Usage Trend (Last 60 Entries)")
-        plt.legend()
-        plt.tight_layout()
-
-        hdd_trend_path = "/tmp/hdd_trend.png"
-        plt.savefig(hdd_trend_path)
-        plt.close()
-
-        await context.bot.send_photo(chat_id=update.message.chat_id, photo=open(hdd_trend_path, 'rb'))
     except Exception as e:
         logger.error(f"Error in check_hdd_info: {e}")
         await update.message.reply_text("An error occurred while generating the HDD trend.")
 
-async def check_memory_usage(update: Update, context: ContextTypes.DEFAULT_TYPE):
+# Most disks drawn on one /diskio chart
+MAX_DISK_IO_DISKS = 8
+
+
+def list_disk_io_disks(seconds):
+    """Return the disks with I/O data in the last `seconds`, busiest first."""
+    if METRIC_STORE.covers(seconds):
+        def total(disk):
+            series = METRIC_STORE.fetch("disk_io", seconds, group=disk)
+            return sum(series["read_mb_s"][1]) + sum(series["write_mb_s"][1])
+        return sorted(METRIC_STORE.groups("disk_io"), key=total, reverse=True)
+    cursor = get_read_connection().cursor()
+    cursor.execute("""
+        SELECT disk, SUM(total) FROM (
+            SELECT disk, read_mb_s_avg + write_mb_s_avg AS total FROM disk_io_hourly WHERE bucket >= ?1
+            UNION ALL
+            SELECT disk, read_mb_s + write_mb_s FROM disk_io_logs WHERE timestamp >= ?1
+        )
+        GROUP BY disk
+        ORDER BY SUM(total) DESC
+    """, (int(time.time()) - seconds,))
+    return [row[0] for row in cursor]
+
+
+def fetch_disk_io(seconds, disks):
+    """Return {disk: {column: (timestamps, values)}} of downsampled disk I/O series."""
+    return {disk: fetch_series("disk_io", seconds, group=disk) for disk in disks}
+
+
+async def check_disk_io(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
-        if not check_authorization(update):
-            await update.message.reply_text("You are not authorized to use this bot.")
+        try:
+            seconds, rest = split_range_args(context.args, default=3600)
+        except ValueError:
+            await update.message.reply_text("Usage: /diskio [range] [disk], e.g. /diskio 6h or /diskio 1d sda")
+            return
+        range_label = format_time_range(seconds)
+        if rest:
+            disks = rest[:1]
+        else:
+            disks = (await run_blocking(list_disk_io_disks, seconds))[:MAX_DISK_IO_DISKS]
+
+        def fetch():
+            series = fetch_disk_io(seconds, disks)
+            series = {disk: columns for disk, columns in series.items() if columns["read_mb_s"][0] or columns["write_mb_s"][0]}
+            return (range_label, series) if series else None
+
+        version = await series_version("disk_io", seconds)
+        key = ("disk_io", seconds, tuple(disks), version)
+        if not await send_chart(update, context, key, fetch, render_disk_io):
+            await update.message.reply_text("No disk I/O data available.")
             return
+    except Exception as e:
+        logger.error(f"Error in check_disk_io: {e}")
+        await update.message.reply_text("An error occurred while generating the disk I/O graph.")
 
+async def check_memory_usage(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
         user_id = update.message.from_user.id
         logger.info(f"User {user_id} checked memory usage.")
-        mem = psutil.virtual_memory()
+        mem = await run_blocking(psutil.virtual_memory)
         
         total_memory = mem.total / (1024 ** 3)  # Convert to GB
         available_memory = mem.available / (1024 ** 3)  # Convert to GB
         used_memory = total_memory - available_memory
 
-        fig, ax = plt.subplots()
-        bar_width = 0.35
-        index = range(1)
-
-        bar1 = plt.bar(index, [used_memory], bar_width, label='Used Memory')
-        bar2 = plt.bar(index, [total_memory - used_memory], bar_width, bottom=[used_memory], label='Available Memory')
-
-        plt.xlabel('Memory')
-        plt.ylabel('Size (GB)')
-        plt.title('Memory Usage')
-        plt.xticks(index, ['Memory'])
-        plt.legend()
-
-        # Save the plot to a file
-        plt.tight_layout()
-        plt.savefig('/tmp/memory_usage.png')
-        plt.close()
-
-        await context.bot.send_photo(chat_id=update.message.chat_id, photo=open('/tmp/memory_usage.png', 'rb'))
+        key = ("memory_usage", round(total_memory, 1), round(used_memory, 1))
+        await send_chart(update, context, key, lambda: (total_memory, used_memory), render_memory_usage)
     except Exception as e:
         logger.error(f"Error in check_memory_usage command: {e}")
         await update.message.reply_text("An error occurred while checking the memory usage.")
 
+def fetch_network_info(interface):
+    """Return the last 60 ethernet samples for an interface as (timestamps, speeds, duplexes)."""
+    timestamps = []
+    speeds = []
+    duplexes = []
+
+    # Fetch data from the database
+    cursor = get_read_connection().cursor()
+    cursor.execute(
+        "SELECT timestamp, speed, duplex FROM ethernet_logs WHERE interface = ? ORDER BY timestamp DESC LIMIT 60",
+        (interface,)
+    )
+    rows = cursor.fetchall()
+    for row in rows[::-1]:  # Reverse for chronological order
+        timestamps.append(format_timestamp(row[0]))
+        speeds.append(float(row[1].replace("Mb/s", "").strip()) if row[1] else 0)  # Extract speed value
+        duplexes.append(1 if row[2] == "Full" else 0)  # Encode duplex as binary for plotting
+    return timestamps, speeds, duplexes
+
+
 async def check_network_info(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
-        timestamps = []
-        speeds = []
-        duplexes = []
+        args = context.args or []
+        interface = args[0] if args else await run_blocking(detect_default_interface)
 
-        # Fetch data from the database
-        with sqlite3.connect(DB_PATH) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT timestamp, speed, duplex FROM ethernet_logs ORDER BY timestamp DESC LIMIT 60")
-            rows = cursor.fetchall()
-            for row in rows[::-1]:  # Reverse for chronological order
-                timestamps.append(row[0])
-                speeds.append(float(row[1].replace("Mb/s", "").strip()) if row[1] else 0)  # Extract speed value
-                duplexes.append(1 if row[2] == "Full" else 0)  # Encode duplex as binary for plotting
-
-        if not timestamps:
+        def fetch():
+            data = fetch_network_info(interface)
+            return (interface,) + data if data[0] else None
+
+        latest_id = await run_blocking(get_latest_row_id, "ethernet_logs")
+        if not await send_chart(update, context, ("network_info", 60, interface, latest_id), fetch, render_network_info):
             await update.message.reply_text("No network data available.")
             return
-
-        # Generate a network trend plot
-        plt.figure(figsize=(10, 5))
-        plt.plot(timestamps, speeds, label="Speed (Mbps)", marker="o")
-        plt.plot(timestamps, duplexes, label="Duplex (1=Full, 0=Half)", marker="x")
-        plt.xticks(rotation=45)
-        plt.xlabel("Time")
-        plt.ylabel("Network Stats")
-        plt.title("Network Info Trend (Last 60 Entries)")
-        plt.legend()
-        plt.tight_layout()
-
-        network_trend_path = "/tmp/network_trend.png"
-        plt.savefig(network_trend_path)
-        plt.close()
-
-        # Send the generated plot to the user
-        await context.bot.send_photo(chat_id=update.message.chat_id, photo=open(network_trend_path, "rb"))
     except Exception as e:
         logger.error(f"Error in check_network_info: {e}")
         await update.message.reply_text("An error occurred while generating the network trend.")
 
-
 async def check_running_processes(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
-        if not check_authorization(update):
-            await update.message.reply_text("You are not authorized to use this bot.")
-            return
-
         user_id = update.message.from_user.id
         logger.info(f"User {user_id} checked running processes.")
-        result = subprocess.run(['ps', 'aux'], capture_output=True, text=True)
-        output = result.stdout
-        if len(output) > 4096:  # Telegram message limit
-            for chunk in wrap(output, 4096):
-                await update.message.reply_text(chunk)
-        else:
-            await update.message.reply_text(output)
+        snapshot = PROCESS_SAMPLER.snapshot
+        if snapshot is None:
+            await update.message.reply_text("Process data is still being collected. Please try again in a few seconds.")
+            return
+
+        lines = [f"{'PID':>7} {'CPU%':>6} {'MEM MB':>8} {'USER':<10} NAME"]
+        for pid, name, username, cpu, rss_mb in snapshot[1]:
+            lines.append(f"{pid:>7} {cpu:>6.1f} {rss_mb:>8.1f} {username[:10]:<10} {name}")
+
+        await reply_in_chunks(update.message, lines)
     except Exception as e:
         logger.error(f"Error in check_running_processes command: {e}")
         await update.message.reply_text("An error occurred while checking the running processes.")
 
-async def confirm_update_upgrade(update: Update, context: ContextTypes.DEFAULT_TYPE):
+def list_series_groups(series, seconds):
+    """Return the groups (e.g. collectors, tables) a grouped series has data for in the last `seconds`."""
+    if METRIC_STORE.covers(seconds):
+        return sorted(group for group in METRIC_STORE.groups(series) if group is not None)
+    raw_table, _, group_column = ROLLUP_SERIES[series]
+    start = int(time.time()) - seconds
+    cursor = get_read_connection().cursor()
+    cursor.execute(f"""
+        SELECT {group_column} FROM {series}_hourly WHERE bucket >= ?1
+        UNION
+        SELECT {group_column} FROM {raw_table} WHERE timestamp >= ?1
+        ORDER BY 1
+    """, (start,))
+    return [row[0] for row in cursor]
+
+
+# Most tables drawn on the /bothealth row count panel
+MAX_HEALTH_TABLES = 8
+
+
+def fetch_bot_health(seconds):
+    """Return (gauges, {collector: series}, {table: series}) for the bot health chart."""
+    gauges = fetch_series("bot_health", seconds)
+    collectors = {
+        name: fetch_series("collector_health", seconds, stats={"failures": "max", "missed": "max", "overruns": "max"}, group=name)
+        for name in list_series_groups("collector_health", seconds)
+    }
+    tables = {name: fetch_series("table_rows", seconds, group=name)["row_count"] for name in list_series_groups("table_rows", seconds)}
+    # Only the largest tables are worth a line
+    largest = sorted((name for name in tables if tables[name][1]), key=lambda name: tables[name][1][-1], reverse=True)
+    return gauges, collectors, {name: tables[name] for name in largest[:MAX_HEALTH_TABLES]}
+
+
+async def check_bot_health(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
+        try:
+            seconds = parse_time_range(context.args, default=6 * 3600)
+        except ValueError:
+            await update.message.reply_text("Usage: /bothealth [range], e.g. /bothealth 1d or 30d")
+            return
+
         user_id = update.message.from_user.id
+        logger.info(f"User {user_id} checked bot health.")
+        range_label = format_time_range(seconds)
+
+        def fetch():
+            gauges, collectors, tables = fetch_bot_health(seconds)
+            return (range_label, gauges, collectors, tables) if gauges["rss_mb"][0] else None
 
-        # Fetch the admin user dynamically
-        admin_user_id = get_admin_user()
+        version = await series_version("bot_health", seconds)
+        if not await send_chart(update, context, ("bot_health", seconds, version), fetch, render_bot_health):
+            await update.message.reply_text("No bot health data available yet.")
+            return
+    except Exception as e:
+        logger.error(f"Error in check_bot_health: {e}")
+        await update.message.reply_text("An error occurred while generating the bot health chart.")
 
-        if user_id != admin_user_id:
-            logger.warning(f"User {user_id} attempted to confirm update and upgrade.")
-            await update.message.reply_text("You are not authorized to update and upgrade the server.")
+
+async def check_bot_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
+        user_id = update.message.from_user.id
+        logger.info(f"User {user_id} checked bot stats.")
+        commands = COMMAND_STATS.commands()
+        if not commands:
+            await update.message.reply_text("No commands recorded yet.")
             return
 
+        lines = [f"📋 Command latency (ms, last {COMMAND_STATS.window} calls each)"]
+        for command in commands:
+            calls = COMMAND_STATS.calls[command]
+            errors = COMMAND_STATS.errors.get(command, 0)
+            limited = COMMAND_STATS.limited.get(command, 0)
+            lines.append(f"\n{command}: {calls} calls, {errors} errors, {limited} rate limited")
+            for phase in PHASES:
+                quantiles = COMMAND_STATS.quantiles(command, phase)
+                if quantiles is not None:
+                    p50, p95, p99 = (q * 1000 for q in quantiles)
+                    lines.append(f"  {phase:<6} p50 {p50:.0f}  p95 {p95:.0f}  p99 {p99:.0f}")
+
+        await reply_in_chunks(update.message, lines)
+    except Exception as e:
+        logger.error(f"Error in check_bot_stats command: {e}")
+        await update.message.reply_text("An error occurred while checking bot stats.")
+
+
+async def confirm_update_upgrade(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
+        user_id = update.message.from_user.id
+
         logger.info(f"User {user_id} requested confirmation for update and upgrade.")
         keyboard = [['Yes, proceed with Update & Upgrade', 'No, cancel Update & Upgrade']]
         reply_markup = ReplyKeyboardMarkup(keyboard, one_time_keyboard=True, resize_keyboard=True)
@@ -712,19 +2989,11 @@ async def update_upgrade(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         user_id = update.message.from_user.id
 
-        # Fetch the admin user dynamically
-        admin_user_id = get_admin_user()
-
-        if user_id != admin_user_id:
-            logger.warning(f"User {user_id} attempted to update and upgrade the server.")
-            await update.message.reply_text("You are not authorized to update and upgrade the server.")
-            return
-
         logger.info(f"User {user_id} issued update and upgrade command.")
         await update.message.reply_text('Updating package lists and upgrading all packages...')
         
-        subprocess.run(['sudo', 'apt-get', 'update'], capture_output=True, text=True)
-        subprocess.run(['sudo', 'apt-get', 'upgrade', '-y'], capture_output=True, text=True)
+        await run_command('sudo', 'apt-get', 'update')
+        await run_command('sudo', 'apt-get', 'upgrade', '-y')
         
         await update.message.reply_text('Update and upgrade completed.', reply_markup=ReplyKeyboardRemove())
         await start(update, context)  # Restore the keyboard
@@ -750,28 +3019,7 @@ async def test_graph(update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_id = update.message.from_user.id
         logger.info(f"User {user_id} requested test graph.")
 
-        # Dummy data for the test graph
-        categories = ['Category 1', 'Category 2', 'Category 3', 'Category 4']
-        values = [10, 20, 30, 40]
-
-        fig, ax = plt.subplots()
-        bar_width = 0.35
-        index = range(len(categories))
-
-        plt.bar(index, values, bar_width, label='Values')
-
-        plt.xlabel('Category')
-        plt.ylabel('Values')
-        plt.title('Test Graph')
-        plt.xticks(index, categories)
-        plt.legend()
-
-        # Save the plot to a file
-        plt.tight_layout()
-        plt.savefig('/tmp/test_graph.png')
-        plt.close()
-
-        await context.bot.send_photo(chat_id=update.message.chat_id, photo=open('/tmp/test_graph.png', 'rb'))
+        await send_chart(update, context, ("test_graph",), lambda: (), render_test_graph)
     except Exception as e:
         logger.error(f"Error in test_graph command: {e}")
         await update.message.reply_text("An error occurred while generating the test graph.")
@@ -795,44 +3043,138 @@ async def test_graph(update: Update, context: ContextTypes.DEFAULT_TYPE):
 #    except Exception as e:
 #        logger.error(f"Error logging temperatures: {e}")
 #
-async def check_temperature_trend(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    try:
-        cpu_temps, gpu_temps = [], []
+def fetch_temperature_trend(seconds):
+    """Return downsampled ((timestamps, cpu_temps), (timestamps, gpu_temps)) for the range."""
+    series = fetch_series("temperature", seconds)
+    return series["cpu_temp"], series["gpu_temp"]
 
-        with sqlite3.connect(DB_PATH) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT cpu_temp, gpu_temp FROM temperature_logs ORDER BY timestamp DESC LIMIT 60")
-            rows = cursor.fetchall()
-            for row in rows[::-1]:
-                cpu_temps.append(row[0] if row[0] is not None else 0)
-                gpu_temps.append(row[1] if row[1] is not None else 0)
 
-        if not cpu_temps:
-            await update.message.reply_text("No temperature data available.")
-            return
+def temperature_trend_chart(seconds, version):
+    """Return send_chart's (key, fetch, render) for the temperature trend; /temptrend and /dashboard share it."""
+    range_label = format_time_range(seconds)
+
+    def fetch():
+        cpu, gpu = fetch_temperature_trend(seconds)
+        return (range_label, cpu, gpu) if cpu[0] or gpu[0] else None
+
+    return ("temperature_trend", seconds, version), fetch, render_temperature_trend
 
-        plt.figure(figsize=(10, 5))
-        plt.plot(range(len(cpu_temps)), cpu_temps, label='CPU Temp (°C)', marker='o')
-        plt.plot(range(len(gpu_temps)), gpu_temps, label='GPU Temp (°C)', marker='x')
-        
-        plt.xticks([])  # Remove x-axis labels
-        plt.xlabel("Last 60 Minutes")  # Generalized x-axis label
-        plt.ylabel("Temperature (°C)")
-        plt.legend()
-        plt.tight_layout()
-        plt.savefig('/tmp/temp_trend.png')
-        plt.close()
 
-        await context.bot.send_photo(chat_id=update.message.chat_id, photo=open('/tmp/temp_trend.png', 'rb'))
+async def check_temperature_trend(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
+        try:
+            seconds = parse_time_range(context.args, default=3600)
+        except ValueError:
+            await update.message.reply_text("Usage: /temptrend [range], e.g. /temptrend 6h or 30d")
+            return
+        version = await series_version("temperature", seconds)
+        if not await send_chart(update, context, *temperature_trend_chart(seconds, version)):
+            await update.message.reply_text("No temperature data available.")
+            return
     except Exception as e:
         logger.error(f"Error in check_temperature_trend: {e}")
         await update.message.reply_text("An error occurred while generating the temperature trend.")
 
 
-
-
-def log_temperature_to_db():
+async def change_chart_mode(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
+        user_id = update.message.from_user.id
+        args = context.args or []
+        if not args:
+            mode = USER_PREFS.chart_mode(user_id)
+            await update.message.reply_text(
+                f"Trend commands currently reply with {'text sparklines' if mode == 'text' else 'chart images'}.\n"
+                "Use /chartmode text or /chartmode image to change it, or add 'text'/'image' to a single command."
+            )
+            return
+
+        mode = args[0].lower()
+        if mode not in CHART_MODES:
+            await update.message.reply_text("Usage: /chartmode [text|image]")
+            return
+        await run_blocking(USER_PREFS.set_chart_mode, user_id, mode)
+        logger.info(f"User {user_id} set their chart mode to {mode}.")
+        await update.message.reply_text(f"✅ Trend commands will now reply with {'text sparklines' if mode == 'text' else 'chart images'}.")
+    except Exception as e:
+        logger.error(f"Error in change_chart_mode: {e}")
+        await update.message.reply_text("An error occurred while changing the chart mode.")
+
+
+
+
+### --- COLLECTORS --- ###
+# Each metric is a Collector plugin: sample() takes a reading, diff() turns the
+# previous and current readings into values (for cumulative counters; stateless
+# collectors pass the reading through) and rows() shapes those values into rows for
+# the collector's table. Registered collectors are scheduled on their own interval,
+# write through the shared DatabaseWriter batch, and report failures through the
+# scheduler rather than each catching and logging its own errors.
+COLLECTORS = {}
+
+
+def register_collector(cls):
+    """Class decorator that registers a single instance of a Collector subclass."""
+    COLLECTORS[cls.name] = cls()
+    return cls
+
+
+class Collector(ABC):
+    """
+    Base class for metric collectors. Subclasses set name, table, columns and
+    interval and implement sample() and rows(); one missing either fails at
+    registration rather than on every tick.
+    """
+
+    name = None
+    table = None
+    columns = ()  # Column names in the order rows() produces them, timestamp first
+    series = None  # ROLLUP_SERIES entry whose recent window is also kept in memory
+    interval = 60
+    offset = 0
+    jitter = 0
+
+    def __init__(self):
+        self._previous = None
+        self.insert_sql = (
+            f"INSERT INTO {self.table} ({', '.join(self.columns)}) "
+            f"VALUES ({', '.join('?' * len(self.columns))})"
+        )
+
+    @abstractmethod
+    def sample(self):
+        """Take one reading."""
+
+    def diff(self, previous, current):
+        """Return the values to record, or None to record nothing this tick."""
+        return current
+
+    @abstractmethod
+    def rows(self, timestamp, values):
+        """Return the table rows (timestamp first, in `columns` order) for one tick's values."""
+
+    def collect(self, timestamp):
+        """Take one sample and queue its rows; returns how many rows were written."""
+        current = self.sample()
+        previous, self._previous = self._previous, current
+        values = self.diff(previous, current)
+        if not values:
+            return 0
+        rows = list(self.rows(timestamp, values))
+        if rows:
+            DB_WRITER.insert_many(self.insert_sql, rows)
+            if self.series is not None:
+                METRIC_STORE.record(self.series, self.columns, rows, self.interval)
+        return len(rows)
+
+
+@register_collector
+class TemperatureCollector(Collector):
+    name = "temperature"
+    table = "temperature_logs"
+    columns = ("timestamp", "cpu_temp", "gpu_temp")
+    series = "temperature"
+
+    def sample(self):
         temps = psutil.sensors_temperatures()
         cpu_temps = temps.get('coretemp', [])
         gpu_temp = None
@@ -841,46 +3183,58 @@ def log_temperature_to_db():
             gpu_temp = gpu_stats.gpus[0].temperature if gpu_stats.gpus else None
         except Exception:
             pass
-
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         cpu_temp = cpu_temps[0].current if cpu_temps else None
+        return cpu_temp, gpu_temp
 
-        with sqlite3.connect(DB_PATH) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO temperature_logs (timestamp, cpu_temp, gpu_temp)
-                VALUES (?, ?, ?)
-            """, (timestamp, cpu_temp, gpu_temp))
-            conn.commit()
-    except Exception as e:
-        logger.error(f"Error logging temperature data to DB: {e}")
+    def rows(self, timestamp, values):
+        return [(timestamp,) + values]
 
-def log_ethernet_settings_to_db():
-    try:
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        result = subprocess.run(['ethtool', 'eth0'], capture_output=True, text=True)
-        speed, duplex = None, None
-        for line in result.stdout.splitlines():
-            if "Speed:" in line:
-                speed = line.split(":")[1].strip()
-            if "Duplex:" in line:
-                duplex = line.split(":")[1].strip()
 
-        with sqlite3.connect(DB_PATH) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO ethernet_logs (timestamp, speed, duplex)
-                VALUES (?, ?, ?)
-            """, (timestamp, speed, duplex))
-            conn.commit()
-    except Exception as e:
-        logger.error(f"Error logging Ethernet settings to DB: {e}")
+@register_collector
+class NetworkActivityCollector(Collector):
+    """Persists the per-minute avg/peak of the 5 second network samples."""
 
-def log_hdd_to_db():
-    try:
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        partitions = psutil.disk_partitions()
-        for partition in partitions:
+    name = "network_activity"
+    table = "network_logs"
+    columns = ("timestamp", "interface", "rx_mbps", "tx_mbps", "rx_peak_mbps", "tx_peak_mbps")
+    series = "network"
+
+    def sample(self):
+        return NETWORK_SAMPLER.flush()
+
+    def rows(self, timestamp, stats):
+        summary = ", ".join(f"{interface} RX {v[0]:.2f}/{v[2]:.2f} TX {v[1]:.2f}/{v[3]:.2f}" for interface, v in stats.items())
+        logger.info(f"Logged network activity (avg/peak Mbps): {summary}")
+        return [(timestamp, interface) + values for interface, values in stats.items()]
+
+
+@register_collector
+class EthernetCollector(Collector):
+    name = "ethernet"
+    table = "ethernet_logs"
+    columns = ("timestamp", "interface", "speed", "duplex")
+    interval = 3600
+    jitter = 5
+
+    def sample(self):
+        return {interface: read_link_settings(interface) for interface in sorted(read_interface_counters())}
+
+    def rows(self, timestamp, settings):
+        return [(timestamp, interface, speed, duplex) for interface, (speed, duplex) in settings.items()]
+
+
+@register_collector
+class HddCollector(Collector):
+    name = "hdd"
+    table = "hdd_logs"
+    columns = ("timestamp", "device", "total_space", "used_space", "available_space", "folder_count", "file_count")
+    interval = 86400
+    offset = -time.localtime().tm_gmtoff % 86400  # Local midnight rather than UTC midnight
+    jitter = 30
+
+    def sample(self):
+        partitions = []
+        for partition in psutil.disk_partitions():
             try:
                 usage = psutil.disk_usage(partition.mountpoint)
                 total_space = usage.total / (1024 ** 3)  # Convert to GB
@@ -894,29 +3248,308 @@ def log_hdd_to_db():
                     file_count += len(files)
                     break  # Only count the top-level directory
 
-                with sqlite3.connect(DB_PATH) as conn:
-                    cursor = conn.cursor()
-                    cursor.execute("""
-                        INSERT INTO hdd_logs (timestamp, device, total_space, used_space, available_space, folder_count, file_count)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """, (timestamp, partition.device, total_space, used_space, available_space, folder_count, file_count))
-                    conn.commit()
+                partitions.append((partition.device, total_space, used_space, available_space, folder_count, file_count))
             except Exception as e:
                 logger.warning(f"Could not log partition {partition.device}: {e}")
-    except Exception as e:
-        logger.error(f"Error logging HDD data to DB: {e}")
+        return partitions
 
+    def rows(self, timestamp, partitions):
+        return [(timestamp,) + partition for partition in partitions]
 
 
-def start_logging():
-    while True:
-        log_temperature_to_db()
-        log_network_activity()  # ✅ Added this to log Mbps activity every minute
-        if datetime.now().minute == 0:
-            log_ethernet_settings_to_db()
-        if datetime.now().hour == 0:
-            log_hdd_to_db()
-        time.sleep(60)
+@register_collector
+class LoadCollector(Collector):
+    """
+    CPU load, GPU and NVENC utilisation, and active Plex streams/transcodes.
+
+    Runs on the same aligned minute as the temperature collector, so both tables
+    share timestamps and can be joined on equality.
+    """
+
+    name = "load"
+    table = "load_logs"
+    columns = ("timestamp", "cpu_percent", "gpu_util", "gpu_enc_util", "streams", "transcodes")
+    series = "load"
+
+    def sample(self):
+        # CPU time since the previous call, i.e. averaged over the last interval
+        cpu_percent = psutil.cpu_percent(interval=None)
+        gpu_util = gpu_enc_util = None
+        try:
+            gpu_stats = gpustat.new_query()
+            if gpu_stats.gpus:
+                gpu_util = gpu_stats.gpus[0].utilization
+                gpu_enc_util = gpu_stats.gpus[0].utilization_enc
+        except Exception:
+            pass
+        sessions = [session for _, session in list(PLEX_RECORDER.active.values())]
+        transcodes = sum(1 for session in sessions if session["decision"] == "transcode")
+        return cpu_percent, gpu_util, gpu_enc_util, len(sessions), transcodes
+
+    def diff(self, previous, current):
+        # The first cpu_percent() call has no baseline and always reports 0
+        return current if previous is not None else None
+
+    def rows(self, timestamp, values):
+        return [(timestamp,) + values]
+
+
+@register_collector
+class BotHealthCollector(Collector):
+    """The bot's own RSS, database and WAL file sizes, and how many writes are queued."""
+
+    name = "bot_health"
+    table = "bot_health_logs"
+    columns = ("timestamp", "writer_queue", "db_mb", "wal_mb", "rss_mb")
+    series = "bot_health"
+
+    def sample(self):
+        def size_mb(path):
+            try:
+                return os.path.getsize(path) / (1024 ** 2)
+            except OSError:
+                return 0.0
+        rss_mb = psutil.Process().memory_info().rss / (1024 ** 2)
+        return DB_WRITER.qsize(), size_mb(DB_PATH), size_mb(f"{DB_PATH}-wal"), rss_mb
+
+    def rows(self, timestamp, values):
+        return [(timestamp,) + values]
+
+
+@register_collector
+class CollectorHealthCollector(Collector):
+    """Average run time and failed, missed and overrun ticks of every scheduled job since the last sample."""
+
+    name = "collector_health"
+    table = "collector_health_logs"
+    columns = ("timestamp", "collector", "duration_ms", "failures", "missed", "overruns")
+    series = "collector_health"
+    scheduler = None  # Set by build_collector_scheduler()
+
+    def sample(self):
+        if self.scheduler is None:
+            return {}
+        return {
+            job.name: (job.runs, job.total_duration, job.failures, job.missed, job.overruns)
+            for job in self.scheduler.jobs
+        }
+
+    def diff(self, previous, current):
+        if previous is None:
+            return None
+        deltas = {}
+        for job, counters in current.items():
+            runs, total_duration, failures, missed, overruns = (
+                now - then for now, then in zip(counters, previous.get(job, (0,) * len(counters)))
+            )
+            duration_ms = total_duration / runs * 1000 if runs else None
+            deltas[job] = (duration_ms, failures, missed, overruns)
+        return deltas
+
+    def rows(self, timestamp, deltas):
+        return [(timestamp, job) + values for job, values in deltas.items()]
+
+
+@register_collector
+class TableRowsCollector(Collector):
+    """Row count of every table, to see which series the database growth comes from."""
+
+    name = "table_rows"
+    table = "table_rows_logs"
+    columns = ("timestamp", "table_name", "row_count")
+    series = "table_rows"
+    interval = 900
+
+    def sample(self):
+        conn = get_read_connection()
+        tables = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+        )]
+        return {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in tables}
+
+    def rows(self, timestamp, counts):
+        return [(timestamp, table, count) for table, count in counts.items()]
+
+
+# Pseudo-devices that never carry library or array I/O
+DISK_IO_IGNORED_PREFIXES = ("loop", "ram", "zram", "sr", "fd")
+
+
+@register_collector
+class DiskIOCollector(Collector):
+    """
+    Per-disk read/write throughput (MB/s), IOPS and busy time from psutil's cumulative counters.
+
+    Only whole block devices (anything under /sys/block, including md arrays and
+    device-mapper volumes) are recorded, not their partitions.
+    """
+
+    name = "disk_io"
+    table = "disk_io_logs"
+    columns = ("timestamp", "disk", "read_mb_s", "write_mb_s", "read_iops", "write_iops", "busy_percent")
+    series = "disk_io"
+
+    def sample(self):
+        counters = {}
+        for disk, c in psutil.disk_io_counters(perdisk=True).items():
+            if disk.startswith(DISK_IO_IGNORED_PREFIXES) or not os.path.exists(f"/sys/block/{disk}"):
+                continue
+            counters[disk] = (c.read_bytes, c.write_bytes, c.read_count, c.write_count, getattr(c, "busy_time", None))
+        return time.monotonic(), counters
+
+    def diff(self, previous, current):
+        if previous is None:
+            return None
+        (then, before), (now, after) = previous, current
+        elapsed = now - then
+        if elapsed <= 0:
+            return None
+        rates = {}
+        for disk, counters in after.items():
+            if disk not in before:
+                continue
+            deltas = [b - a if a is not None and b is not None else None for a, b in zip(before[disk], counters)]
+            if any(d is not None and d < 0 for d in deltas):
+                logger.warning(f"Disk I/O counters on {disk} reset; skipping one sample.")
+                continue
+            read_bytes, write_bytes, reads, writes, busy_ms = deltas
+            busy = min(100.0, busy_ms / 10 / elapsed) if busy_ms is not None else None
+            rates[disk] = (read_bytes / 1e6 / elapsed, write_bytes / 1e6 / elapsed, reads / elapsed, writes / elapsed, busy)
+        return rates
+
+    def rows(self, timestamp, rates):
+        return [(timestamp, disk) + values for disk, values in rates.items()]
+
+
+
+### --- COLLECTOR SCHEDULER --- ###
+# Every collector has its own interval and fires on deadlines aligned to multiples
+# of that interval (plus an optional offset), so the period never drifts by the time
+# collectors take and hourly/daily jobs run exactly once per period. Jobs run on a
+# thread pool with one thread per job, so they never wait on one another even when
+# they all fall due on the same minute; a job still running at its next deadline is
+# counted as an overrun and skipped (so it never needs a second thread), and
+# deadlines that passed while the scheduler was stalled are counted as missed
+# rather than replayed in a burst.
+class ScheduledJob:
+    """A collector registered with the scheduler, plus its timing statistics."""
+
+    def __init__(self, name, func, interval, offset=0.0, jitter=0.0):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.offset = offset
+        self.jitter = jitter
+        self.deadline = None  # Aligned time the next run is for
+        self.run_at = None  # deadline plus jitter
+        self.running = False
+        self.runs = 0
+        self.failures = 0
+        self.overruns = 0
+        self.missed = 0
+        self.last_duration = None
+        self.total_duration = 0.0
+
+
+class CollectorScheduler:
+    """
+    Runs collectors on aligned, drift-free deadlines.
+
+    clock, wait and executor are injectable so the scheduler can be driven by a
+    fake clock: run_pending(now) dispatches everything due and returns how long
+    to wait for the next deadline.
+    """
+
+    def __init__(self, clock=time.time, wait=None, executor=None, rng=None):
+        self.clock = clock
+        self._stop = threading.Event()
+        self._wait = wait or self._stop.wait
+        self.executor = executor  # Created on first dispatch, once every job is registered
+        self.rng = rng or random.Random()
+        self.jobs = []
+        self._lock = threading.Lock()
+
+    def add(self, name, func, interval, offset=0.0, jitter=0.0):
+        """Register func(timestamp) to run every `interval` seconds; timestamp is the aligned deadline."""
+        job = ScheduledJob(name, func, interval, offset, jitter)
+        self.jobs.append(job)
+        return job
+
+    def _schedule(self, job, deadline):
+        job.deadline = deadline
+        job.run_at = deadline + (self.rng.uniform(0, job.jitter) if job.jitter else 0.0)
+
+    def _next_aligned(self, job, now):
+        return ((now - job.offset) // job.interval + 1) * job.interval + job.offset
+
+    def run_pending(self, now=None):
+        now = self.clock() if now is None else now
+        for job in self.jobs:
+            if job.deadline is None:
+                self._schedule(job, self._next_aligned(job, now))
+                continue
+            if now < job.run_at:
+                continue
+
+            deadline = job.deadline
+            late = now - deadline
+            skipped = int(late // job.interval)
+            if skipped:
+                job.missed += skipped
+                logger.warning(f"Collector '{job.name}' missed {skipped} tick(s)")
+
+            with self._lock:
+                busy = job.running
+                if not busy:
+                    job.running = True
+            if busy:
+                job.overruns += 1
+                logger.warning(f"Collector '{job.name}' is still running; skipping this tick")
+            else:
+                if self.executor is None:
+                    self.executor = ThreadPoolExecutor(max_workers=len(self.jobs), thread_name_prefix="collector")
+                self.executor.submit(self._run, job, deadline + skipped * job.interval)
+            self._schedule(job, deadline + (skipped + 1) * job.interval)
+
+        upcoming = [job.run_at for job in self.jobs if job.run_at is not None]
+        return max(0.0, min(upcoming) - now) if upcoming else 1.0
+
+    def _run(self, job, timestamp):
+        started = time.monotonic()
+        try:
+            job.func(int(timestamp))
+        except Exception as e:
+            job.failures += 1
+            logger.error(f"Collector '{job.name}' failed: {e}")
+        finally:
+            job.last_duration = time.monotonic() - started
+            job.total_duration += job.last_duration
+            job.runs += 1
+            with self._lock:
+                job.running = False
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            self._wait(self.run_pending())
+
+    def stop(self):
+        self._stop.set()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+
+
+def build_collector_scheduler():
+    """Register every collector with its interval and return the scheduler."""
+    scheduler = CollectorScheduler()
+    scheduler.add("network_sampler", lambda ts: NETWORK_SAMPLER.sample(), NETWORK_SAMPLER.interval)
+    scheduler.add("process_sampler", lambda ts: PROCESS_SAMPLER.sample(), PROCESS_SAMPLER.interval)
+    for collector in COLLECTORS.values():
+        scheduler.add(collector.name, collector.collect, collector.interval, collector.offset, collector.jitter)
+    # A minute past the hour so the previous hour's last rows are in
+    scheduler.add("maintenance", lambda ts: run_database_maintenance(), 3600, offset=60, jitter=30)
+    scheduler.add("auth_reload", lambda ts: AUTH.refresh(), AUTH_POLL_SECONDS)
+    COLLECTORS["collector_health"].scheduler = scheduler
+    return scheduler
 
 
 
@@ -926,9 +3559,417 @@ def start_logging():
 #        log_temperature()
 #        time.sleep(60)
 
-def main():
+### --- DASHBOARD --- ###
+# /dashboard posts a single message with an inline keyboard and keeps it current by
+# editing it in place every `interval` seconds. Each refresh rebuilds the view from
+# the in-memory metrics and compares it with what was last sent, so a dashboard
+# whose numbers haven't moved costs no Bot API calls. Views only show values from
+# those buffered series; a live reading (memory, say) would differ on every tick.
+# In image mode the chart is only replaced (edit_message_media) when its data
+# version changes, by file_id when Telegram already has that version (the system
+# view's chart is /temptrend's); a changed caption alone is an edit_message_caption. A dashboard nobody has pressed a button
+# on for DASHBOARD_IDLE_SECONDS stops itself; there is at most one per chat.
+DASHBOARD_WINDOW = 900
+DASHBOARD_DEFAULT_INTERVAL = 30
+DASHBOARD_MIN_INTERVAL = 10
+DASHBOARD_MAX_INTERVAL = 600
+DASHBOARD_IDLE_SECONDS = 15 * 60
+
+DashboardView = namedtuple("DashboardView", "label build")
+
+
+def format_last_sample(*points):
+    """Return 'Last sample: HH:MM' for the newest of the given (timestamps, values) series."""
+    latest = max((xs[-1] for xs, _ in points if len(xs)), default=None)
+    return f"Last sample: {datetime.fromtimestamp(latest).strftime('%H:%M')}" if latest else "No samples yet."
+
+
+def build_system_dashboard(window):
+    """Return (text, chart) for the system view, where chart is a send_chart-style (key, fetch, render)."""
+    range_label = format_time_range(window)
+    temperature = METRIC_STORE.fetch("temperature", window)
+    load = METRIC_STORE.fetch("load", window)
+    streams, transcodes = (load[column][1][-1] if load[column][1] else 0 for column in ("streams", "transcodes"))
+    text = "\n".join((
+        f"🖥 System (Last {range_label})",
+        summarize_series("CPU temp", temperature["cpu_temp"], "°C"),
+        summarize_series("GPU temp", temperature["gpu_temp"], "°C"),
+        summarize_series("CPU load", load["cpu_percent"], "%"),
+        summarize_series("GPU util", load["gpu_util"], "%"),
+        f"Plex: {streams:.0f} streams, {transcodes:.0f} transcoding",
+        format_last_sample(temperature["cpu_temp"], load["cpu_percent"]),
+    ))
+    # The same chart (and cache entry) as /temptrend over the window
+    return text, temperature_trend_chart(window, current_series_version("temperature", window))
+
+
+def build_network_dashboard(window):
+    """Return (text, chart) for the network view of the default interface."""
+    range_label = format_time_range(window)
+    interface = detect_default_interface()
+    series = METRIC_STORE.fetch("network", window, group=interface)
+    text = "\n".join((
+        f"🌐 Network on {interface} (Last {range_label})",
+        summarize_series("RX", series["rx_mbps"], " Mbps"),
+        summarize_series("TX", series["tx_mbps"], " Mbps"),
+        format_last_sample(series["rx_mbps"]),
+    ))
+
+    def fetch():
+        rx, tx = series["rx_mbps"], series["tx_mbps"]
+        return (range_label, interface, rx, tx, series["rx_peak_mbps"], series["tx_peak_mbps"]) if rx[0] or tx[0] else None
+
+    key = ("network_activity", window, interface, current_series_version("network", window))
+    return text, (key, fetch, render_network_activity)
+
+
+DASHBOARD_VIEWS = {
+    "system": DashboardView("🖥 System", build_system_dashboard),
+    "network": DashboardView("🌐 Network", build_network_dashboard),
+}
+
+
+class Dashboard:
+    """A live dashboard message in one chat, refreshed in place until stopped or idle."""
+
+    def __init__(self, bot, chat_id, mode="text", interval=DASHBOARD_DEFAULT_INTERVAL, view="system"):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.mode = mode
+        self.interval = interval
+        self.view = view
+        self.message_id = None
+        self.last_activity = time.monotonic()
+        self.edits = 0
+        self.skipped = 0
+        self._text = None
+        self._chart_key = None
+        self._view_shown = None
+        self._task = None
+        self._lock = asyncio.Lock()
+
+    def keyboard(self):
+        views = [
+            InlineKeyboardButton(f"• {view.label}" if name == self.view else view.label, callback_data=f"dashboard:view:{name}")
+            for name, view in DASHBOARD_VIEWS.items()
+        ]
+        controls = [
+            InlineKeyboardButton("🔄 Refresh", callback_data="dashboard:refresh"),
+            InlineKeyboardButton("⏹ Stop", callback_data="dashboard:stop"),
+        ]
+        return InlineKeyboardMarkup([views, controls])
+
+    async def _build(self):
+        text, (key, fetch, render) = await run_blocking(DASHBOARD_VIEWS[self.view].build, DASHBOARD_WINDOW)
+        return text, key, fetch, render
 
+    async def start(self):
+        """Post the dashboard message and start refreshing it."""
+        text, key, fetch, render = await self._build()
+        sent = []
+
+        async def send(photo):
+            message = await self.bot.send_photo(chat_id=self.chat_id, photo=photo, caption=text, reply_markup=self.keyboard())
+            sent.append(message)
+            return message
+
+        if self.mode == "image" and await send_cached_photo(send, key, fetch, render):
+            self._chart_key = key
+        else:
+            self.mode = "text"  # No chart data yet; a text dashboard can't later become a photo
+            sent.append(await self.bot.send_message(chat_id=self.chat_id, text=text, reply_markup=self.keyboard()))
+        self.message_id = sent[-1].message_id
+        self._text, self._view_shown = text, self.view
+        self.last_activity = time.monotonic()
+        # A fresh context, so refreshes aren't timed as part of the /dashboard command that started them
+        self._task = asyncio.create_task(self._run(), context=contextvars.Context())
+
+    async def refresh(self):
+        """Edit the message if the view's content changed; return whether an edit was made."""
+        async with self._lock:
+            text, key, fetch, render = await self._build()
+            view_changed = self._view_shown != self.view
+            try:
+                if self.mode == "image" and key != self._chart_key:
+                    def edit(photo):
+                        return self.bot.edit_message_media(
+                            media=InputMediaPhoto(photo, caption=text),
+                            chat_id=self.chat_id, message_id=self.message_id, reply_markup=self.keyboard(),
+                        )
+
+                    if not await send_cached_photo(edit, key, fetch, render):
+                        self.skipped += 1
+                        return False
+                    self._chart_key = key
+                elif text == self._text and not view_changed:
+                    self.skipped += 1
+                    return False
+                elif self.mode == "image":
+                    await self.bot.edit_message_caption(
+                        chat_id=self.chat_id, message_id=self.message_id, caption=text, reply_markup=self.keyboard()
+                    )
+                else:
+                    await self.bot.edit_message_text(
+                        text, chat_id=self.chat_id, message_id=self.message_id, reply_markup=self.keyboard()
+                    )
+            except BadRequest as e:
+                if "not modified" not in str(e).lower():
+                    raise
+            self._text, self._view_shown = text, self.view
+            self.edits += 1
+            return True
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            if time.monotonic() - self.last_activity > DASHBOARD_IDLE_SECONDS:
+                await self._finish("⏹ Dashboard stopped after inactivity. Send /dashboard to start it again.")
+                return
+            try:
+                await self.refresh()
+            except BadRequest as e:
+                # The message was deleted or can no longer be edited
+                logger.warning(f"Dashboard in chat {self.chat_id} stopped: {e}")
+                DASHBOARDS.pop(self.chat_id, None)
+                return
+            except Exception as e:
+                logger.error(f"Error refreshing dashboard in chat {self.chat_id}: {e}")
+
+    async def _finish(self, note):
+        """Drop the keyboard, leave a note on the message and forget the dashboard."""
+        if DASHBOARDS.get(self.chat_id) is self:
+            del DASHBOARDS[self.chat_id]
+        logger.info(f"Dashboard in chat {self.chat_id} stopped after {self.edits} edits ({self.skipped} unchanged refreshes skipped).")
+        text = f"{self._text}\n\n{note}"
+        try:
+            if self.mode == "image":
+                await self.bot.edit_message_caption(chat_id=self.chat_id, message_id=self.message_id, caption=text)
+            else:
+                await self.bot.edit_message_text(text, chat_id=self.chat_id, message_id=self.message_id)
+        except BadRequest as e:
+            logger.warning(f"Could not mark dashboard in chat {self.chat_id} as stopped: {e}")
+
+    def cancel(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    async def stop(self, note="⏹ Dashboard stopped."):
+        self.cancel()
+        await self._finish(note)
+
+
+DASHBOARDS = {}
+
+
+async def start_dashboard(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
+        user_id = update.message.from_user.id
+        mode = pop_chart_mode(context) or USER_PREFS.chart_mode(user_id)
+        args = context.args or []
+        try:
+            interval = int(args[0].lower().rstrip("s")) if args else DASHBOARD_DEFAULT_INTERVAL
+            if not DASHBOARD_MIN_INTERVAL <= interval <= DASHBOARD_MAX_INTERVAL:
+                raise ValueError(interval)
+        except ValueError:
+            await update.message.reply_text(
+                f"Usage: /dashboard [seconds] [text|image], with {DASHBOARD_MIN_INTERVAL}-{DASHBOARD_MAX_INTERVAL}s between refreshes"
+            )
+            return
+
+        chat_id = update.message.chat_id
+        previous = DASHBOARDS.get(chat_id)
+        if previous is not None:
+            await previous.stop("⏹ Replaced by a newer dashboard.")
+        dashboard = Dashboard(context.bot, chat_id, mode, interval)
+        await dashboard.start()
+        DASHBOARDS[chat_id] = dashboard
+        logger.info(f"User {user_id} started a {dashboard.mode} dashboard refreshing every {interval}s.")
+    except Exception as e:
+        logger.error(f"Error in start_dashboard: {e}")
+        await update.message.reply_text("An error occurred while starting the dashboard.")
+
+
+async def dashboard_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle the dashboard's inline keyboard: switch view, refresh now or stop."""
+    query = update.callback_query
+    try:
+        user_id = query.from_user.id
+        if not AUTH.is_authorized(user_id):
+            await query.answer("You are not authorized to use this bot.", show_alert=True)
+            return
+        dashboard = DASHBOARDS.get(query.message.chat_id)
+        if dashboard is None or dashboard.message_id != query.message.message_id:
+            await query.answer("This dashboard has stopped. Send /dashboard to start a new one.")
+            return
+        wait = RATE_LIMITER.acquire(user_id, COMMAND_COSTS["light"])
+        if wait:
+            await query.answer(f"⏳ Too many requests. Please try again in {math.ceil(wait)}s.")
+            return
+
+        dashboard.last_activity = time.monotonic()
+        action = query.data.split(":", 1)[1]
+        if action == "stop":
+            await dashboard.stop()
+            await query.answer("Dashboard stopped.")
+            return
+        if action.startswith("view:") and action[5:] in DASHBOARD_VIEWS:
+            dashboard.view = action[5:]
+        if await dashboard.refresh():
+            await query.answer()
+        else:
+            await query.answer("Already up to date.")
+    except Exception as e:
+        logger.error(f"Error in dashboard_callback: {e}")
+        await query.answer("An error occurred while updating the dashboard.")
+
+
+def stop_dashboards():
+    """Cancel every dashboard's refresh task on shutdown; their buttons then report them as stopped."""
+    for dashboard in DASHBOARDS.values():
+        dashboard.cancel()
+    DASHBOARDS.clear()
+
+
+### --- COMMAND REGISTRY --- ###
+# Every command is declared once here: its slash command, its keyboard button, the
+# handler, the role it needs and its cost class. Slash commands and buttons both go
+# through dispatch(), which is the single place authorization (and any per-command
+# instrumentation or limits) is applied; the /start keyboard and the handler
+# registration in main() are generated from this table.
+#
+# cost: "light" replies are cheap lookups, "chart" ones render an image and
+# "system" ones run commands on the host. text: the chart has a sparkline form (see
+# TEXT CHARTS), which is what text mode sends instead, charged as "light".
+Command = namedtuple("Command", "name label handler role cost menu text", defaults=(True, False))
+
+COMMANDS = [
+    Command("restart", "🔄 Restart", restart, "admin", "system"),
+    Command("uptime", "⏱ Uptime", check_uptime, "standard", "light"),
+    Command("services", "🛠 Services", check_services, "standard", "light"),
+    Command("cputemp", "🌡 CPU Temp", check_cpu_temp, "standard", "light"),
+    Command("gputemp", "🌡 GPU Temp", check_gpu_temp, "standard", "light"),
+    Command("cpuload", "📊 CPU Load", check_cpu_load, "standard", "light"),
+    Command("plex", "👥 Plex Users", check_plex_users, "standard", "light"),
+    Command("hddcapacity", "💾 HDD Capacity", check_hdd_capacity, "standard", "chart"),
+    Command("diskusage", "📁 Disk Usage", check_disk_usage, "standard", "chart", text=True),
+    Command("memory", "💻 Memory", check_memory_usage, "standard", "chart"),
+    Command("networkspeed", "📡 Network Speed", check_network_speed_status, "standard", "light"),
+    Command("networkactivity", "📊 Network Activity", check_network_activity, "standard", "chart", text=True),
+    Command("processes", "🔍 Processes", check_running_processes, "standard", "light"),
+    Command("updateupgrade", "⬆️ Update & Upgrade", confirm_update_upgrade, "admin", "light"),
+    Command("temptrend", "📉 Temp Trend", check_temperature_trend, "standard", "chart", text=True),
+    Command("shutdown", "🔻 Shutdown", shutdown, "admin", "system"),
+    Command("network", "🌐 Network Info", check_network_info, "standard", "chart", text=True),
+    Command("diskio", "💽 Disk I/O", check_disk_io, "standard", "chart", text=True),
+    Command("transcodeload", "🔥 Transcode Load", check_transcode_load, "standard", "chart", text=True),
+    Command("plexpeaks", "📈 Plex Peaks", check_plex_peaks, "standard", "light"),
+    Command("plexwatch", "⏳ Plex Watch Time", check_plex_watch_time, "standard", "light"),
+    Command("start", None, start, "standard", "light"),
+    Command("adduser", None, add_user, "admin", "light"),
+    Command("removeuser", None, remove_user, "admin", "light"),
+    Command("users", None, list_users, "admin", "light"),
+    Command("chartmode", None, change_chart_mode, "standard", "light"),
+    Command("dashboard", "📟 Dashboard", start_dashboard, "standard", "light"),
+    Command("botstats", "📋 Bot Stats", check_bot_stats, "admin", "light"),
+    Command("bothealth", "🩺 Bot Health", check_bot_health, "admin", "chart", text=True),
+    # Replies to the update & upgrade confirmation keyboard
+    Command(None, "Yes, proceed with Update & Upgrade", update_upgrade, "admin", "system", menu=False),
+    Command(None, "No, cancel Update & Upgrade", cancel_update_upgrade, "admin", "light", menu=False),
+]
+
+COMMANDS_BY_LABEL = {command.label: command for command in COMMANDS if command.label}
+
+
+def build_keyboard(role):
+    """Return the /start keyboard rows (two buttons each) for the commands a role may use."""
+    labels = [c.label for c in COMMANDS if c.label and c.menu and (c.role != "admin" or role == "admin")]
+    return [labels[i:i + 2] for i in range(0, len(labels), 2)]
+
+
+async def dispatch(command, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Run a command's handler if the user's role allows it."""
+    user_id = update.message.from_user.id
+    role = AUTH.role(user_id)
+    if role is None:
+        await update.message.reply_text("You are not authorized to use this bot.")
+        return
+    if command.role == "admin" and role != "admin":
+        logger.warning(f"User {user_id} attempted to run {command.name or command.label}.")
+        await update.message.reply_text("You are not authorized to use this command.")
+        return
+    name = command.name or command.label
+    cost = command.cost
+    mode = "image"
+    if cost == "chart":
+        requested = pop_chart_mode(context)
+        mode = requested or USER_PREFS.chart_mode(user_id)
+        if mode == "text" and not command.text:
+            if requested:
+                await update.message.reply_text(f"/{command.name} has no text form; it only replies with a chart image.")
+                return
+            mode = "image"  # The /chartmode preference only covers trend charts
+        if mode == "text":
+            cost = "light"  # No render or upload
+    wait = RATE_LIMITER.acquire(user_id, COMMAND_COSTS[cost])
+    if wait:
+        COMMAND_STATS.limited[name] = COMMAND_STATS.limited.get(name, 0) + 1
+        logger.info(f"User {user_id} was rate limited on {name}.")
+        await update.message.reply_text(f"⏳ Too many requests. Please try again in {math.ceil(wait)}s.")
+        return
+
+    timing = {"queue": max(0.0, time.time() - update.message.date.timestamp())} if update.message.date else {}
+    token = _current_timing.set(timing)
+    mode_token = _chart_mode.set(mode)
+    started = time.perf_counter()
+    try:
+        await command.handler(update, context)
+    except Exception:
+        timing["error"] = True
+        raise
+    finally:
+        timing["total"] = time.perf_counter() - started
+        _chart_mode.reset(mode_token)
+        _current_timing.reset(token)
+        COMMAND_STATS.record(name, timing)
+
+
+def command_callback(command):
+    """Wrap a registry entry as a CommandHandler callback."""
+    async def callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        await dispatch(command, update, context)
+    return callback
+
+
+def register_commands(application):
+    """Add a CommandHandler for every slash command, one text handler for every button and the dashboard's inline keyboard."""
+    for command in COMMANDS:
+        if command.name:
+            application.add_handler(CommandHandler(command.name, command_callback(command)))
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+    application.add_handler(CallbackQueryHandler(dashboard_callback, pattern=r"^dashboard:"))
+
+
+async def on_startup(application):
+    """post_init hook: start the background tasks that live on the bot's event loop."""
+    await start_plex_history(application)
+    await start_metrics_server()
+
+
+async def on_shutdown(application):
+    """post_shutdown hook: stop background tasks and close network clients."""
+    stop_dashboards()
+    await stop_metrics_server()
+    await close_plex_client(application)
+
+
+def main(db_path=DB_PATH, log_path=LOG_PATH, base_url=None):
+    """
+    Start the bot. base_url overrides the Bot API endpoint (e.g. a local stub
+    server, as used by benchmarks/bench_startup.py).
+    """
+    configure(db_path, log_path)
     initialize_database()
+    token = load_bot_token()
     def setup_credentials():
         with sqlite3.connect(DB_PATH) as conn:
             cursor = conn.cursor()
@@ -951,35 +3992,37 @@ def main():
     #temperature_thread = threading.Thread(target=start_temperature_logging, daemon=True)
     #temperature_thread.start()
     
-    logging_thread = threading.Thread(target=start_logging, daemon=True)
+    DB_WRITER.start()
+    METRIC_STORE.warm_start(get_read_connection())
+    USER_PREFS.load(get_read_connection())
+    AUTH.refresh(force=True)
+    scheduler = build_collector_scheduler()
+    logging_thread = threading.Thread(target=scheduler.run_forever, name="collector-scheduler", daemon=True)
     logging_thread.start()
+    # Warm the render workers in the background so they don't delay the first getUpdates
+    threading.Thread(target=RENDER_POOL.start, name="render-pool-start", daemon=True).start()
 
     # Initialize ApplicationBuilder with bot token
-    application = ApplicationBuilder().token(TOKEN).build()
+    # Handle updates concurrently so one slow command doesn't queue everyone else's
+    builder = (
+        ApplicationBuilder().token(token).concurrent_updates(True)
+        # Bot API calls made while handling a command are timed as its "send" phase
+        .request(TimedHTTPXRequest(connection_pool_size=256))
+        .post_init(on_startup)
+        .post_shutdown(on_shutdown)
+    )
+    if base_url:
+        builder = builder.base_url(base_url)
+    application = builder.build()
 
     # Add the command handlers
-    application.add_handler(CommandHandler("start", start))
-    application.add_handler(CommandHandler("restart", restart))
-    application.add_handler(CommandHandler("shutdown", shutdown))
-    application.add_handler(CommandHandler("uptime", check_uptime))
-    application.add_handler(CommandHandler("services", check_services))
-    application.add_handler(CommandHandler("cputemp", check_cpu_temp))
-    application.add_handler(CommandHandler("gputemp", check_gpu_temp))
-    application.add_handler(CommandHandler("cpuload", check_cpu_load))
-    application.add_handler(CommandHandler("plex", check_plex_users))
-    application.add_handler(CommandHandler("hddcapacity", check_hdd_capacity))
-    application.add_handler(CommandHandler("diskusage", check_disk_usage))
-    application.add_handler(CommandHandler("memory", check_memory_usage))
-    application.add_handler(CommandHandler("network", check_network_info))
-    application.add_handler(CommandHandler("processes", check_running_processes))
-    application.add_handler(CommandHandler("updateupgrade", update_upgrade))
-    application.add_handler(CommandHandler("temptrend", check_temperature_trend))
-    application.add_handler(CommandHandler("networkspeed", check_network_speed_status))
-    application.add_handler(CommandHandler("networkactivity", check_network_activity))
-
-    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+    register_commands(application)
 
     application.run_polling()
+    scheduler.stop()
+    RENDER_POOL.shutdown()
+    DB_WRITER.stop()
 
 if __name__ == '__main__':
+    # Works, but every render worker then re-imports this script; start with run_bot.py
     main()
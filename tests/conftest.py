@@ -0,0 +1,50 @@
+import os
+import sqlite3
+import sys
+import threading
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import server_bot  # noqa: E402
+
+
+@pytest.fixture
+def bot_db(tmp_path, monkeypatch):
+    """Point server_bot at a fresh, migrated database with user 1 (admin) and user 2 (standard)."""
+    db_path = str(tmp_path / "server_logs.db")
+    monkeypatch.setattr(server_bot, "DB_PATH", db_path)
+    monkeypatch.setattr(server_bot, "_read_local", threading.local())
+    server_bot.initialize_database()
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE IF NOT EXISTS authorized_users (user_id INTEGER PRIMARY KEY, role TEXT NOT NULL)")
+        conn.executemany("INSERT INTO authorized_users (user_id, role) VALUES (?, ?)", [(1, "admin"), (2, "standard")])
+    writer = server_bot.DatabaseWriter(db_path)
+    writer.start()
+    monkeypatch.setattr(server_bot, "DB_WRITER", writer)
+    auth = server_bot.AuthService(db_path)
+    auth.refresh(force=True)
+    monkeypatch.setattr(server_bot, "AUTH", auth)
+    monkeypatch.setattr(server_bot, "RATE_LIMITER", server_bot.RateLimiter(burst=1000))
+    yield db_path
+    writer.stop()
+
+
+class FakeMessage:
+    def __init__(self, user_id):
+        self.from_user = types.SimpleNamespace(id=user_id)
+        self.chat_id = user_id
+        self.date = None
+        self.replies = []
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+
+
+def make_update(user_id=1, args=None):
+    """Return an (update, context) pair shaped like the ones python-telegram-bot passes to handlers."""
+    update = types.SimpleNamespace(message=FakeMessage(user_id))
+    context = types.SimpleNamespace(args=list(args or []), bot=None)
+    return update, context
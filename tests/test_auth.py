@@ -0,0 +1,28 @@
+import sqlite3
+
+import server_bot
+
+
+def test_role_is_a_dict_read_until_the_next_poll(bot_db):
+    auth = server_bot.AUTH
+    with sqlite3.connect(bot_db) as conn:
+        conn.execute("INSERT INTO authorized_users (user_id, role) VALUES (3, 'standard')")
+
+    assert auth.role(3) is None
+    auth.refresh()
+    assert auth.role(3) == "standard"
+
+
+def test_role_does_not_wait_for_a_reload(bot_db):
+    auth = server_bot.AUTH
+    with auth._lock:
+        assert auth.role(1) == "admin"
+        assert auth.users() == {1: "admin", 2: "standard"}
+
+
+def test_changes_through_the_bot_apply_immediately(bot_db):
+    auth = server_bot.AUTH
+    auth.set_role(3, "admin")
+    assert auth.is_admin(3)
+    auth.remove(3)
+    assert not auth.is_authorized(3)
@@ -0,0 +1,125 @@
+import asyncio
+import types
+
+import pytest
+from telegram.error import BadRequest
+
+import server_bot
+from conftest import make_update
+
+
+def test_least_recently_used_entry_is_evicted_first():
+    cache = server_bot.ChartCache(max_entries=2)
+    cache.put("a", b"1")
+    cache.put("b", b"2")
+    assert cache.get("a") == b"1"
+
+    cache.put("c", b"3")
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (b"1", b"3")
+
+
+def test_total_size_is_bounded():
+    cache = server_bot.ChartCache(max_entries=10, max_bytes=10)
+    cache.put("a", b"x" * 4)
+    cache.put("b", b"x" * 4)
+    cache.put("c", b"x" * 4)
+
+    assert cache.get("a") is None
+    assert cache.get("b") is not None and cache.get("c") is not None
+
+    # Replacing an entry counts only its new size
+    cache.put("c", b"x" * 6)
+    assert cache.get("b") is not None
+
+
+def test_oversized_png_is_not_cached():
+    cache = server_bot.ChartCache(max_bytes=10)
+    cache.put("a", b"x" * 4)
+    cache.put("big", b"x" * 11)
+
+    assert cache.get("big") is None
+    assert cache.get("a") == b"x" * 4
+
+
+def test_file_ids_are_bounded_separately():
+    cache = server_bot.ChartCache(max_entries=1, max_file_ids=2)
+    cache.put_file_id("a", "file-a")
+    cache.put_file_id("b", "file-b")
+    cache.get_file_id("a")
+    cache.put_file_id("c", "file-c")
+
+    assert cache.get_file_id("b") is None
+    assert (cache.get_file_id("a"), cache.get_file_id("c")) == ("file-a", "file-c")
+
+    cache.drop_file_id("a")
+    assert cache.get_file_id("a") is None
+
+
+class PhotoBot:
+    """Records what send_photo was given and answers like Telegram, optionally rejecting file_ids."""
+
+    def __init__(self, reject=()):
+        self.sent = []
+        self.reject = set(reject)
+
+    async def send_photo(self, chat_id, photo):
+        if photo in self.reject:
+            raise BadRequest("Wrong file identifier/http url specified")
+        self.sent.append(photo)
+        return types.SimpleNamespace(photo=[types.SimpleNamespace(file_id=f"file-{len(self.sent)}")])
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    monkeypatch.setattr(server_bot, "CHART_CACHE", server_bot.ChartCache())
+    renders = []
+
+    async def render(func, *args):
+        renders.append(args)
+        return b"png"
+
+    monkeypatch.setattr(server_bot, "run_render", render)
+    return renders
+
+
+def plain_chart(*args):
+    """A render function without a text form."""
+
+
+def send(bot, key, fetch=lambda: ("data",)):
+    update, context = make_update()
+    context.bot = bot
+    return asyncio.run(server_bot.send_chart(update, context, key, fetch, plain_chart))
+
+
+def test_unchanged_chart_is_resent_by_file_id(renders):
+    bot = PhotoBot()
+
+    assert send(bot, ("chart", 1))
+    assert send(bot, ("chart", 1))
+    assert send(bot, ("chart", 2))
+
+    assert bot.sent == [b"png", "file-1", b"png"]
+    assert len(renders) == 2
+
+
+def test_rejected_file_id_is_dropped_and_the_chart_reuploaded(renders):
+    bot = PhotoBot()
+    send(bot, ("chart", 1))
+    bot.reject.add("file-1")
+
+    assert send(bot, ("chart", 1))
+
+    # The PNG was still cached, so the re-upload didn't render again
+    assert bot.sent == [b"png", b"png"]
+    assert len(renders) == 1
+    assert server_bot.CHART_CACHE.get_file_id(("chart", 1)) == "file-2"
+
+
+def test_no_data_sends_nothing(renders):
+    bot = PhotoBot()
+
+    assert not send(bot, ("chart", 1), fetch=lambda: None)
+    assert bot.sent == [] and renders == []
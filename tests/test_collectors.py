@@ -0,0 +1,23 @@
+import pytest
+
+import server_bot
+
+
+def test_collector_missing_a_method_fails_at_registration(monkeypatch):
+    monkeypatch.setattr(server_bot, "COLLECTORS", {})
+
+    with pytest.raises(TypeError):
+        @server_bot.register_collector
+        class Incomplete(server_bot.Collector):
+            name = "incomplete"
+            table = "incomplete_logs"
+            columns = ("timestamp", "value")
+
+            def sample(self):
+                return 1
+
+    assert server_bot.COLLECTORS == {}
+
+
+def test_builtin_collectors_are_registered():
+    assert {"temperature", "network_activity", "disk_io"} <= set(server_bot.COLLECTORS)
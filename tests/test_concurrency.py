@@ -0,0 +1,42 @@
+"""Handlers that block go through the offload layer, so N slow requests take about as long as the slowest one."""
+import asyncio
+import time
+
+import server_bot
+from conftest import make_update
+
+DELAYS = (0.3, 0.4, 0.5, 0.5, 0.6)
+
+
+def run_concurrently(coroutines):
+    async def main():
+        started = time.perf_counter()
+        await asyncio.gather(*coroutines)
+        return time.perf_counter() - started
+    return asyncio.run(main())
+
+
+def assert_overlapped(elapsed, delays=DELAYS):
+    assert elapsed >= max(delays) * 0.9
+    assert elapsed < max(delays) + (sum(delays) - max(delays)) / 2, f"{elapsed:.2f}s looks serialized"
+
+
+def test_run_blocking_overlaps_slow_calls():
+    assert_overlapped(run_concurrently(server_bot.run_blocking(time.sleep, delay) for delay in DELAYS))
+
+
+def test_run_command_overlaps_slow_subprocesses():
+    assert_overlapped(run_concurrently(server_bot.run_command("sleep", str(delay)) for delay in DELAYS))
+
+
+def test_dispatch_overlaps_slow_handlers(bot_db):
+    async def slow_handler(update, context):
+        await server_bot.run_blocking(time.sleep, float(context.args[0]))
+        await update.message.reply_text("done")
+
+    command = server_bot.Command("slow", None, slow_handler, "standard", "light")
+    updates = [make_update(user_id=2, args=[str(delay)]) for delay in DELAYS]
+    elapsed = run_concurrently(server_bot.dispatch(command, update, context) for update, context in updates)
+
+    assert_overlapped(elapsed)
+    assert all(update.message.replies == ["done"] for update, _ in updates)
@@ -0,0 +1,157 @@
+import asyncio
+import types
+
+import pytest
+
+import server_bot
+
+
+class FakeBot:
+    """Records the Bot API calls a dashboard makes."""
+
+    def __init__(self):
+        self.calls = []
+
+    def _message(self):
+        return types.SimpleNamespace(message_id=42, photo=[types.SimpleNamespace(file_id=f"file-{len(self.calls)}")])
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.calls.append(("send_message", text))
+        return self._message()
+
+    async def send_photo(self, chat_id, photo, caption=None, **kwargs):
+        self.calls.append(("send_photo", photo))
+        return self._message()
+
+    async def edit_message_text(self, text, chat_id, message_id, **kwargs):
+        self.calls.append(("edit_message_text", text))
+        return self._message()
+
+    async def edit_message_caption(self, chat_id, message_id, caption, **kwargs):
+        self.calls.append(("edit_message_caption", caption))
+        return self._message()
+
+    async def edit_message_media(self, media, chat_id, message_id, **kwargs):
+        # Uploads are wrapped in an InputFile; a file_id stays a string
+        self.calls.append(("edit_message_media", media.media if isinstance(media.media, str) else "upload"))
+        return self._message()
+
+
+class FakeView:
+    """A dashboard view whose text and chart version the test sets directly."""
+
+    def __init__(self):
+        self.text = "CPU temp: 50°C"
+        self.version = 1
+
+    def build(self, window):
+        return self.text, (("fake_chart", self.version), lambda: ("data",), None)
+
+
+@pytest.fixture
+def view(monkeypatch):
+    view = FakeView()
+    monkeypatch.setattr(server_bot, "DASHBOARD_VIEWS", {"system": server_bot.DashboardView("System", view.build)})
+    monkeypatch.setattr(server_bot, "DASHBOARDS", {})
+    monkeypatch.setattr(server_bot, "CHART_CACHE", server_bot.ChartCache())
+
+    async def render(func, *args):
+        return b"png"
+
+    monkeypatch.setattr(server_bot, "run_render", render)
+    return view
+
+
+def run_dashboard(mode, steps):
+    """Start a dashboard, then run each step(dashboard) in order and return the bot's calls."""
+    bot = FakeBot()
+
+    async def run():
+        dashboard = server_bot.Dashboard(bot, chat_id=1, mode=mode, interval=3600)
+        await dashboard.start()
+        try:
+            for step in steps:
+                await step(dashboard)
+        finally:
+            dashboard.cancel()
+        return dashboard
+
+    return asyncio.run(run()), bot.calls
+
+
+def test_unchanged_refresh_makes_no_api_calls(view):
+    async def refresh(dashboard):
+        assert not await dashboard.refresh()
+
+    dashboard, calls = run_dashboard("text", [refresh, refresh])
+
+    assert calls == [("send_message", "CPU temp: 50°C")]
+    assert dashboard.skipped == 2
+
+
+def test_changed_text_edits_the_text(view):
+    async def change(dashboard):
+        view.text = "CPU temp: 51°C"
+        assert await dashboard.refresh()
+
+    _, calls = run_dashboard("text", [change])
+
+    assert calls[1:] == [("edit_message_text", "CPU temp: 51°C")]
+
+
+def test_changed_caption_with_the_same_chart_edits_only_the_caption(view):
+    async def change(dashboard):
+        view.text = "CPU temp: 51°C"
+        assert await dashboard.refresh()
+
+    _, calls = run_dashboard("image", [change])
+
+    assert calls == [("send_photo", b"png"), ("edit_message_caption", "CPU temp: 51°C")]
+
+
+def test_new_chart_version_replaces_the_media_and_reuses_file_ids(view):
+    async def new_version(dashboard):
+        view.version = 2
+        assert await dashboard.refresh()
+
+    async def back_to_first(dashboard):
+        view.version = 1
+        assert await dashboard.refresh()
+
+    _, calls = run_dashboard("image", [new_version, back_to_first])
+
+    # Version 1 was uploaded by start() as file-1; returning to it sends that file_id
+    assert calls == [("send_photo", b"png"), ("edit_message_media", "upload"), ("edit_message_media", "file-1")]
+
+
+def test_idle_dashboard_stops_itself(view, monkeypatch):
+    monkeypatch.setattr(server_bot, "DASHBOARD_IDLE_SECONDS", 0)
+
+    async def wait_for_stop(dashboard):
+        server_bot.DASHBOARDS[1] = dashboard
+        dashboard.interval = 0.01
+        dashboard.cancel()
+        await asyncio.wait_for(dashboard._run(), 1)
+
+    _, calls = run_dashboard("text", [wait_for_stop])
+
+    assert "stopped after inactivity" in calls[-1][1]
+    assert server_bot.DASHBOARDS == {}
+
+
+def test_refreshes_are_not_timed_as_the_starting_command(view):
+    timing = {}
+
+    async def run():
+        server_bot._current_timing.set(timing)
+        dashboard = server_bot.Dashboard(FakeBot(), chat_id=1, mode="text", interval=0.01)
+        await dashboard.start()
+        before = dict(timing)
+        view.text = "CPU temp: 51°C"
+        await asyncio.sleep(0.2)
+        dashboard.cancel()
+        return dashboard, before
+
+    dashboard, before = asyncio.run(run())
+    assert dashboard.edits >= 1
+    assert timing == before
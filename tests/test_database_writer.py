@@ -0,0 +1,108 @@
+import sqlite3
+
+import pytest
+
+import server_bot
+
+INSERT = "INSERT INTO samples (value) VALUES (?)"
+
+
+class TracedWriter(server_bot.DatabaseWriter):
+    """DatabaseWriter that records the transactions its connection begins."""
+
+    def __init__(self, db_path, **kwargs):
+        super().__init__(db_path, **kwargs)
+        self.statements = []
+
+    def _connect(self):
+        conn = super()._connect()
+        conn.set_trace_callback(self.statements.append)
+        return conn
+
+    def transactions(self):
+        return sum(1 for sql in self.statements if sql.startswith("BEGIN"))
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "writer.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE samples (value INTEGER)")
+    return path
+
+
+def rows(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return [r[0] for r in conn.execute("SELECT value FROM samples ORDER BY rowid")]
+
+
+def test_burst_of_inserts_is_committed_as_one_transaction(db_path):
+    writer = TracedWriter(db_path)
+    for i in range(100):
+        writer.insert(INSERT, (i,))
+    writer.start()
+    writer.flush(timeout=5)
+    writer.stop()
+
+    assert rows(db_path) == list(range(100))
+    assert writer.transactions() == 1
+
+
+def test_batches_are_capped_at_batch_size(db_path):
+    writer = TracedWriter(db_path, batch_size=10, linger=0)
+    writer.insert_many(INSERT, [(i,) for i in range(5)])
+    for i in range(5, 25):
+        writer.insert(INSERT, (i,))
+    writer.start()
+    writer.flush(timeout=5)
+    writer.stop()
+
+    assert rows(db_path) == list(range(25))
+    # 21 queued inserts plus the flush: batches of 10, 10 and 2
+    assert writer.transactions() == 3
+
+
+def test_call_sees_inserts_queued_before_it(db_path):
+    writer = server_bot.DatabaseWriter(db_path)
+    writer.start()
+    writer.insert_many(INSERT, [(1,), (2,)])
+    count = writer.call(lambda conn: conn.execute("SELECT COUNT(*) FROM samples").fetchone()[0])
+
+    assert count.result(timeout=5) == 2
+    writer.stop()
+
+
+def test_call_errors_surface_on_the_future(db_path):
+    writer = server_bot.DatabaseWriter(db_path)
+    writer.start()
+
+    future = writer.call(lambda conn: conn.execute("SELECT * FROM missing"))
+    with pytest.raises(sqlite3.OperationalError):
+        future.result(timeout=5)
+
+    writer.insert(INSERT, (7,))
+    writer.flush(timeout=5)
+    writer.stop()
+    assert rows(db_path) == [7]
+
+
+def test_failed_batch_does_not_stop_the_writer(db_path):
+    writer = server_bot.DatabaseWriter(db_path, linger=0)
+    writer.start()
+    writer.insert("INSERT INTO missing (value) VALUES (?)", (1,))
+    writer.flush(timeout=5)
+    writer.insert(INSERT, (2,))
+    writer.flush(timeout=5)
+    writer.stop()
+
+    assert rows(db_path) == [2]
+
+
+def test_stop_writes_everything_queued_first(db_path):
+    writer = server_bot.DatabaseWriter(db_path)
+    writer.start()
+    writer.insert_many(INSERT, [(i,) for i in range(50)])
+    writer.stop()
+
+    assert rows(db_path) == list(range(50))
+    assert writer.qsize() == 0
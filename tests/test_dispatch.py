@@ -0,0 +1,64 @@
+import asyncio
+
+import server_bot
+from conftest import make_update
+
+
+def chart_command(text):
+    modes = []
+
+    async def handler(update, context):
+        modes.append(server_bot._chart_mode.get())
+
+    return server_bot.Command("stub", None, handler, "standard", "chart", text=text), modes
+
+
+def limit_to_one_chart(monkeypatch):
+    now = [0.0]
+    limiter = server_bot.RateLimiter(burst=1.0, rate=0.001, clock=lambda: now[0])
+    monkeypatch.setattr(server_bot, "RATE_LIMITER", limiter)
+    return limiter
+
+
+def run(command, args=None, user_id=2):
+    update, context = make_update(user_id, args)
+    asyncio.run(server_bot.dispatch(command, update, context))
+    return update.message.replies
+
+
+def test_text_mode_is_charged_as_light(bot_db, monkeypatch):
+    limit_to_one_chart(monkeypatch)
+    command, modes = chart_command(text=True)
+
+    for _ in range(4):
+        assert run(command, ["text"]) == []
+    assert modes == ["text"] * 4
+    assert "Too many requests" in run(command, ["text"])[0]
+
+
+def test_text_request_for_a_chart_without_a_text_form_is_refused(bot_db, monkeypatch):
+    limiter = limit_to_one_chart(monkeypatch)
+    command, modes = chart_command(text=False)
+
+    replies = run(command, ["text"])
+
+    assert modes == []
+    assert "has no text form" in replies[0]
+    assert limiter.acquire(2, server_bot.COMMAND_COSTS["chart"]) == 0  # Nothing was charged
+
+
+def test_text_preference_falls_back_to_an_image_at_chart_cost(bot_db, monkeypatch):
+    limit_to_one_chart(monkeypatch)
+    monkeypatch.setattr(server_bot.USER_PREFS, "_modes", {2: "text"})
+    command, modes = chart_command(text=False)
+
+    assert run(command) == []
+    assert modes == ["image"]
+    assert "Too many requests" in run(command)[0]
+
+
+def test_registered_text_commands_have_text_renderers():
+    for command in server_bot.COMMANDS:
+        assert not command.text or command.cost == "chart"
+    assert not server_bot.COMMANDS_BY_LABEL["💻 Memory"].text
+    assert not server_bot.COMMANDS_BY_LABEL["💾 HDD Capacity"].text
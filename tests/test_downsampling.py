@@ -0,0 +1,44 @@
+import math
+
+import server_bot
+
+
+def test_short_series_are_returned_unchanged():
+    xs, ys = list(range(10)), [x * 2 for x in range(10)]
+
+    assert server_bot.lttb(xs, ys, threshold=10) == (xs, ys)
+    assert server_bot.lttb(xs, ys, threshold=50) == (xs, ys)
+    # Fewer than three points can't keep both ends plus a bucket
+    assert server_bot.lttb(xs, ys, threshold=2) == (xs, ys)
+
+
+def test_output_has_threshold_points_and_keeps_the_ends():
+    xs = list(range(1000))
+    ys = [math.sin(x / 50) for x in xs]
+
+    out_x, out_y = server_bot.lttb(xs, ys, threshold=100)
+
+    assert len(out_x) == len(out_y) == 100
+    assert (out_x[0], out_y[0]) == (0, ys[0])
+    assert (out_x[-1], out_y[-1]) == (999, ys[-1])
+    assert out_x == sorted(set(out_x))
+    assert all(ys[x] == y for x, y in zip(out_x, out_y))
+
+
+def test_spikes_survive_downsampling():
+    xs = list(range(1000))
+    ys = [0.0] * 1000
+    ys[333], ys[777] = 100.0, -100.0
+
+    _, out_y = server_bot.lttb(xs, ys, threshold=20)
+
+    assert max(out_y) == 100.0
+    assert min(out_y) == -100.0
+
+
+def test_default_threshold_is_max_plot_points():
+    xs = list(range(5000))
+
+    out_x, _ = server_bot.lttb(xs, xs)
+
+    assert len(out_x) == server_bot.MAX_PLOT_POINTS
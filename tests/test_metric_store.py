@@ -0,0 +1,64 @@
+import threading
+
+import server_bot
+
+COLUMNS = ("timestamp", "interface", "rx_mbps", "tx_mbps", "rx_peak_mbps", "tx_peak_mbps")
+
+
+def test_groups_and_fetch_by_group():
+    store = server_bot.MetricStore(window_seconds=600)
+    store.record("network", COLUMNS, [(1000, "eth0", 1, 2, 3, 4), (1000, "wlan0", 5, 6, 7, 8)], 60)
+
+    assert store.groups("network") == {"eth0", "wlan0"}
+    assert store.groups("disk_io") == set()
+    rx = store.fetch("network", 600, now=1010, group="wlan0")["rx_mbps"]
+    assert list(rx[1]) == [5]
+
+
+def test_groups_while_new_groups_appear():
+    store = server_bot.MetricStore(window_seconds=600)
+    errors = []
+    done = threading.Event()
+
+    def read():
+        try:
+            while not done.is_set():
+                store.groups("network")
+        except Exception as e:
+            errors.append(e)
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    try:
+        for i in range(2000):
+            store.record("network", COLUMNS, [(1000 + i, f"veth{i}", 1, 2, 3, 4)], 60)
+    finally:
+        done.set()
+        reader.join()
+
+    assert not errors
+    assert len(store.groups("network")) == 2000
+
+
+def test_ring_buffer_keeps_the_newest_samples():
+    buffer = server_bot.RingBuffer(4)
+    for i in range(6):
+        buffer.append(1000 + i, i)
+
+    assert len(buffer) == 4
+    assert buffer.count == 6
+    assert buffer.latest() == (1005, 5)
+    times, values = buffer.since(1003)
+    assert list(times) == [1003, 1004, 1005]
+    assert list(values) == [3, 4, 5]
+
+
+def test_prometheus_count_covers_samples_beyond_the_window():
+    stats = server_bot.CommandStats(window=2)
+    for _ in range(3):
+        stats.record("temptrend", {"total": 0.5})
+
+    text = stats.prometheus()
+    assert 'serverbot_command_calls_total{command="temptrend"} 3' in text
+    assert 'serverbot_command_seconds_count{command="temptrend",phase="total"} 3' in text
+    assert 'serverbot_command_seconds_sum{command="temptrend",phase="total"} 1.500000' in text
@@ -0,0 +1,52 @@
+import itertools
+
+import server_bot
+
+
+def test_counter_delta_counts_forward_progress():
+    assert server_bot.counter_delta(1000, 1500) == 500
+    assert server_bot.counter_delta(1000, 1000) == 0
+    # 64-bit counters are never mistaken for a wrap
+    assert server_bot.counter_delta(2 ** 40, 2 ** 40 + 5) == 5
+
+
+def test_counter_delta_allows_for_32_bit_wraparound():
+    assert server_bot.counter_delta(2 ** 32 - 100, 50) == 150
+    assert server_bot.counter_delta(2 ** 31, 0) == 2 ** 31
+
+
+def test_counter_delta_treats_other_drops_as_a_reset():
+    assert server_bot.counter_delta(5000, 10) is None
+    assert server_bot.counter_delta(2 ** 31 - 1, 0) is None
+    assert server_bot.counter_delta(2 ** 40, 10) is None
+
+
+def test_sampler_skips_a_reset_and_resumes(monkeypatch):
+    readings = iter([
+        {"eth0": (0, 0)},
+        {"eth0": (1_250_000, 2_500_000)},  # 10 and 20 Mbps over one second
+        {"eth0": (100, 100)},  # Interface reset
+        {"eth0": (1_250_100, 100)},
+    ])
+    clock = itertools.count(100)
+    monkeypatch.setattr(server_bot, "read_interface_counters", lambda: next(readings))
+    monkeypatch.setattr(server_bot.time, "monotonic", lambda: next(clock))
+    sampler = server_bot.NetworkRateSampler()
+
+    for _ in range(4):
+        sampler.sample()
+
+    assert [(rx, tx) for _, rx, tx in sampler.recent["eth0"]] == [(10.0, 20.0), (10.0, 0.0)]
+
+
+def test_sampler_handles_a_wrap_between_samples(monkeypatch):
+    readings = iter([{"eth0": (2 ** 32 - 625_000, 0)}, {"eth0": (625_000, 0)}])
+    clock = itertools.count(100)
+    monkeypatch.setattr(server_bot, "read_interface_counters", lambda: next(readings))
+    monkeypatch.setattr(server_bot.time, "monotonic", lambda: next(clock))
+    sampler = server_bot.NetworkRateSampler()
+
+    sampler.sample()
+    sampler.sample()
+
+    assert [rx for _, rx, _ in sampler.recent["eth0"]] == [10.0]
@@ -0,0 +1,161 @@
+import asyncio
+
+import httpx
+import pytest
+
+import server_bot
+
+
+def session(key, user):
+    return {"session_key": key, "user": user, "title": "Film", "player": "TV", "decision": "direct play", "bitrate": 8000}
+
+
+def test_watching_counts_each_active_stream():
+    recorder = server_bot.PlexStreamRecorder()
+    recorder.diff([session("1", "alice"), session("2", "alice"), session("3", "bob")], 1000)
+
+    assert recorder.watching(now=1600) == {"alice": (1200, 2), "bob": (600, 1)}
+
+    recorder.diff([session("2", "alice")], 1600)
+    assert recorder.watching(now=1900) == {"alice": (900, 1)}
+
+
+SESSIONS_XML = b"""<?xml version="1.0" encoding="UTF-8"?>
+<MediaContainer size="2">
+  <Video sessionKey="7" title="Pilot" grandparentTitle="Some Show">
+    <Media bitrate="9000"/>
+    <User title="alice"/>
+    <Player title="Living Room" state="playing"/>
+    <Session bandwidth="12000"/>
+    <TranscodeSession videoDecision="transcode" audioDecision="copy"/>
+  </Video>
+  <Track sessionKey="8" title="Song">
+    <Media bitrate="320"/>
+    <User title="bob"/>
+    <Player product="Plexamp" state="paused"/>
+  </Track>
+</MediaContainer>
+"""
+
+
+def fake_plex(requests, status=200, delay=0):
+    """MockTransport serving SESSIONS_XML in small chunks and recording each request."""
+    async def chunks():
+        for i in range(0, len(SESSIONS_XML), 16):
+            yield SESSIONS_XML[i:i + 16]
+
+    async def handler(request):
+        requests.append(request)
+        if delay:
+            await asyncio.sleep(delay)
+        return httpx.Response(status, content=chunks())
+
+    return httpx.MockTransport(handler)
+
+
+def plex_client(transport, **kwargs):
+    return server_bot.PlexClient("http://plex.test:32400", "secret-token", transport=transport, **kwargs)
+
+
+def test_sessions_are_parsed_from_streamed_xml():
+    requests = []
+
+    async def run():
+        client = plex_client(fake_plex(requests))
+        try:
+            return await client.sessions()
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(run()) == [
+        {"session_key": "7", "user": "alice", "title": "Some Show - Pilot", "player": "Living Room",
+         "state": "playing", "decision": "transcode", "bitrate": 12000},
+        {"session_key": "8", "user": "bob", "title": "Song", "player": "Plexamp",
+         "state": "paused", "decision": "directplay", "bitrate": 320},
+    ]
+
+
+def test_token_is_sent_as_a_header_not_in_the_url():
+    requests = []
+
+    async def run():
+        client = plex_client(fake_plex(requests))
+        try:
+            await client.sessions()
+        finally:
+            await client.aclose()
+
+    asyncio.run(run())
+    (request,) = requests
+    assert request.headers["X-Plex-Token"] == "secret-token"
+    assert "secret-token" not in str(request.url)
+    assert request.url.path == "/status/sessions"
+
+
+def test_sessions_are_cached_for_the_ttl():
+    cached, expired = [], []
+
+    async def run(requests, ttl):
+        client = plex_client(fake_plex(requests), sessions_ttl=ttl)
+        try:
+            first = await client.sessions()
+            second = await client.sessions()
+            return first, second
+        finally:
+            await client.aclose()
+
+    first, second = asyncio.run(run(cached, ttl=60))
+    assert len(cached) == 1
+    assert second is first
+
+    asyncio.run(run(expired, ttl=0))
+    assert len(expired) == 2
+
+
+def test_concurrent_callers_share_one_request():
+    requests = []
+
+    async def run():
+        client = plex_client(fake_plex(requests, delay=0.05))
+        try:
+            return await asyncio.gather(*(client.sessions() for _ in range(5)))
+        finally:
+            await client.aclose()
+
+    results = asyncio.run(run())
+    assert len(requests) == 1
+    assert all(result is results[0] for result in results)
+
+
+def test_http_errors_are_raised():
+    requests = []
+
+    async def run():
+        client = plex_client(fake_plex(requests, status=401))
+        try:
+            await client.sessions()
+        finally:
+            await client.aclose()
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(run())
+
+
+def test_concurrent_first_calls_build_one_client(monkeypatch):
+    token_reads = []
+
+    def get_plex_token():
+        token_reads.append(1)
+        return "secret-token"
+
+    monkeypatch.setattr(server_bot, "_plex_client", None)
+    monkeypatch.setattr(server_bot, "_plex_client_lock", None)
+    monkeypatch.setattr(server_bot, "get_plex_token", get_plex_token)
+    monkeypatch.setattr(server_bot, "get_plex_url", lambda: "http://plex.test:32400")
+
+    async def run():
+        return await asyncio.gather(*(server_bot.get_plex_client() for _ in range(5)))
+
+    clients = asyncio.run(run())
+    assert len(token_reads) == 1
+    assert all(client is clients[0] for client in clients)
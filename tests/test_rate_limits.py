@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+import server_bot
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_burst_then_wait_for_refill():
+    clock = FakeClock()
+    limiter = server_bot.RateLimiter(burst=3, rate=0.5, clock=clock)
+
+    assert [limiter.acquire(1, 1.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.acquire(1, 1.0) == pytest.approx(2.0)  # One token at 0.5/s
+
+    clock.now += 1.0
+    assert limiter.acquire(1, 1.0) == pytest.approx(1.0)
+    clock.now += 1.0
+    assert limiter.acquire(1, 1.0) == 0.0
+
+
+def test_refill_is_capped_at_the_burst():
+    clock = FakeClock()
+    limiter = server_bot.RateLimiter(burst=2, rate=1.0, clock=clock)
+    limiter.acquire(1, 2.0)
+
+    clock.now += 3600
+    assert limiter.acquire(1, 2.0) == 0.0
+    assert limiter.acquire(1, 1.0) == pytest.approx(1.0)
+
+
+def test_costs_are_charged_per_class_and_per_user():
+    clock = FakeClock()
+    limiter = server_bot.RateLimiter(burst=1, rate=0.5, clock=clock)
+    costs = server_bot.COMMAND_COSTS
+
+    assert [limiter.acquire(1, costs["light"]) for _ in range(4)] == [0.0] * 4
+    assert limiter.acquire(1, costs["light"]) > 0
+    assert limiter.acquire(2, costs["chart"]) == 0.0
+    assert limiter.acquire(2, costs["light"]) > 0
+    assert limiter.acquire(3, costs["system"]) == 0.0
+
+
+def test_concurrent_cache_misses_render_once(monkeypatch):
+    monkeypatch.setattr(server_bot, "CHART_CACHE", server_bot.ChartCache())
+    monkeypatch.setattr(server_bot, "CHART_FLIGHTS", server_bot.SingleFlight())
+    fetches, renders = [], []
+
+    def fetch():
+        fetches.append(1)
+        return ("data",)
+
+    async def render(func, *args):
+        renders.append(args)
+        await asyncio.sleep(0.05)
+        return b"png"
+
+    monkeypatch.setattr(server_bot, "run_render", render)
+
+    async def run():
+        return await asyncio.gather(*(server_bot.get_cached_chart(("chart", 1), fetch, None) for _ in range(5)))
+
+    assert asyncio.run(run()) == [b"png"] * 5
+    assert len(fetches) == 1
+    assert len(renders) == 1
+    assert server_bot.CHART_FLIGHTS.shared == 4
+
+
+def test_single_flight_survives_a_caller_giving_up():
+    flights = server_bot.SingleFlight()
+    runs = []
+
+    async def work():
+        runs.append(1)
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def run():
+        impatient = asyncio.ensure_future(flights.do("key", work))
+        patient = asyncio.ensure_future(flights.do("key", work))
+        await asyncio.sleep(0)
+        impatient.cancel()
+        return await patient
+
+    assert asyncio.run(run()) == "done"
+    assert runs == [1]
@@ -0,0 +1,21 @@
+import asyncio
+
+import server_bot
+from conftest import FakeMessage
+
+
+def test_reply_in_chunks_splits_on_line_boundaries():
+    message = FakeMessage(1)
+    lines = [f"{i:04d} " + "x" * 95 for i in range(100)]  # 100 lines of 100 characters
+
+    asyncio.run(server_bot.reply_in_chunks(message, lines))
+
+    assert len(message.replies) == 3
+    assert all(len(reply) <= 4096 for reply in message.replies)
+    assert "".join(message.replies).splitlines() == lines
+
+
+def test_reply_in_chunks_sends_nothing_for_no_lines():
+    message = FakeMessage(1)
+    asyncio.run(server_bot.reply_in_chunks(message, []))
+    assert message.replies == []
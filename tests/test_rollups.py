@@ -0,0 +1,77 @@
+"""Hourly/daily rollups and retention, run against a migrated database with chosen timestamps."""
+import sqlite3
+
+import pytest
+
+import server_bot
+
+DAY = 86400
+T0 = 1000 * DAY  # Midnight UTC, so hour and day buckets start here
+
+
+@pytest.fixture
+def conn(bot_db):
+    conn = sqlite3.connect(bot_db)
+    yield conn
+    conn.close()
+
+
+def add_temperatures(conn, rows):
+    conn.executemany("INSERT INTO temperature_logs (timestamp, cpu_temp, gpu_temp) VALUES (?, ?, ?)", rows)
+
+
+def test_only_complete_hours_are_rolled_up(conn):
+    add_temperatures(conn, [(T0, 40, 30), (T0 + 60, 50, 30), (T0 + 120, 60, 30), (T0 + 3600, 70, 35)])
+
+    server_bot.run_rollups(conn, now=T0 + 3600 + 1800)
+    rows = conn.execute("SELECT bucket, samples, cpu_temp_min, cpu_temp_avg, cpu_temp_max FROM temperature_hourly").fetchall()
+    assert rows == [(T0, 3, 40, 50, 60)]
+
+    # The next pass picks up where the last one stopped and leaves finished hours alone
+    server_bot.run_rollups(conn, now=T0 + 7200)
+    rows = conn.execute("SELECT bucket, samples, cpu_temp_avg FROM temperature_hourly ORDER BY bucket").fetchall()
+    assert rows == [(T0, 3, 50), (T0 + 3600, 1, 70)]
+
+
+def test_grouped_series_roll_up_per_group(conn):
+    conn.executemany(
+        "INSERT INTO network_logs (timestamp, interface, rx_mbps, tx_mbps, rx_peak_mbps, tx_peak_mbps) VALUES (?, ?, ?, ?, ?, ?)",
+        [(T0, "eth0", 10, 1, 20, 2), (T0 + 60, "eth0", 30, 1, 40, 2), (T0, "wlan0", 5, 1, 5, 1)],
+    )
+
+    server_bot.run_rollups(conn, now=T0 + 3600)
+    rows = conn.execute("SELECT interface, samples, rx_mbps_avg, rx_peak_mbps_max FROM network_hourly ORDER BY interface").fetchall()
+    assert rows == [("eth0", 2, 20, 40), ("wlan0", 1, 5, 5)]
+
+
+def test_daily_average_is_weighted_by_samples(conn):
+    # Three samples averaging 10 in one hour, one sample of 50 in another
+    add_temperatures(conn, [(T0, 5, None), (T0 + 60, 10, None), (T0 + 120, 15, None), (T0 + 5 * 3600, 50, None)])
+
+    server_bot.run_rollups(conn, now=T0 + DAY)
+    row = conn.execute("SELECT bucket, samples, cpu_temp_min, cpu_temp_avg, cpu_temp_max, gpu_temp_avg FROM temperature_daily").fetchone()
+    assert row == (T0, 4, 5, 20, 50, None)
+
+
+def test_raw_rows_are_pruned_only_once_rolled_up(conn):
+    add_temperatures(conn, [(T0, 40, 30), (T0 + 7200, 50, 30)])
+    # A rollup that lagged behind: only the first hour made it into the hourly table
+    server_bot._rollup_hourly(conn, "temperature", T0 + 3600)
+
+    server_bot._apply_retention(conn, "temperature", T0 + 30 * DAY)
+    assert [r[0] for r in conn.execute("SELECT timestamp FROM temperature_logs")] == [T0 + 7200]
+
+
+def test_retention_keeps_recent_raw_rows_and_old_daily_rows(conn):
+    add_temperatures(conn, [(T0, 40, 30)])
+
+    server_bot.run_rollups(conn, now=T0 + server_bot.RAW_RETENTION_DAYS * DAY)
+    assert conn.execute("SELECT COUNT(*) FROM temperature_logs").fetchone()[0] == 1
+
+    server_bot.run_rollups(conn, now=T0 + server_bot.RAW_RETENTION_DAYS * DAY + 3600)
+    assert conn.execute("SELECT COUNT(*) FROM temperature_logs").fetchone()[0] == 0
+    assert conn.execute("SELECT COUNT(*) FROM temperature_hourly").fetchone()[0] == 1
+
+    server_bot.run_rollups(conn, now=T0 + (server_bot.HOURLY_RETENTION_DAYS + 1) * DAY)
+    assert conn.execute("SELECT COUNT(*) FROM temperature_hourly").fetchone()[0] == 0
+    assert conn.execute("SELECT bucket, samples FROM temperature_daily").fetchall() == [(T0, 1)]
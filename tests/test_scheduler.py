@@ -0,0 +1,151 @@
+"""CollectorScheduler driven by a fake clock: run_pending(now) is called with chosen times."""
+import random
+import threading
+
+import server_bot
+
+
+class InlineExecutor:
+    """Runs submitted jobs immediately, on the calling thread."""
+
+    def submit(self, fn, *args):
+        fn(*args)
+
+
+class DeferredExecutor:
+    """Holds submitted jobs until finish() is called, so a job can still be running at its next tick."""
+
+    def __init__(self):
+        self.pending = []
+
+    def submit(self, fn, *args):
+        self.pending.append((fn, args))
+
+    def finish(self):
+        for fn, args in self.pending:
+            fn(*args)
+        self.pending = []
+
+
+def make_scheduler(executor=None, seed=0):
+    return server_bot.CollectorScheduler(clock=lambda: 0, executor=executor or InlineExecutor(), rng=random.Random(seed))
+
+
+def test_deadlines_align_to_the_interval():
+    scheduler = make_scheduler()
+    calls = []
+    job = scheduler.add("job", calls.append, 60)
+
+    assert scheduler.run_pending(1000) == 20
+    assert job.deadline == 1020
+    assert scheduler.run_pending(1019.9) > 0
+    assert calls == []
+
+    assert scheduler.run_pending(1020) == 60
+    assert calls == [1020]
+    assert job.deadline == 1080
+
+
+def test_offset_shifts_the_aligned_deadline():
+    scheduler = make_scheduler()
+    hourly = scheduler.add("hourly", lambda ts: None, 3600, offset=60)
+    daily = scheduler.add("daily", lambda ts: None, 86400)
+
+    scheduler.run_pending(7200 + 10)
+    assert hourly.deadline == 7260
+    assert daily.deadline == 86400
+
+    scheduler.run_pending(7260 + 5)
+    assert hourly.deadline == 7260 + 3600
+
+
+def test_jitter_delays_the_run_but_not_the_timestamp():
+    scheduler = make_scheduler(seed=42)
+    calls = []
+    job = scheduler.add("job", calls.append, 60, jitter=10)
+
+    for tick in range(50):
+        now = job.run_at if job.run_at is not None else 1000
+        scheduler.run_pending(now)
+        assert job.deadline <= job.run_at <= job.deadline + 10
+    assert calls == [1020 + 60 * i for i in range(49)]
+
+
+def test_job_still_running_at_its_next_tick_is_skipped():
+    executor = DeferredExecutor()
+    scheduler = make_scheduler(executor)
+    calls = []
+    job = scheduler.add("job", calls.append, 60)
+
+    scheduler.run_pending(1000)
+    scheduler.run_pending(1020)
+    scheduler.run_pending(1080)
+    assert job.overruns == 1
+    assert len(executor.pending) == 1
+
+    executor.finish()
+    scheduler.run_pending(1140)
+    executor.finish()
+    assert calls == [1020, 1140]
+    assert job.runs == 2
+
+
+def test_stall_counts_missed_ticks_instead_of_replaying_them():
+    scheduler = make_scheduler()
+    calls = []
+    job = scheduler.add("job", calls.append, 60)
+
+    scheduler.run_pending(1000)
+    scheduler.run_pending(1020)
+    scheduler.run_pending(1080)
+    # Stalled for 300s: deadlines 1140..1320 passed unseen
+    scheduler.run_pending(1380)
+
+    assert job.missed == 4
+    assert calls == [1020, 1080, 1380]
+    assert job.deadline == 1440
+
+
+def test_late_wakeups_do_not_drift():
+    scheduler = make_scheduler()
+    calls = []
+    job = scheduler.add("job", calls.append, 60)
+
+    scheduler.run_pending(1000)
+    for _ in range(100):
+        # Every wake-up is 0.7s late, as if the previous pass took that long
+        scheduler.run_pending(job.deadline + 0.7)
+
+    assert calls == [1020 + 60 * i for i in range(100)]
+    assert job.deadline == 1020 + 60 * 100
+    assert job.missed == 0
+
+
+def test_failures_are_counted_and_do_not_stop_the_job():
+    scheduler = make_scheduler()
+
+    def fail(ts):
+        raise RuntimeError("boom")
+
+    job = scheduler.add("job", fail, 60)
+    for now in (1000, 1020, 1080):
+        scheduler.run_pending(now)
+
+    assert job.failures == 2
+    assert job.runs == 2
+    assert not job.running
+
+
+def test_jobs_due_together_run_in_parallel():
+    scheduler = server_bot.CollectorScheduler(rng=random.Random(0))
+    started = threading.Barrier(9, timeout=5)
+    jobs = [scheduler.add(f"job{i}", lambda ts: started.wait(), 60) for i in range(9)]
+
+    scheduler.run_pending(1000)
+    scheduler.run_pending(1020)
+    scheduler.stop()
+    scheduler.executor.shutdown(wait=True)
+
+    # Every job reached the barrier, so none was queued behind another
+    assert [job.failures for job in jobs] == [0] * 9
+    assert scheduler.executor._max_workers == 9
@@ -0,0 +1,20 @@
+import pytest
+
+import server_bot
+
+
+@pytest.mark.parametrize("args, expected", [
+    (None, (3600, [])),
+    (["6h"], (6 * 3600, [])),
+    (["eth0"], (3600, ["eth0"])),
+    (["6h", "eth0"], (6 * 3600, ["eth0"])),
+    (["sda", "1d"], (86400, ["sda"])),
+])
+def test_split_range_args(args, expected):
+    assert server_bot.split_range_args(args, default=3600) == expected
+
+
+@pytest.mark.parametrize("args", [["6x"], ["0h"], ["6h", "1d"], ["1000d", "sda"]])
+def test_split_range_args_rejects_bad_ranges(args):
+    with pytest.raises(ValueError):
+        server_bot.split_range_args(args, default=3600)
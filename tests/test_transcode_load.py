@@ -0,0 +1,85 @@
+import asyncio
+import sqlite3
+import types
+
+import server_bot
+from conftest import make_update
+
+NOW = 1_700_000_000 - 1_700_000_000 % 3600 + 1800  # Half past an hour
+
+
+def fill(db_path, start, stop):
+    """Write one joined load/temperature row per minute; transcoding on odd minutes."""
+    with sqlite3.connect(db_path) as conn:
+        for ts in range(start, stop, 60):
+            busy = (ts // 60) % 2
+            conn.execute("INSERT INTO temperature_logs (timestamp, cpu_temp, gpu_temp) VALUES (?, ?, ?)",
+                         (ts, 50 + 10 * busy, 40 + 20 * busy))
+            conn.execute("INSERT INTO load_logs (timestamp, cpu_percent, gpu_util, gpu_enc_util, streams, transcodes) "
+                         "VALUES (?, ?, ?, ?, ?, ?)", (ts, 10 + 50 * busy, 5, 30 * busy, 1, busy))
+        server_bot.run_rollups(conn, now=NOW)
+
+
+def test_rolled_ranges_are_topped_up_with_raw_rows(bot_db):
+    fill(bot_db, NOW - 3 * 86400, NOW)
+
+    points = server_bot.fetch_transcode_load(7 * 86400, now=NOW)
+
+    timestamps = points["cpu_temp"][0]
+    assert timestamps == sorted(timestamps)
+    # Hourly buckets up to the last complete hour, then the raw minutes after it
+    assert timestamps[-1] == NOW - 60
+    assert NOW - 1800 - 3600 in timestamps
+    assert len(timestamps) == 3 * 24 + 30
+
+
+class FakeBot:
+    def __init__(self):
+        self.photos = []
+
+    async def send_photo(self, chat_id, photo):
+        self.photos.append(photo)
+        return types.SimpleNamespace(photo=[types.SimpleNamespace(file_id=f"file-{len(self.photos)}")])
+
+
+def test_cached_chart_skips_the_query(bot_db, monkeypatch):
+    fill(bot_db, NOW - 3600, NOW)
+    monkeypatch.setattr(server_bot, "CHART_CACHE", server_bot.ChartCache())
+    monkeypatch.setattr(server_bot, "run_render", lambda render, *args: asyncio.sleep(0, b"png"))
+    calls = []
+    real_fetch = server_bot.fetch_transcode_load
+    monkeypatch.setattr(server_bot, "fetch_transcode_load",
+                        lambda seconds: calls.append(seconds) or real_fetch(seconds, now=NOW))
+
+    bot = FakeBot()
+    replies = []
+    for _ in range(2):
+        update, context = make_update(args=["6h"])
+        context.bot = bot
+        asyncio.run(server_bot.check_transcode_load(update, context))
+        replies.append(update.message.replies)
+
+    assert calls == [6 * 3600]
+    assert bot.photos == [b"png", "file-1"]
+    assert replies[0] == replies[1]
+    assert "transcoding vs" in replies[0][0]
+
+
+def test_text_mode_sends_one_message_with_the_summary(bot_db, monkeypatch):
+    fill(bot_db, NOW - 3600, NOW)
+    monkeypatch.setattr(server_bot, "CHART_CACHE", server_bot.ChartCache())
+    real_fetch = server_bot.fetch_transcode_load
+    monkeypatch.setattr(server_bot, "fetch_transcode_load", lambda seconds: real_fetch(seconds, now=NOW))
+
+    update, context = make_update(args=["6h"])
+
+    async def run():
+        server_bot._chart_mode.set("text")
+        await server_bot.check_transcode_load(update, context)
+
+    asyncio.run(run())
+
+    assert len(update.message.replies) == 1
+    reply = update.message.replies[0]
+    assert reply.startswith("🔥 Transcode Load (Last 6h)")
+    assert "CPU temp: 60.0°C transcoding vs 50.0°C otherwise" in reply